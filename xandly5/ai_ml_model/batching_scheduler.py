@@ -0,0 +1,176 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple, TypeVar
+
+import numpy as np
+
+T = TypeVar('T')
+
+
+class BatchingScheduler:
+    """
+    collects next-word predictions from all in-flight generations of one model, and runs them as a single
+    batched forward pass on a background thread (continuous batching); results are fanned back out to each caller
+
+    the background thread is started by the first prediction, in the process that makes it, so a scheduler created
+    before os.fork() (ex: by the lyrics_server parent process) runs its own thread in each forked process
+    """
+
+    def __init__(self, predictor, max_batch_size: int = 32, max_wait_ms: float = 2.0, name: str = 'model'):
+        """
+        :param predictor: object with a keras-style predict() (ex: LyricsPredictor), called with each batch;
+            predict_next_words() is also batched when the predictor has it
+        :param max_batch_size: maximum number of token windows in a batch
+        :param max_wait_ms: maximum time to wait for other in-flight generations to join a batch
+        :param name: name used for the background thread
+        """
+        self.predictor = predictor
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_ms / 1000
+
+        self._condition = threading.Condition()
+        self._pending: List[Tuple[np.ndarray, Future, str]] = []
+        self._pending_rows = 0
+        self._generations = 0
+        self._is_closed = False
+
+        self._name = name
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+
+    @contextmanager
+    def generation(self) -> Iterator[None]:
+        """
+        registers an in-flight generation, so the scheduler knows how many predictions to wait for in each batch
+        """
+        with self._condition:
+            self._generations += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._generations -= 1
+                self._condition.notify_all()
+
+    def iterate_generation(self, steps: Iterator[T]) -> Iterator[T]:
+        """
+        registers a step-by-step generation (ex: streamed words) only while each step is computed, not while the
+        caller holds a step, so other generations do not wait for a slow consumer (ex: a client reading a stream)
+
+        :param steps: iterator of the generation's steps, making predictions with this scheduler
+        :return: iterator of the same steps
+        """
+        steps = iter(steps)
+        try:
+            while True:
+                with self.generation():
+                    try:
+                        step = next(steps)
+                    except StopIteration:
+                        return
+                yield step
+        finally:
+            # as yield from would, ex: when the caller stops reading a stream
+            if hasattr(steps, 'close'):
+                steps.close()
+
+    def predict(self, token_windows: np.ndarray) -> np.ndarray:
+        """
+        queue token windows for the next batch, and wait for their predictions; same interface as keras predict()
+
+        :param token_windows: padded token ids, shape (batch size, input_length)
+        :return: word probabilities, shape (batch size, total_words)
+        """
+        return self._queue(token_windows, 'predict')
+
+    def predict_next_words(self, token_windows: np.ndarray) -> np.ndarray:
+        """
+        queue token windows for the next batch, and wait for their most likely next words;
+        same interface as LyricsPredictor.predict_next_words()
+
+        :param token_windows: padded token ids, shape (batch size, input_length)
+        :return: word indexes, shape (batch size,)
+        """
+        return self._queue(token_windows, 'predict_next_words')
+
+    def _queue(self, token_windows: np.ndarray, method_name: str) -> np.ndarray:
+        future = Future()
+        with self._condition:
+            if self._is_closed:
+                raise RuntimeError('BatchingScheduler is closed')
+            if self._thread_pid != os.getpid():
+                self._thread = threading.Thread(target=self._run, name=f'batching-scheduler-{self._name}',
+                                                daemon=True)
+                self._thread_pid = os.getpid()
+                self._thread.start()
+            self._pending.append((token_windows, future, method_name))
+            self._pending_rows += len(token_windows)
+            self._condition.notify()
+        return future.result()
+
+    def close(self) -> None:
+        """
+        stop the background thread, once registered generations finish; predictions already queued are completed first
+        """
+        with self._condition:
+            while self._generations > 0:
+                self._condition.wait()
+            self._is_closed = True
+            self._condition.notify()
+        if self._thread_pid == os.getpid():
+            self._thread.join()
+
+    def _get_target_rows(self) -> int:
+        # every registered generation is expected to submit a window; unregistered callers are never waited on
+        return min(self.max_batch_size, max(1, self._generations))
+
+    def _take_batch(self) -> List[Tuple[np.ndarray, Future, str]]:
+        with self._condition:
+            while not self._pending and not self._is_closed:
+                self._condition.wait()
+            if not self._pending:
+                return []
+
+            deadline = time.monotonic() + self.max_wait_seconds
+            while not self._is_closed and self._pending_rows < self._get_target_rows():
+                remaining_seconds = deadline - time.monotonic()
+                if remaining_seconds <= 0:
+                    break
+                self._condition.wait(remaining_seconds)
+
+            # a batch runs one predictor method; windows queued for the other method wait for the next batch
+            batch = [self._pending.pop(0)]
+            batch_rows = len(batch[0][0])
+            method_name = batch[0][2]
+            for item in list(self._pending):
+                if batch_rows + len(item[0]) > self.max_batch_size:
+                    break
+                if item[2] == method_name:
+                    self._pending.remove(item)
+                    batch.append(item)
+                    batch_rows += len(item[0])
+            self._pending_rows -= batch_rows
+
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return  # closed
+
+            try:
+                predict = getattr(self.predictor, batch[0][2])
+                predictions = predict(np.concatenate([windows for windows, _, _ in batch]))
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            row = 0
+            for windows, future, _ in batch:
+                future.set_result(predictions[row:row + len(windows)])
+                row += len(windows)
@@ -1,11 +1,279 @@
 import numpy as np
 import csv
-from typing import List, Optional
+import glob
+import gzip
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-from tensorflow import keras
+if TYPE_CHECKING:
+    import tensorflow as tf
+    from tensorflow import keras
+    from xandly5.ai_ml_model.decoders import Decoder
 
-from tensorflow.keras.preprocessing.text import Tokenizer
-from tensorflow.keras.preprocessing.sequence import pad_sequences
+
+def iterate_catalog_files(paths: Union[str, List[str]]) -> Iterator[str]:
+    """
+    :param paths: file, directory or glob pattern (ex: 'dumps/**/*.txt.gz'), or a list of them
+    :return: iterator of file names; directories are expanded to all their files, recursively, in sorted order
+    """
+    for path in [paths] if isinstance(paths, str) else paths:
+        file_names = sorted(glob.glob(path, recursive=True)) if glob.has_magic(path) else [path]
+        for file_name in file_names:
+            if not os.path.isdir(file_name):
+                yield file_name
+                continue
+            for directory, directory_names, directory_file_names in os.walk(file_name):
+                directory_names.sort()
+                for directory_file_name in sorted(directory_file_names):
+                    yield os.path.join(directory, directory_file_name)
+
+
+def iterate_catalog_lines(paths: Union[str, List[str]]) -> Iterator[str]:
+    """
+    :param paths: file, directory or glob pattern, or a list of them; files ending in .gz are read as gzip files
+    :return: iterator of lines, read one at a time
+    """
+    for file_name in iterate_catalog_files(paths):
+        open_file = gzip.open if file_name.endswith('.gz') else open
+        with open_file(file_name, 'rt', encoding='utf-8', errors='replace') as text_file:
+            yield from text_file
+
+
+def _iterate_chunks(lines: Iterable[str], lines_per_chunk: int) -> Iterator[List[str]]:
+    lines = iter(lines)
+    while True:
+        chunk = list(itertools.islice(lines, lines_per_chunk))
+        if not chunk:
+            return
+        yield chunk
+
+
+class WordTokenizer:
+    """
+    splits texts into words, and numbers words by frequency; same word index, filters and out-of-vocabulary token
+    as the Keras Tokenizer the saved models were trained with, and the same attribute names (ex: word_index,
+    texts_to_sequences), with batches of texts encoded directly into padded NumPy arrays
+    """
+
+    FILTERS = '!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\t\n'
+
+    def __init__(self, oov_token: Optional[str] = '<OOV>', filters: str = FILTERS, lower: bool = True,
+                 split: str = ' '):
+        """
+        :param oov_token: token for words that are not in the vocabulary, numbered 1; None to skip those words
+        :param filters: characters removed from texts, as word separators
+        :param lower: lowercase texts before splitting them
+        :param split: word separator
+        """
+        self.oov_token = oov_token
+        self.filters = filters
+        self.lower = lower
+        self.split = split
+        # words in order of first occurrence, which orders words of the same count in the word index
+        self.word_counts: Dict[str, int] = {}
+        self.word_docs: Dict[str, int] = {}
+        self.document_count = 0
+        self.word_index: Dict[str, int] = {}
+        self.index_word: Dict[int, str] = {}
+        self._translate_map = str.maketrans({character: split for character in filters})
+        # with ASCII filters and separator (the defaults), filters are replaced in the UTF-8 bytes of a text, which
+        # is several times faster; bytes of multi-byte characters are never ASCII, so the words are the same
+        self._byte_translate_table: Optional[bytes] = None
+        if len(split) == 1 and (filters + split).isascii():
+            self._byte_translate_table = bytes.maketrans(filters.encode('ascii'), split.encode('ascii') * len(filters))
+
+    @classmethod
+    def from_index_word(cls, index_word: List[str], oov_token: Optional[str] = '<OOV>') -> 'WordTokenizer':
+        """
+        :param index_word: words in index order, starting at index 1 (ex: the index_word list of a catalog file)
+        :param oov_token: out-of-vocabulary token the words were indexed with
+        :return: WordTokenizer that can encode texts, but has no word counts
+        """
+        tokenizer = cls(oov_token=oov_token)
+        tokenizer.index_word = dict(enumerate(index_word, start=1))
+        tokenizer.word_index = {word: index for index, word in tokenizer.index_word.items()}
+        return tokenizer
+
+    def split_words(self, text: str) -> List[str]:
+        """
+        :param text: text to split
+        :return: words of the text, same as Keras text_to_word_sequence
+        """
+        if self.lower:
+            text = text.lower()
+        if self._byte_translate_table is not None:
+            text = text.encode('utf-8', 'surrogatepass').translate(self._byte_translate_table).decode(
+                'utf-8', 'surrogatepass')
+        else:
+            text = text.translate(self._translate_map)
+        return [word for word in text.split(self.split) if word]
+
+    def add_word_counts(self, word_counts: Dict[str, int], word_docs: Dict[str, int], document_count: int) -> None:
+        """
+        add word counts of more texts (ex: counted in another process); update_word_index must be called once
+        all counts are added
+
+        :param word_counts: number of times each word occurs, in order of first occurrence
+        :param word_docs: number of texts each word occurs in
+        :param document_count: number of texts
+        :return: None
+        """
+        for word, count in word_counts.items():
+            self.word_counts[word] = self.word_counts.get(word, 0) + count
+        for word, count in word_docs.items():
+            self.word_docs[word] = self.word_docs.get(word, 0) + count
+        self.document_count += document_count
+
+    def update_word_index(self) -> None:
+        """
+        number words by count, most common first, starting at 1 (or 2, after the out-of-vocabulary token)
+
+        :return: None
+        """
+        sorted_words = sorted(self.word_counts, key=self.word_counts.get, reverse=True)  # stable: ties keep order
+        if self.oov_token is not None:
+            sorted_words.insert(0, self.oov_token)
+        self.word_index = dict(zip(sorted_words, range(1, len(sorted_words) + 1)))
+        self.index_word = {index: word for word, index in self.word_index.items()}
+
+    def fit_on_texts(self, texts: Iterable[str]) -> None:
+        """
+        count the words of texts, and update the word index
+
+        :param texts: texts to add to the vocabulary
+        :return: None
+        """
+        word_counts = Counter()
+        word_docs = Counter()
+        document_count = 0
+        for text in texts:
+            words = self.split_words(text)
+            word_counts.update(words)
+            word_docs.update(set(words))
+            document_count += 1
+
+        self.add_word_counts(word_counts, word_docs, document_count)
+        self.update_word_index()
+
+    def texts_to_sequences_generator(self, texts: Iterable[str]) -> Iterator[List[int]]:
+        """
+        :param texts: texts to encode
+        :return: iterator of token ids for each text; words not in the vocabulary are the out-of-vocabulary token
+            (or skipped, without one)
+        """
+        word_index = self.word_index
+        oov_index = word_index.get(self.oov_token) if self.oov_token is not None else None
+        for text in texts:
+            words = self.split_words(text)
+            if oov_index is not None:
+                yield [word_index.get(word, oov_index) for word in words]
+            else:
+                yield [word_index[word] for word in words if word in word_index]
+
+    def texts_to_sequences(self, texts: Iterable[str]) -> List[List[int]]:
+        """
+        :param texts: texts to encode
+        :return: token ids for each text
+        """
+        return list(self.texts_to_sequences_generator(texts))
+
+    def encode_batch(self, texts: List[str], sequence_length: int,
+                     padding: str = 'pre') -> Tuple[np.ndarray, List[int]]:
+        """
+        encode texts into one array of token ids, same as texts_to_sequences followed by Keras pad_sequences
+
+        :param texts: texts to encode
+        :param sequence_length: length of each row; longer texts keep their last tokens
+        :param padding: 'pre' or 'post', pad with zeros before or after the tokens
+        :return: int32 array of token ids, shape (len(texts), sequence_length); number of tokens in each text,
+            before truncating
+        """
+        token_ids = np.zeros((len(texts), sequence_length), dtype=np.int32)
+        token_counts = []
+        for row, token_list in enumerate(self.texts_to_sequences_generator(texts)):
+            token_counts.append(len(token_list))
+            if len(token_list) > sequence_length:
+                token_list = token_list[len(token_list) - sequence_length:]
+            if not token_list:
+                continue
+            if padding == 'pre':
+                token_ids[row, sequence_length - len(token_list):] = token_list
+            else:
+                token_ids[row, :len(token_list)] = token_list
+        return token_ids, token_counts
+
+
+def _count_catalog_lines(lines: List[str], filters: str, split: str,
+                         deduplicate: bool) -> Tuple[Counter, Counter, np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    # runs in ingestion worker processes: lowercase each line, split it into words and count them, and hash it for
+    # deduplication; only the counts are returned, since the parent process still has the lines
+    tokenizer = WordTokenizer(filters=filters, lower=False, split=split)
+    word_counts = Counter()
+    word_docs = Counter()
+    line_indexes = []
+    line_lengths = []
+    line_digests = []
+    chunk_digests = set()
+    for line_index, line in enumerate(lines):
+        line = line.lower()
+        if deduplicate:
+            line_digest = hashlib.blake2b(line.strip().encode('utf-8'), digest_size=8).digest()
+            if line_digest in chunk_digests:
+                continue
+            chunk_digests.add(line_digest)
+            line_digests.append(line_digest)
+        words = tokenizer.split_words(line)
+        word_counts.update(words)
+        word_docs.update(set(words))
+        line_indexes.append(line_index)
+        line_lengths.append(len(words))
+
+    return (word_counts, word_docs, np.array(line_indexes, dtype=np.int32), np.array(line_lengths, dtype=np.int32),
+            np.frombuffer(b''.join(line_digests), dtype='<u8') if deduplicate else None)
+
+
+class _LineDigestSet:
+    """
+    set of 64-bit line digests, for deduplicating multi-GB corpora: digests are kept in sorted NumPy arrays, 8 bytes
+    each (a Python set of ints takes about 70); each new array is merged with the smaller arrays before it, so there
+    are O(log n) arrays to search, and each digest is merged O(log n) times
+    """
+
+    def __init__(self):
+        self._runs: List[np.ndarray] = []  # sorted arrays, largest first
+
+    def __len__(self) -> int:
+        return sum(len(run) for run in self._runs)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(run.nbytes for run in self._runs)
+
+    def add_new(self, digests: np.ndarray) -> np.ndarray:
+        """
+        :param digests: uint64 digests, with no duplicates among them
+        :return: boolean array, True for the digests that were not in the set; those digests are added to it
+        """
+        is_new = np.ones(len(digests), dtype=bool)
+        for run in self._runs:
+            positions = np.minimum(np.searchsorted(run, digests), len(run) - 1)
+            is_new &= run[positions] != digests
+
+        run = np.sort(digests[is_new])
+        if len(run) == 0:
+            return is_new
+        while self._runs and len(self._runs[-1]) <= len(run):
+            # stable sort finds the two sorted runs, and merges them in linear time, in place
+            run = np.concatenate([self._runs.pop(), run])
+            run.sort(kind='stable')
+        self._runs.append(run)
+        return is_new
 
 
 class Catalog:
@@ -15,12 +283,63 @@ class Catalog:
 
     def __init__(self, padding: str = 'pre', oov_token='<OOV>'):
         self.catalog_items: List[str] = []
-        self.tokenizer = Tokenizer(oov_token=oov_token)
+        self.tokenizer = WordTokenizer(oov_token=oov_token)
+        self.content_hash: Optional[str] = None
         self.max_sequence_length = 0
         self.total_words = 0
         self.features: Optional[np.ndarray] = None
         self.labels: Optional[np.ndarray] = None
         self._padding = padding
+        # set once add_files_to_catalog has built the vocabulary as lines were added
+        self._vocabulary_built = False
+        # content hash of the lines added by add_files_to_catalog so far; not pickled
+        self._content_hasher: Optional['hashlib._Hash'] = None
+        self._line_digests = _LineDigestSet()
+
+    def __getstate__(self) -> Dict:
+        # hash objects cannot be pickled (ex: when the catalog is passed to a process pool); content_hash is kept
+        state = self.__dict__.copy()
+        state['_content_hasher'] = None
+        return state
+
+    @classmethod
+    def from_catalog_file(cls, file_name: str) -> 'Catalog':
+        """
+        load a catalog saved with save_catalog_file; the catalog can generate lyrics, but has no features or labels
+
+        :param file_name: catalog json file name
+        :return: Catalog
+        """
+        with open(file_name, 'r') as json_file:
+            catalog_data = json.load(json_file)
+
+        catalog = cls(padding=catalog_data['padding'], oov_token=catalog_data['oov_token'])
+        catalog.tokenizer = WordTokenizer.from_index_word(catalog_data['index_word'], catalog_data['oov_token'])
+        catalog.max_sequence_length = catalog_data['max_sequence_length']
+        catalog.total_words = catalog_data['total_words']
+        catalog.content_hash = catalog_data['content_hash']
+        return catalog
+
+    def save_catalog_file(self, file_name: str) -> None:
+        """
+        save the tokenizer vocabulary and settings needed for prediction, so lyrics can be generated
+        without re-tokenizing the catalog
+
+        :param file_name: catalog json file name
+        :return: None
+        """
+        index_word = [self.tokenizer.index_word[index] for index in range(1, len(self.tokenizer.index_word) + 1)]
+        catalog_data = {
+            'padding': self._padding,
+            'oov_token': self.tokenizer.oov_token,
+            'max_sequence_length': self.max_sequence_length,
+            'total_words': self.total_words,
+            'content_hash': self.content_hash,
+            'index_word': index_word
+        }
+
+        with open(file_name, 'w') as json_file:
+            json.dump(catalog_data, json_file)
 
     def add_file_to_catalog(self, file_name: str) -> None:
         """
@@ -51,61 +370,442 @@ class Catalog:
             for row in csv_reader:
                 self.catalog_items.append(row[text_column])
 
-    def tokenize_catalog(self) -> None:
+    def add_files_to_catalog(self, paths: Union[str, List[str]], deduplicate: bool = False, keep_items: bool = True,
+                             max_workers: int = 1, lines_per_chunk: int = 10000) -> int:
+        """
+        stream text files into the catalog, building the vocabulary as lines are read, so lines do not need to be
+        held in memory; lines are lowercased, split into words and counted in a pool of worker processes, which
+        return the word counts of each chunk of lines rather than the lines
+
+        the vocabulary, sequence length and content hash are the same as add_file_to_catalog for each file
+        followed by tokenize_catalog; use one or the other for a catalog
+
+        :param paths: file, directory or glob pattern (ex: 'dumps/**/*.txt.gz'), or a list of them; files ending in
+            .gz are read as gzip files
+        :param deduplicate: skip lines already added, compared once lowercased and stripped of surrounding spaces;
+            a 64-bit digest of each line is kept, 8 bytes per distinct line
+        :param keep_items: keep lines in catalog_items, for training with tokenize_catalog (which then only builds
+            features and labels); False builds only the vocabulary, ex: for a catalog file of a multi-GB corpus
+        :param max_workers: number of worker processes, 1 to count lines in this process
+        :param lines_per_chunk: number of lines counted at a time, by each worker
+        :return: number of lines added
+        """
+        if self._content_hasher is None:
+            if self._vocabulary_built:
+                raise ValueError('files cannot be added to an unpickled catalog, its content hash cannot be continued')
+            self._content_hasher = hashlib.sha256()
+            self._vocabulary_built = True
+
+        filters = self.tokenizer.filters
+        split = self.tokenizer.split
+        chunks = _iterate_chunks(iterate_catalog_lines(paths), lines_per_chunk)
+        line_count = 0
+
+        if max_workers <= 1:
+            for chunk in chunks:
+                line_count += self._add_counted_lines(chunk, _count_catalog_lines(chunk, filters, split, deduplicate),
+                                                      keep_items)
+        else:
+            # spawned rather than forked, since the TensorFlow runtime is not fork-safe; a few chunks are queued for
+            # each worker, and added in file order, so memory use does not grow with the corpus size
+            with ProcessPoolExecutor(max_workers=max_workers,
+                                     mp_context=multiprocessing.get_context('spawn')) as executor:
+                pending_chunks = deque()
+                for chunk in chunks:
+                    pending_chunks.append((chunk, executor.submit(_count_catalog_lines, chunk, filters, split,
+                                                                  deduplicate)))
+                    if len(pending_chunks) >= max_workers * 2:
+                        chunk, line_counts = pending_chunks.popleft()
+                        line_count += self._add_counted_lines(chunk, line_counts.result(), keep_items)
+                while pending_chunks:
+                    chunk, line_counts = pending_chunks.popleft()
+                    line_count += self._add_counted_lines(chunk, line_counts.result(), keep_items)
+
+        self.tokenizer.update_word_index()
+        self.total_words = len(self.tokenizer.word_index) + 1
+        self.content_hash = self._content_hasher.hexdigest()
+        return line_count
+
+    def _add_counted_lines(self, lines: List[str],
+                           line_counts: Tuple[Counter, Counter, np.ndarray, np.ndarray, Optional[np.ndarray]],
+                           keep_items: bool) -> int:
+        word_counts, word_docs, line_indexes, line_lengths, line_digests = line_counts
+
+        if line_digests is not None:
+            is_new = self._line_digests.add_new(line_digests)
+            if not is_new.all():
+                # lines already added from an earlier chunk: their words were counted with that chunk, so
+                # they are all in the vocabulary already, and removing them leaves the word order unchanged
+                for line_index in line_indexes[~is_new].tolist():
+                    words = self.tokenizer.split_words(lines[line_index])
+                    word_counts.subtract(words)
+                    word_docs.subtract(set(words))
+                word_counts = +word_counts
+                word_docs = +word_docs
+                line_indexes = line_indexes[is_new]
+                line_lengths = line_lengths[is_new]
+
+        for line_index in line_indexes.tolist():
+            line = lines[line_index].lower()
+            self._content_hasher.update(line.encode('utf-8'))
+            if keep_items:
+                self.catalog_items.append(line)
+
+        # n-grams need 2 or more tokens, so the longest such line sets the sequence length
+        ngram_line_lengths = line_lengths[line_lengths > 1]
+        if len(ngram_line_lengths) > 0:
+            self.max_sequence_length = max(self.max_sequence_length, int(ngram_line_lengths.max()))
+
+        self.tokenizer.add_word_counts(word_counts, word_docs, len(line_indexes))
+        return len(line_indexes)
+
+    def tokenize_catalog(self, sparse_labels: bool = False, build_features: bool = True) -> None:
 
         """
         tokenize the contents of the catalog, and set properties accordingly (ex: total_words, labels)
 
+        :param sparse_labels: store labels as word indexes instead of one-hot encoding them over all words
+            (for use with sparse_categorical_crossentropy)
+        :param build_features: build features and labels in memory; disable when training with get_ngram_dataset
         :return: None
         """
 
-        # tokenizer: fit, sequence, pad
-        self.tokenizer.fit_on_texts(self.catalog_items)
+        # the vocabulary is already built if lines were added with add_files_to_catalog
+        vocabulary_built = self._vocabulary_built
+
+        if not vocabulary_built:
+            self.content_hash = hashlib.sha256(''.join(self.catalog_items).encode('utf-8')).hexdigest()
 
-        # create a list of n-gram sequences
-        input_sequences = []
+            # tokenizer: fit, sequence, pad
+            self.tokenizer.fit_on_texts(self.catalog_items)
+            self.total_words = len(self.tokenizer.word_index) + 1
 
-        for line in self.catalog_items:
-            token_list = self.tokenizer.texts_to_sequences([line])[0]
-            for i in range(1, len(token_list)):
-                n_gram_sequence = token_list[:i + 1]
-                input_sequences.append(n_gram_sequence)
+        if not build_features:
+            if not vocabulary_built:
+                # n-grams need 2 or more tokens, so the longest such line sets the sequence length
+                self.max_sequence_length = max([len(token_list) for token_list in
+                                                self.tokenizer.texts_to_sequences_generator(self.catalog_items)
+                                                if len(token_list) > 1])
+            return
 
-        # pad sequences
-        self.max_sequence_length = max([len(item) for item in input_sequences])
-        input_sequences = np.array(pad_sequences(input_sequences, maxlen=self.max_sequence_length,
-                                                 padding=self._padding))
+        token_lists = self.tokenizer.texts_to_sequences(self.catalog_items)
+        self.max_sequence_length = max([len(token_list) for token_list in token_lists if len(token_list) > 1])
+        input_sequences = self._get_ngram_sequences(token_lists)
 
         self.features = input_sequences[:, :-1]
         labels_temp = input_sequences[:, -1]
 
-        self.total_words = len(self.tokenizer.word_index) + 1
-        self.labels = keras.utils.to_categorical(labels_temp, num_classes=self.total_words)
+        if sparse_labels:
+            self.labels = labels_temp
+        else:
+            from tensorflow import keras
+            self.labels = keras.utils.to_categorical(labels_temp, num_classes=self.total_words)
 
         # for troubleshooting only! output word index
         # print(sorted(self.tokenizer.word_index.keys()))
 
-    def generate_lyrics_text(self, model: keras.Sequential, seed_text: str, word_count: int) -> str:
+    def _get_ngram_sequences(self, token_lists: List[List[int]]) -> np.ndarray:
+        """
+        create padded n-gram sequences (all prefixes of 2 or more tokens) for each list of tokens;
+        same output as padding each prefix with pad_sequences, built with NumPy in a single pass
+
+        :param token_lists: token ids for each line
+        :return: padded n-gram sequences, shape (n-gram count, max_sequence_length)
+        """
+
+        sequence_length = self.max_sequence_length
+        line_lengths = np.array([len(token_list) for token_list in token_lists], dtype=np.int64)
+        ngram_counts = np.maximum(line_lengths - 1, 0)
+        total_ngrams = int(ngram_counts.sum())
+
+        input_sequences = np.zeros((total_ngrams, sequence_length), dtype=np.int32)
+        if total_ngrams == 0:
+            return input_sequences
+
+        # lay out every line as (sequence_length - 1) zeros followed by its tokens: the window of sequence_length
+        # ending at a line's token i is then that line's pre-padded n-gram of tokens 0..i
+        padded_line_lengths = line_lengths + sequence_length - 1
+        padded_line_starts = np.cumsum(padded_line_lengths) - padded_line_lengths
+        token_line_offsets = np.cumsum(line_lengths) - line_lengths
+        total_tokens = int(line_lengths.sum())
+
+        token_positions = np.repeat(padded_line_starts + sequence_length - 1 - token_line_offsets, line_lengths)
+        token_positions += np.arange(total_tokens)
+
+        padded_tokens = np.zeros(int(padded_line_lengths.sum()), dtype=np.int32)
+        padded_tokens[token_positions] = np.fromiter(itertools.chain.from_iterable(token_lists), dtype=np.int32,
+                                                     count=total_tokens)
+
+        # n-grams of a line start 1 to (line length - 1) positions after the line's start
+        ngram_line_offsets = np.cumsum(ngram_counts) - ngram_counts
+        window_starts = np.repeat(padded_line_starts + 1 - ngram_line_offsets, ngram_counts)
+        window_starts += np.arange(total_ngrams)
+
+        windows = np.lib.stride_tricks.sliding_window_view(padded_tokens, sequence_length)
+        np.take(windows, window_starts, axis=0, out=input_sequences)
+
+        if self._padding == 'post':
+            # move the zeros from the start to the end of each n-gram shorter than the sequence length
+            ngram_lengths = np.arange(total_ngrams) - np.repeat(ngram_line_offsets, ngram_counts) + 2
+            shifts = np.maximum(sequence_length - ngram_lengths, 0)
+            columns = (np.arange(sequence_length) + shifts[:, np.newaxis]) % sequence_length
+            input_sequences = np.take_along_axis(input_sequences, columns, axis=1)
+
+        return input_sequences
+
+    def get_ngram_dataset(self, catalog_items: Optional[List[str]] = None, sparse_labels: bool = True,
+                          lines_per_chunk: int = 1000) -> 'tf.data.Dataset':
+        """
+        generate n-gram features and labels lazily from catalog lines, as a tf.data pipeline of (features, label);
+        only one chunk of lines is held as n-grams at a time, so the corpus size is not limited by memory
+
+        requires tokenize_catalog (build_features can be disabled)
+
+        :param catalog_items: lines to use (ex: a training split); defaults to all catalog items
+        :param sparse_labels: labels as word indexes; if False, each label is one-hot encoded as it is generated
+        :param lines_per_chunk: number of lines tokenized at a time
+        :return: unbatched dataset of (features, label)
+        """
+
+        import tensorflow as tf
+
+        lines = self.catalog_items if catalog_items is None else catalog_items
+
+        def generate_ngram_chunks():
+            for start in range(0, len(lines), lines_per_chunk):
+                token_lists = self.tokenizer.texts_to_sequences(lines[start:start + lines_per_chunk])
+                input_sequences = self._get_ngram_sequences(token_lists)
+                yield input_sequences[:, :-1], input_sequences[:, -1]
+
+        dataset = tf.data.Dataset.from_generator(generate_ngram_chunks, output_signature=(
+            tf.TensorSpec(shape=(None, self.max_sequence_length - 1), dtype=tf.int32),
+            tf.TensorSpec(shape=(None,), dtype=tf.int32)
+        )).unbatch()
+
+        if not sparse_labels:
+            dataset = dataset.map(lambda features, label: (features, tf.one_hot(label, self.total_words)))
+
+        return dataset
+
+    def _get_token_windows(self, seed_texts: List[str]) -> Tuple[np.ndarray, List[int]]:
+        """
+        tokenize seed texts once, into padded windows of token ids matching the model input length
+
+        :param seed_texts: starter texts
+        :return: window of token ids for each seed text, number of tokens in each seed text
+        """
+        return self.tokenizer.encode_batch(seed_texts, self.max_sequence_length - 1, self._padding)
+
+    def _append_to_token_window(self, window: np.ndarray, token_count: int, token_id: int) -> None:
+        """
+        append a token id to a window in place, dropping the oldest token once the window is full;
+        equivalent to re-tokenizing and re-padding the text with the new word appended
+
+        :param window: window of token ids (updated in place)
+        :param token_count: number of tokens added to the window so far, excluding token_id
+        :param token_id: token id to append
+        :return: None
+        """
+        if self._padding == 'post' and token_count < len(window):
+            window[token_count] = token_id
+        else:
+            window[:-1] = window[1:]
+            window[-1] = token_id
+
+    def generate_lyrics_text(self, model: 'keras.Sequential', seed_text: str, word_count: int,
+                             decoder: Optional['Decoder'] = None) -> str:
 
         """
         generate lyrics using the provided model and properties
 
-        :param model: model used to generate text
+        :param model: model used to generate text; any object with a keras-style predict() (ex: LyricsPredictor)
         :param seed_text: starter text
         :param word_count: total number of words to return
+        :param decoder: chooses each next word, None for greedy decoding
         :return: starter text + generated text
         """
 
-        seed_text_word_count = len(seed_text.split(' '))
-        words_to_generate = word_count - seed_text_word_count
+        return self.generate_lyrics_texts(model, [seed_text], [word_count], decoder)[0]
+
+    def generate_lyrics_words(self, model: 'keras.Sequential', seed_text: str, word_count: int,
+                              decoder: Optional['Decoder'] = None) -> Iterator[str]:
+
+        """
+        generate lyrics one word at a time, for streaming; the words generated are the same as generate_lyrics_text
+
+        :param model: model used to generate text; any object with a keras-style predict() (ex: LyricsPredictor)
+        :param seed_text: starter text
+        :param word_count: total number of words, including the starter text
+        :param decoder: chooses each next word, None for greedy decoding
+        :return: iterator of generated words (excluding the starter text)
+        """
+
+        windows, token_counts = self._get_token_windows([seed_text])
+        words_to_generate = word_count - len(seed_text.split(' '))
+
+        for _, output_word in self._iterate_words(model, windows, token_counts, [words_to_generate], decoder):
+            yield output_word
+
+    def generate_lyrics_texts(self, model: 'keras.Sequential', seed_texts: List[str], word_counts: List[int],
+                              decoder: Optional['Decoder'] = None) -> List[str]:
+
+        """
+        generate lyrics for several independent seeds together, with one batched prediction per word;
+        each seed stops at its own word count, so the batch shrinks as seeds finish
+
+        :param model: model used to generate text; any object with a keras-style predict() (ex: LyricsPredictor)
+        :param seed_texts: starter text for each lyrics text
+        :param word_counts: total number of words to return for each lyrics text
+        :param decoder: chooses each next word, None for greedy decoding
+        :return: starter text + generated text, for each seed
+        """
+
+        words_to_generate = [word_count - len(seed_text.split(' '))
+                             for seed_text, word_count in zip(seed_texts, word_counts)]
 
-        for _ in range(words_to_generate):
-            token_list = self.tokenizer.texts_to_sequences([seed_text])[0]
-            token_list = pad_sequences([token_list], maxlen=self.max_sequence_length - 1, padding=self._padding)
-            predicted = np.argmax(model.predict(token_list), axis=-1)
+        # each seed is tokenized once; predicted token ids are then rolled into its window directly
+        windows, token_counts = self._get_token_windows(seed_texts)
 
-            output_word = self.tokenizer.index_word[int(predicted)]
+        generated_words = self._generate_words(model, windows, token_counts, words_to_generate, decoder)
+
+        return [' '.join([seed_text] + words) for seed_text, words in zip(seed_texts, generated_words)]
+
+    def _generate_words(self, model: 'keras.Sequential', windows: np.ndarray, token_counts: List[int],
+                        words_to_generate: List[int], decoder: Optional['Decoder'] = None) -> List[List[str]]:
+        """
+        generate words for each row of token windows, with one batched prediction per word
+
+        :param model: model used to generate text; any object with a keras-style predict() (ex: LyricsPredictor)
+        :param windows: window of token ids for each row (updated in place)
+        :param token_counts: number of tokens added to each window so far (updated in place)
+        :param words_to_generate: number of words to generate for each row
+        :param decoder: chooses each next word, None for greedy decoding
+        :return: generated words, for each row
+        """
+
+        generated_words: List[List[str]] = [[] for _ in windows]
+
+        for row, output_word in self._iterate_words(model, windows, token_counts, words_to_generate, decoder):
+            generated_words[row].append(output_word)
+
+        return generated_words
+
+    def _iterate_words(self, model: 'keras.Sequential', windows: np.ndarray, token_counts: List[int],
+                       words_to_generate: List[int],
+                       decoder: Optional['Decoder'] = None) -> Iterator[Tuple[int, str]]:
+        """
+        generate words for each row of token windows, yielding each word as soon as it is predicted
+
+        :param model: model used to generate text; any object with a keras-style predict() (ex: LyricsPredictor)
+        :param windows: window of token ids for each row (updated in place)
+        :param token_counts: number of tokens added to each window so far (updated in place)
+        :param words_to_generate: number of words to generate for each row
+        :param decoder: chooses each next word, None for greedy decoding
+        :return: iterator of (row, generated word)
+        """
+
+        for row, predicted in self._iterate_token_ids(model, windows, token_counts, words_to_generate, decoder):
+            output_word = self.tokenizer.index_word[predicted]
             if output_word is not None:
-                seed_text += ' ' + output_word
+                self._append_to_token_window(windows[row], token_counts[row], predicted)
+                token_counts[row] += 1
+                yield row, output_word
+
+    def _iterate_token_ids(self, model: 'keras.Sequential', windows: np.ndarray, token_counts: List[int],
+                           words_to_generate: List[int], decoder: Optional['Decoder']) -> Iterator[Tuple[int, int]]:
+        if decoder is not None:
+            yield from decoder.iterate_token_ids(model, windows, token_counts, words_to_generate,
+                                                 self._append_to_token_window)
+            return
+
+        # greedy decoding: the most likely word, for each active row
+        for step in range(max(words_to_generate, default=0)):
+            active_rows = [row for row, word_total in enumerate(words_to_generate) if step < word_total]
+            active_windows = windows if len(active_rows) == len(windows) else windows[active_rows]
+            if hasattr(model, 'predict_next_words'):
+                predicted_words = model.predict_next_words(active_windows)  # skips the softmax over all words
+            else:
+                predicted_words = np.argmax(model.predict(active_windows), axis=-1)
+
+            for row, predicted in zip(active_rows, predicted_words):
+                yield row, int(predicted)
+
+
+class LyricsSession:
+    """
+    a lyrics text that grows over several generations (ex: chained song sections); the token window and words
+    are kept between generations, so each seed text and generated word is only tokenized once
+    """
+
+    def __init__(self, catalog: Catalog):
+        """
+        :param catalog: catalog used to tokenize seed texts and look up generated words
+        """
+        self.catalog = catalog
+        self.words: List[str] = []
+        self._window = np.zeros((1, catalog.max_sequence_length - 1), dtype=np.int32)
+        self._token_counts = [0]
+
+    def get_lyrics_text(self) -> str:
+        """
+        :return: all seed and generated text so far
+        """
+        return ' '.join(self.words)
+
+    def get_words_at_end(self, word_count: int) -> str:
+        """
+        :param word_count: number of words to return
+        :return: the last words of the lyrics text
+        """
+        return ' '.join(self.words[-word_count:])
+
+    def generate_lyrics_text(self, model: 'keras.Sequential', seed_text: str, word_count: int,
+                             decoder: Optional['Decoder'] = None) -> int:
+        """
+        append seed text to the lyrics text, then generate words until the lyrics text has word_count words;
+        same result as Catalog.generate_lyrics_text with the whole lyrics text + ' ' + seed text as the seed
+
+        :param model: model used to generate text; any object with a keras-style predict() (ex: LyricsPredictor)
+        :param seed_text: starter text, appended to the current lyrics text
+        :param word_count: total number of words in the lyrics text, including all previous text
+        :param decoder: chooses each next word, None for greedy decoding; the same decoder should be used for
+            every generation in the session
+        :return: number of words generated
+        """
+
+        self.add_seed_text(seed_text)
+        return sum(1 for _ in self.generate_lyrics_words(model, word_count, decoder))
+
+    def add_seed_text(self, seed_text: str) -> None:
+        """
+        append seed text to the lyrics text, and its tokens to the token window
+
+        :param seed_text: starter text, appended to the current lyrics text
+        :return: None
+        """
+
+        # seed text is joined to the lyrics text with a space, unless the lyrics text is still empty
+        if len(self.words) > 1 or any(self.words):
+            self.words.extend(seed_text.split(' '))
+        else:
+            self.words = seed_text.split(' ')
+
+        for token_id in self.catalog.tokenizer.texts_to_sequences([seed_text])[0]:
+            self.catalog._append_to_token_window(self._window[0], self._token_counts[0], token_id)
+            self._token_counts[0] += 1
+
+    def generate_lyrics_words(self, model: 'keras.Sequential', word_count: int,
+                              decoder: Optional['Decoder'] = None) -> Iterator[str]:
+        """
+        generate words until the lyrics text has word_count words, appending each word as it is generated
+
+        :param model: model used to generate text; any object with a keras-style predict() (ex: LyricsPredictor)
+        :param word_count: total number of words in the lyrics text, including all previous text
+        :param decoder: chooses each next word, None for greedy decoding
+        :return: iterator of generated words
+        """
 
-        return seed_text
+        for _, output_word in self.catalog._iterate_words(model, self._window, self._token_counts,
+                                                          [word_count - len(self.words)], decoder):
+            self.words.append(output_word)
+            yield output_word
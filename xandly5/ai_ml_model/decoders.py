@@ -0,0 +1,190 @@
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# appends a token id to a window in place: (window, token count, token id), ex: Catalog._append_to_token_window
+AppendToWindow = Callable[[np.ndarray, int, int], None]
+
+
+class Decoder(ABC):
+    """
+    chooses the next word at each generation step, in place of Catalog's greedy decoding
+    """
+
+    @abstractmethod
+    def iterate_token_ids(self, model, windows: np.ndarray, token_counts: List[int], words_to_generate: List[int],
+                          append_to_window: AppendToWindow) -> Iterator[Tuple[int, int]]:
+        """
+        generate token ids for each row of token windows
+
+        :param model: model used to generate text; any object with a keras-style predict() (ex: LyricsPredictor)
+        :param windows: window of token ids for each row; the caller appends each yielded token id before the next
+            one is requested
+        :param token_counts: number of tokens added to each window so far
+        :param words_to_generate: number of words to generate for each row
+        :param append_to_window: appends a token id to a window in place
+        :return: iterator of (row, token id)
+        """
+
+
+class StepDecoder(Decoder):
+    """
+    decoder that chooses each row's next word independently at each step: choose_token_ids is called with the
+    token windows of all active rows at once, so each step is one batched prediction
+    """
+
+    def iterate_token_ids(self, model, windows: np.ndarray, token_counts: List[int], words_to_generate: List[int],
+                          append_to_window: AppendToWindow) -> Iterator[Tuple[int, int]]:
+        for step in range(max(words_to_generate, default=0)):
+            active_rows = [row for row, word_total in enumerate(words_to_generate) if step < word_total]
+            active_windows = windows if len(active_rows) == len(windows) else windows[active_rows]
+
+            for row, token_id in zip(active_rows, self.choose_token_ids(model, active_windows, active_rows)):
+                yield row, int(token_id)
+
+    @abstractmethod
+    def choose_token_ids(self, model, windows: np.ndarray, rows: List[int]) -> np.ndarray:
+        """
+        :param model: model used to generate text
+        :param windows: token windows of the active rows
+        :param rows: row numbers of the active rows
+        :return: next token id for each active row
+        """
+
+
+class SamplingDecoder(StepDecoder):
+    """
+    samples the next word from the predicted word probabilities, reshaped by temperature, top-k and top-p (nucleus)
+    filtering; each row has its own random generator, seeded from the seed and row number, so a row's words
+    do not depend on which other rows are in the batch
+    """
+
+    def __init__(self, temperature: float = 1.0, top_k: int = 0, top_p: float = 1.0, seed: Optional[int] = None,
+                 first_row: int = 0):
+        """
+        :param temperature: values below 1 favor likely words, above 1 flatten the distribution
+        :param top_k: sample from the top_k most likely words only, 0 for all words
+        :param top_p: sample from the smallest set of most likely words whose probabilities reach top_p
+        :param seed: random seed, None for a random seed
+        :param first_row: row number of the first row, ex: a section generated on its own rather than in a batch
+        """
+        self.temperature = temperature
+        self.top_k = top_k
+        self.top_p = top_p
+        self.seed = seed
+        self.first_row = first_row
+        self._random_generators: Dict[int, np.random.Generator] = {}
+
+    def _get_random_generator(self, row: int) -> np.random.Generator:
+        if row not in self._random_generators:
+            seed = None if self.seed is None else [self.seed, self.first_row + row]
+            self._random_generators[row] = np.random.default_rng(seed)
+        return self._random_generators[row]
+
+    def get_probabilities(self, predictions: np.ndarray) -> np.ndarray:
+        """
+        apply temperature, top-k and top-p to predicted word probabilities
+
+        :param predictions: word probabilities, shape (batch size, total_words)
+        :return: sampling probabilities, shape (batch size, total_words); each row sums to 1
+        """
+        probabilities = np.asarray(predictions, dtype=np.float64).copy()
+        probabilities[:, 0] = 0  # padding, never a word
+
+        if self.temperature != 1:
+            # same as softmax(logits / temperature), computed in log space so low temperatures do not underflow
+            with np.errstate(divide='ignore'):
+                log_probabilities = np.log(probabilities) / self.temperature
+            probabilities = np.exp(log_probabilities - log_probabilities.max(axis=-1, keepdims=True))
+
+        if 0 < self.top_k < probabilities.shape[-1]:
+            kth_largest = -np.partition(-probabilities, self.top_k - 1, axis=-1)[:, self.top_k - 1:self.top_k]
+            probabilities[probabilities < kth_largest] = 0
+
+        probabilities /= probabilities.sum(axis=-1, keepdims=True)
+
+        if self.top_p < 1:
+            # keep words until the probability of the more likely words reaches top_p; the most likely word is
+            # always kept
+            order = np.argsort(-probabilities, axis=-1, kind='stable')
+            sorted_probabilities = np.take_along_axis(probabilities, order, axis=-1)
+            is_removed = np.cumsum(sorted_probabilities, axis=-1) - sorted_probabilities >= self.top_p
+            np.put_along_axis(probabilities, order, np.where(is_removed, 0, sorted_probabilities), axis=-1)
+            probabilities /= probabilities.sum(axis=-1, keepdims=True)
+
+        return probabilities
+
+    def choose_token_ids(self, model, windows: np.ndarray, rows: List[int]) -> np.ndarray:
+        probabilities = self.get_probabilities(model.predict(windows))
+        cumulative_probabilities = np.cumsum(probabilities, axis=-1)
+
+        token_ids = np.empty(len(rows), dtype=np.int64)
+        for index, row in enumerate(rows):
+            sample = self._get_random_generator(row).random() * cumulative_probabilities[index, -1]
+            token_ids[index] = np.searchsorted(cumulative_probabilities[index], sample, side='right')
+
+        # guards against rounding at the end of the cumulative probabilities
+        return np.minimum(token_ids, probabilities.shape[-1] - 1)
+
+
+class BeamSearchDecoder(Decoder):
+    """
+    keeps the beam_width most likely texts for each row, and returns the most likely one once all words are
+    generated; the beams of all rows are predicted together, as one batched prediction per step, and words are
+    only yielded once the search is done
+    """
+
+    def __init__(self, beam_width: int = 4):
+        """
+        :param beam_width: number of candidate texts kept for each row at each step
+        """
+        self.beam_width = beam_width
+
+    def iterate_token_ids(self, model, windows: np.ndarray, token_counts: List[int], words_to_generate: List[int],
+                          append_to_window: AppendToWindow) -> Iterator[Tuple[int, int]]:
+        row_count = len(windows)
+        step_count = max(words_to_generate, default=0)
+
+        # beams of row r are rows r * beam_width ... (r + 1) * beam_width - 1; each row starts with a single beam,
+        # the others are filled from its best words after the first step
+        beam_windows = np.repeat(windows, self.beam_width, axis=0)
+        beam_token_counts = np.repeat(np.asarray(token_counts, dtype=np.int64), self.beam_width)
+        beam_scores = np.full((row_count, self.beam_width), -np.inf)
+        beam_scores[:, 0] = 0
+        beam_token_ids = np.zeros((row_count, self.beam_width, step_count), dtype=np.int64)
+
+        for step in range(step_count):
+            active_rows = np.array([row for row, word_total in enumerate(words_to_generate) if step < word_total])
+            beam_indexes = (active_rows[:, np.newaxis] * self.beam_width + np.arange(self.beam_width)).ravel()
+
+            with np.errstate(divide='ignore'):
+                log_probabilities = np.log(np.asarray(model.predict(beam_windows[beam_indexes]), dtype=np.float64))
+            log_probabilities[:, 0] = -np.inf  # padding, never a word
+            total_words = log_probabilities.shape[-1]
+
+            # score of each (beam, next word), per row; the best beam_width become the new beams
+            scores = (beam_scores[active_rows].reshape(-1, 1) + log_probabilities).reshape(len(active_rows), -1)
+            best = np.argpartition(-scores, self.beam_width - 1, axis=-1)[:, :self.beam_width]
+            best = np.take_along_axis(best, np.argsort(-np.take_along_axis(scores, best, axis=-1), axis=-1,
+                                                       kind='stable'), axis=-1)
+            parent_beams, next_token_ids = best // total_words, best % total_words
+
+            parent_indexes = (active_rows[:, np.newaxis] * self.beam_width + parent_beams).ravel()
+            next_windows = beam_windows[parent_indexes]
+            next_token_counts = beam_token_counts[parent_indexes]
+            for index, token_id in enumerate(next_token_ids.ravel()):
+                append_to_window(next_windows[index], int(next_token_counts[index]), int(token_id))
+            beam_windows[beam_indexes] = next_windows
+            beam_token_counts[beam_indexes] = next_token_counts + 1
+
+            beam_scores[active_rows] = np.take_along_axis(scores, best, axis=-1)
+            beam_token_ids[active_rows] = np.take_along_axis(beam_token_ids[active_rows],
+                                                             parent_beams[:, :, np.newaxis], axis=1)
+            beam_token_ids[active_rows, :, step] = next_token_ids
+
+        for row in range(row_count):
+            best_beam = int(np.argmax(beam_scores[row]))
+            for token_id in beam_token_ids[row, best_beam, :words_to_generate[row]]:
+                yield row, int(token_id)
+
@@ -0,0 +1,179 @@
+import csv
+import importlib
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+import tensorflow as tf
+from tensorflow import keras
+
+import lyrics_model as lm
+from catalog import Catalog
+from lyrics_predictor import LyricsPredictor
+
+# hyperparameters used when tokenizing, shared by all trials, so they cannot vary within a sweep
+CATALOG_HYPERPARAMETERS = ('hp_sparse_labels', 'hp_streaming_dataset')
+
+# set in each worker process by _init_worker
+_model_class: Optional[type] = None
+_model_config_path: Optional[str] = None
+_catalog: Optional[Catalog] = None
+
+
+def _get_model_class(model_class_name: str) -> type:
+    # ex: lyrics_model.LyricsModel, shakespeare_sonnet_model.ShakespeareSonnetModel
+    module_name, class_name = model_class_name.rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def get_hyperparameter_values(values) -> List:
+    """
+    expand the values of one hyperparameter
+
+    :param values: list of values, or a range as {"min": ..., "max": ..., "step": ...}, including max
+    :return: list of values
+    """
+    if not isinstance(values, dict):
+        return list(values)
+
+    step_count = int(round((values['max'] - values['min']) / values['step']))
+    return [values['min'] + step * values['step'] for step in range(step_count + 1)]
+
+
+def get_trials(hyperparameters: Dict) -> List[Dict]:
+    """
+    expand a grid of hyperparameter values into trials
+
+    :param hyperparameters: values for each hyperparameter (ex: {"hp_lstm_units": [100, 150]})
+    :return: hyperparameters of each trial, for every combination of values
+    """
+    invalid_names = [name for name in hyperparameters if name in CATALOG_HYPERPARAMETERS]
+    if invalid_names:
+        raise ValueError(f'hyperparameters shared by all trials cannot be swept: {", ".join(invalid_names)}')
+
+    names = list(hyperparameters)
+    value_lists = [get_hyperparameter_values(hyperparameters[name]) for name in names]
+    return [dict(zip(names, values)) for values in itertools.product(*value_lists)]
+
+
+def _init_worker(model_class_name: str, model_config_path: str, catalog: Catalog, threads_per_trial: int) -> None:
+    global _model_class, _model_config_path, _catalog
+
+    # trials run side by side, so each one is limited to its share of the CPUs
+    tf.config.threading.set_intra_op_parallelism_threads(threads_per_trial)
+    tf.config.threading.set_inter_op_parallelism_threads(threads_per_trial)
+
+    _model_class = _get_model_class(model_class_name)
+    _model_config_path = model_config_path
+    _catalog = catalog
+
+
+def _get_ms_per_token(model: keras.Sequential, catalog: Catalog, seed_text: str, word_count: int) -> float:
+    predictor = LyricsPredictor(model, catalog.max_sequence_length - 1)
+    catalog.generate_lyrics_text(predictor, seed_text, word_count)  # warm up: tracing
+
+    start = time.perf_counter()
+    catalog.generate_lyrics_text(predictor, seed_text, word_count)
+    seconds = time.perf_counter() - start
+
+    return seconds / (word_count - len(seed_text.split(' '))) * 1000
+
+
+def _run_trial(trial_number: int, hyperparameters: Dict) -> Dict:
+    lyrics_model = _model_class(_model_config_path, _catalog)
+    lyrics_model.config.update(hyperparameters)
+    lyrics_model.config['is_interactive'] = False
+    lyrics_model.is_interactive = False
+
+    # same initial weights and data order for every trial, so results differ by hyperparameters only
+    keras.utils.set_random_seed(lyrics_model.config['random_state'])
+
+    start = time.perf_counter()
+    model, history = lyrics_model.train_model()
+    train_seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as temp_directory:
+        model_path = os.path.join(temp_directory, 'model.h5')
+        model.save(model_path)
+        model_mb = os.path.getsize(model_path) / 1024 / 1024
+
+    val_losses = history.history['val_loss']
+    return {
+        'trial': trial_number,
+        **hyperparameters,
+        'val_loss': min(val_losses),
+        'best_epoch': val_losses.index(min(val_losses)) + 1,
+        'epochs': len(val_losses),
+        'train_seconds': train_seconds,
+        'samples_per_second': max(history.history['samples_per_second']),
+        'parameters': model.count_params(),
+        'model_mb': model_mb,
+        'ms_per_token': _get_ms_per_token(model, lyrics_model.catalog, lyrics_model.config['seed_text'],
+                                          lyrics_model.config['word_count']),
+    }
+
+
+def _format_value(value) -> str:
+    return f'{value:.4g}' if isinstance(value, float) else str(value)
+
+
+def run_sweep(sweep_config_file: str) -> List[Dict]:
+    """
+    train a model for each combination of hyperparameter values, as trials in a pool of processes, and save a
+    results table; the catalog is tokenized once, and shared by all trials
+
+    :param sweep_config_file: json config file with the model config, hyperparameter values and pool settings
+    :return: results of each trial, sorted by val_loss
+    """
+    with open(sweep_config_file) as json_file:
+        sweep_config = json.load(json_file)
+
+    trials = get_trials(sweep_config['hyperparameters'])
+    model_class_name = sweep_config['model_class']
+    model_config_path = sweep_config['model_config_path']
+    catalog = _get_model_class(model_class_name)(model_config_path).catalog
+
+    print(f'{len(trials)} trials, {sweep_config["max_workers"]} workers')
+
+    # spawned rather than forked, since the TensorFlow runtime (used for tokenizing) is not fork-safe
+    results = []
+    with ProcessPoolExecutor(max_workers=int(sweep_config['max_workers']),
+                             mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker,
+                             initargs=(model_class_name, model_config_path, catalog,
+                                       int(sweep_config['threads_per_trial']))) as executor:
+        futures = [executor.submit(_run_trial, trial_number, hyperparameters)
+                   for trial_number, hyperparameters in enumerate(trials, start=1)]
+        for future in as_completed(futures):
+            result = future.result()
+            print(f'trial {result["trial"]} done: val_loss {result["val_loss"]:.4f}, '
+                  f'{result["train_seconds"]:.0f} seconds')
+            results.append(result)
+
+    results.sort(key=lambda trial_result: trial_result['val_loss'])
+
+    with open(sweep_config['results_path'], 'w', newline='') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=list(results[0]))
+        writer.writeheader()
+        writer.writerows(results)
+
+    print('\t'.join(results[0]))
+    for result in results:
+        print('\t'.join(_format_value(value) for value in result.values()))
+
+    return results
+
+
+def main():
+    lm.tensorflow_diagnostics()
+    run_sweep(sys.argv[1] if len(sys.argv) > 1 else 'poe_poem_sweep_config.json')
+
+
+if __name__ == '__main__':
+    main()
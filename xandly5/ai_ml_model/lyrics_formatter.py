@@ -1,3 +1,5 @@
+from typing import Iterable, Iterator
+
 
 class LyricsFormatter:
 
@@ -11,21 +13,33 @@ class LyricsFormatter:
 
         :return: formatted lyric text
         """
-        words = lyric_text.split(' ')
-        formatted_lyrics = ''
+        return ''.join(LyricsFormatter.iterate_formatted_lyrics(lyric_text.split(' '), word_group_count))
+
+    @staticmethod
+    def iterate_formatted_lyrics(words: Iterable[str], word_group_count: int = 4) -> Iterator[str]:
+        """
+        format lyrics incrementally, for streaming; each word is yielded once the next word arrives,
+        since the last word is formatted differently
 
+        :param words: words to be formatted, ex: from a generator
+        :param word_group_count: number of words to group by for formatting
+
+        :return: iterator of formatted words, which join to the same text as format_lyrics
+        """
+        word_iterator = iter(words)
+        word = next(word_iterator, None)
         word_index = 0
 
-        for word in words:
+        while word is not None:
             word_index += 1
-            formatted_lyrics += word
-            is_last_word = (word_index == len(words))
+            next_word = next(word_iterator, None)
+            is_last_word = next_word is None
 
             if is_last_word or word_index % (word_group_count * 2) == 0:
-                formatted_lyrics += ' \n\n'
+                yield word + ' \n\n'
             elif word_index % word_group_count == 0:
-                formatted_lyrics += ',\n  '
+                yield word + ',\n  '
             else:
-                formatted_lyrics += ' '
+                yield word + ' '
 
-        return formatted_lyrics
+            word = next_word
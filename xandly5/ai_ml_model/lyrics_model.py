@@ -1,4 +1,7 @@
 import json
+import time
+from typing import List, Optional, Tuple
+
 import tensorflow as tf
 
 from tensorflow import keras
@@ -8,6 +11,8 @@ from ptmlib.time import Stopwatch
 from ptmlib import charts as pch
 from catalog import Catalog
 from lyrics_formatter import LyricsFormatter
+from numpy_lyrics_predictor import NumpyLyricsPredictor
+from tflite_lyrics_predictor import TFLiteLyricsPredictor
 
 
 def tensorflow_diagnostics():
@@ -15,22 +20,57 @@ def tensorflow_diagnostics():
     print('TF PHYSICAL_DEVICES:', tf.config.list_physical_devices())
 
 
+class ThroughputLogger(keras.callbacks.Callback):
+
+    def __init__(self, samples_per_epoch: int):
+        """
+        logs the training throughput of each epoch, in samples per second
+
+        :param samples_per_epoch: number of training samples in each epoch
+        """
+        super().__init__()
+        self.samples_per_epoch = samples_per_epoch
+        self._epoch_start = 0.0
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch_start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        # includes the validation pass, which is part of each epoch's time
+        samples_per_second = self.samples_per_epoch / (time.perf_counter() - self._epoch_start)
+        if logs is not None:
+            logs['samples_per_second'] = samples_per_second
+        print(f'epoch {epoch + 1}: {samples_per_second:.0f} samples/sec')
+
+
 class LyricsModel:
 
-    def __init__(self, config_file):
+    def __init__(self, config_file: str, catalog: Optional[Catalog] = None):
         """
         Trains and saves a model using Keras and TensorFlow
 
         :param config_file: json config file with settings including hyperparameters
+        :param catalog: optional catalog tokenized with this config's settings (ex: shared by the trials of a
+            hyperparameter sweep); None to tokenize the config's lyrics file
         """
 
         with open(config_file) as json_file:
             self.config = json.load(json_file)
-        self.catalog = Catalog()
-        self.catalog.add_file_to_catalog(self.config['lyrics_file_path'])
-        self.catalog.tokenize_catalog()
+        if catalog is None:
+            catalog = Catalog()
+            # a file, directory or glob pattern, ex: lyrics_files/*.txt.gz
+            catalog.add_files_to_catalog(self.config['lyrics_file_path'])
+            catalog.tokenize_catalog(sparse_labels=self.config['hp_sparse_labels'],
+                                     build_features=not self.config['hp_streaming_dataset'])
+        self.catalog = catalog
         self.is_interactive = self.config['is_interactive']
 
+    def _get_loss(self) -> str:
+        # integer labels need the sparse version of the loss; both work with the same softmax output
+        if self.config['hp_sparse_labels']:
+            return 'sparse_categorical_crossentropy'
+        return 'categorical_crossentropy'
+
     def _get_compiled_model(self) -> keras.Sequential:
 
         total_words = self.catalog.total_words
@@ -41,17 +81,78 @@ class LyricsModel:
         model = keras.Sequential([
             keras.layers.Embedding(total_words, dimensions, input_length=input_length),
             keras.layers.Bidirectional(keras.layers.LSTM(units)),
-            keras.layers.Dense(total_words, activation='softmax')
+            # softmax in float32, since float16/bfloat16 probabilities lose precision over large vocabularies
+            keras.layers.Dense(total_words, activation='softmax', dtype='float32')
         ])
 
-        model.compile(loss='categorical_crossentropy', optimizer='adam', metrics=['accuracy'])
+        model.compile(loss=self._get_loss(), optimizer='adam', metrics=['accuracy'])
 
         if self.is_interactive:
             model.summary()
 
         return model
 
-    def _train_model(self, model: keras.Sequential):
+    def _count_ngrams(self, catalog_items: List[str]) -> int:
+        # each line of n tokens has n - 1 n-grams
+        return sum(max(len(token_list) - 1, 0) for token_list in
+                   self.catalog.tokenizer.texts_to_sequences_generator(catalog_items))
+
+    def _get_datasets(self) -> Tuple[tf.data.Dataset, tf.data.Dataset, int]:
+
+        batch_size = self.config['hp_batch_size']
+        is_streaming = self.config['hp_streaming_dataset']
+
+        cache_dataset = self.config['hp_cache_dataset']
+        if cache_dataset is None:
+            # by default only in-memory data is cached: a cached streaming dataset keeps every n-gram in memory
+            cache_dataset = not is_streaming
+
+        if is_streaming:
+            # split by line rather than by n-gram, since n-grams are only generated as the datasets are read
+            train_items, valid_items = train_test_split(
+                self.catalog.catalog_items,
+                test_size=self.config['hp_test_size'],
+                random_state=self.config['random_state']
+            )
+
+            # labels are word indexes until batched, so the cache and shuffle buffer do not hold one-hot labels
+            train_dataset = self.catalog.get_ngram_dataset(train_items, sparse_labels=True)
+            valid_dataset = self.catalog.get_ngram_dataset(valid_items, sparse_labels=True)
+            train_sample_count = self._count_ngrams(train_items)
+            shuffle_buffer_size = self.config['hp_shuffle_buffer_size']
+        else:
+            x_train, x_valid, y_train, y_valid = train_test_split(
+                self.catalog.features, self.catalog.labels,
+                test_size=self.config['hp_test_size'],
+                random_state=self.config['random_state']
+            )
+
+            train_dataset = tf.data.Dataset.from_tensor_slices((x_train, y_train))
+            valid_dataset = tf.data.Dataset.from_tensor_slices((x_valid, y_valid))
+            train_sample_count = len(x_train)
+            shuffle_buffer_size = train_sample_count  # all in memory already: a full shuffle, as model.fit does
+
+        if cache_dataset:
+            # n-grams are generated (or sliced) once, in the first epoch, and read from memory afterwards
+            train_dataset = train_dataset.cache()
+            valid_dataset = valid_dataset.cache()
+
+        train_dataset = train_dataset \
+            .shuffle(shuffle_buffer_size, seed=self.config['random_state'], reshuffle_each_iteration=True) \
+            .batch(batch_size)
+        valid_dataset = valid_dataset.batch(batch_size)
+
+        if is_streaming and not self.config['hp_sparse_labels']:
+            total_words = self.catalog.total_words
+            train_dataset = train_dataset.map(lambda features, labels: (features, tf.one_hot(labels, total_words)))
+            valid_dataset = valid_dataset.map(lambda features, labels: (features, tf.one_hot(labels, total_words)))
+
+        train_dataset = train_dataset.prefetch(tf.data.AUTOTUNE)
+        valid_dataset = valid_dataset.prefetch(tf.data.AUTOTUNE)
+
+        return train_dataset, valid_dataset, train_sample_count
+
+    def _train_model(self, model: keras.Sequential) -> keras.callbacks.History:
 
         early_stopping = keras.callbacks.EarlyStopping(
             monitor='val_loss',
@@ -60,22 +161,17 @@ class LyricsModel:
             mode='min'
         )
 
+        train_dataset, valid_dataset, train_sample_count = self._get_datasets()
+
         stopwatch = Stopwatch()
         stopwatch.start()
 
-        x_train, x_valid, y_train, y_valid = train_test_split(
-            self.catalog.features, self.catalog.labels,
-            test_size=self.config['hp_test_size'],
-            random_state=self.config['random_state']
-        )
-
         history = model.fit(
-            self.catalog.features,
-            self.catalog.labels,
-            validation_data=(x_valid, y_valid),
+            train_dataset,
+            validation_data=valid_dataset,
             epochs=self.config['hp_epochs'],
-            verbose=1,
-            callbacks=[early_stopping]
+            verbose=1 if self.is_interactive else 2,  # one line per epoch, ex: for concurrent sweep trials
+            callbacks=[early_stopping, ThroughputLogger(train_sample_count)]
         )
 
         stopwatch.stop(silent=not self.is_interactive)
@@ -84,6 +180,8 @@ class LyricsModel:
             pch.show_history_chart(history, 'accuracy', save_fig_enabled=self.config['save_chart'])
             pch.show_history_chart(history, 'loss', save_fig_enabled=self.config['save_chart'])
 
+        return history
+
     def _generate_sample_lyrics(self, model: keras.Sequential):
 
         lyrics_text = self.catalog.generate_lyrics_text(
@@ -99,13 +197,41 @@ class LyricsModel:
             lyrics_file.write(lyrics)
             lyrics_file.close()
 
+    def train_model(self) -> Tuple[keras.Sequential, keras.callbacks.History]:
+
+        """
+        train a model with the config's hyperparameters, without saving it
+
+        :return: trained float32 model, training history
+        """
+
+        # mixed precision: layers compute in float16 or bfloat16, and keep their weights in float32
+        keras.mixed_precision.set_global_policy(self.config['hp_precision_policy'])
+        try:
+            model = self._get_compiled_model()
+            history = self._train_model(model)
+        finally:
+            keras.mixed_precision.set_global_policy('float32')
+
+        if self.config['hp_precision_policy'] != 'float32':
+            # a float32 model, so prediction and the exported models do not depend on the training precision
+            trained_model = model
+            model = self._get_compiled_model()
+            model.set_weights(trained_model.get_weights())
+
+        return model, history
+
     def generate_model(self):
 
         """
-        train and save a model
+        train and save a model, along with the catalog file needed for prediction, the weights for NumPy inference,
+        and quantized TFLite models
         """
 
-        model = self._get_compiled_model()
-        self._train_model(model)
+        model, _ = self.train_model()
         model.save(self.config['saved_model_path'])
+        self.catalog.save_catalog_file(self.config['saved_catalog_path'])
+        NumpyLyricsPredictor.save_npz_file(model, self.config['saved_npz_path'])
+        for quantization, tflite_path in self.config['saved_tflite_paths'].items():
+            TFLiteLyricsPredictor.save_tflite_file(model, tflite_path, quantization)
         self._generate_sample_lyrics(model)
@@ -0,0 +1,70 @@
+from typing import Optional
+
+import numpy as np
+import tensorflow as tf
+
+from tensorflow import keras
+
+
+class LyricsPredictor:
+    """
+    single-step inference for a trained lyrics model, used in place of keras.Model.predict;
+    predict() builds a tf.data pipeline and callbacks on every call, which dominates the cost of a small input
+    """
+
+    def __init__(self, model: keras.Sequential, input_length: int, candidate_ids: Optional[np.ndarray] = None):
+        """
+        :param model: trained model used to predict the next word
+        :param input_length: length of the padded token window (max_sequence_length - 1)
+        :param candidate_ids: optional word indexes that predict_next_words can return; None for all words
+        """
+        self.model = model
+        self.input_length = input_length
+        self.candidate_ids = candidate_ids
+
+        # the output layer is applied separately by predict_next_words, as logits for the candidate words only
+        output_layer = model.layers[-1]
+        if candidate_ids is None:
+            self._output_kernel, self._output_bias = output_layer.kernel, output_layer.bias
+        else:
+            self._output_kernel = tf.constant(output_layer.get_weights()[0][:, candidate_ids])
+            self._output_bias = tf.constant(output_layer.get_weights()[1][candidate_ids])
+            self._candidate_ids = tf.constant(candidate_ids, dtype=tf.int64)
+
+        # fixed signature, so each function is traced once and reused for any batch size
+        input_signature = [tf.TensorSpec(shape=(None, input_length), dtype=tf.int32)]
+        self._predict_function = tf.function(self._call_model, input_signature=input_signature)
+        self._predict_next_words_function = tf.function(self._call_model_argmax, input_signature=input_signature)
+
+    def _call_model(self, token_windows: tf.Tensor) -> tf.Tensor:
+        return self.model(token_windows, training=False)
+
+    def _call_model_argmax(self, token_windows: tf.Tensor) -> tf.Tensor:
+        hidden = token_windows
+        for layer in self.model.layers[:-1]:
+            hidden = layer(hidden, training=False)
+
+        # softmax is monotonic, so the argmax of the logits is the argmax of the word probabilities
+        logits = tf.matmul(hidden, self._output_kernel) + self._output_bias
+        word_indexes = tf.argmax(logits, axis=-1)
+        if self.candidate_ids is not None:
+            word_indexes = tf.gather(self._candidate_ids, word_indexes)
+        return word_indexes
+
+    def predict(self, token_windows: np.ndarray) -> np.ndarray:
+        """
+        predict next word probabilities; same input and output as keras.Model.predict
+
+        :param token_windows: padded token ids, shape (batch size, input_length)
+        :return: word probabilities, shape (batch size, total_words)
+        """
+        return self._predict_function(tf.convert_to_tensor(token_windows, dtype=tf.int32)).numpy()
+
+    def predict_next_words(self, token_windows: np.ndarray) -> np.ndarray:
+        """
+        predict the most likely next word, without computing the softmax over all words
+
+        :param token_windows: padded token ids, shape (batch size, input_length)
+        :return: word indexes, shape (batch size,)
+        """
+        return self._predict_next_words_function(tf.convert_to_tensor(token_windows, dtype=tf.int32)).numpy()
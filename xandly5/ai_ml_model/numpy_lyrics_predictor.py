@@ -0,0 +1,205 @@
+from typing import Dict, List, Mapping, Optional
+
+import numpy as np
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    # same as 1 / (1 + exp(-x)), without overflow for large negative values
+    return 0.5 * (1 + np.tanh(0.5 * x))
+
+
+class NumpyLyricsPredictor:
+    """
+    CPU inference for trained lyrics models (Embedding -> Bidirectional LSTM(s) -> Dense softmax) using only NumPy,
+    so models can be served without loading TensorFlow; weights are exported from a keras model to an .npz file
+    with save_npz_file, then loaded with from_npz_file
+    """
+
+    def __init__(self, embeddings: np.ndarray, lstm_weights: List[List[np.ndarray]], dense_kernel: np.ndarray,
+                 dense_bias: np.ndarray, input_length: int, candidate_ids: Optional[np.ndarray] = None):
+        """
+        :param embeddings: embedding matrix, shape (total_words, output dimensions)
+        :param lstm_weights: for each Bidirectional LSTM layer, the keras weights: forward kernel, recurrent kernel
+            and bias, then backward kernel, recurrent kernel and bias
+        :param dense_kernel: output layer kernel, shape (2 * lstm units, total_words)
+        :param dense_bias: output layer bias, shape (total_words,)
+        :param input_length: length of the padded token window (max_sequence_length - 1)
+        :param candidate_ids: optional word indexes that predict_next_words can return; None for all words
+        """
+        self.lstm_weights = [[self._reorder_gates(weights.astype(np.float32)) for weights in layer_weights]
+                             for layer_weights in lstm_weights]
+        self.dense_kernel = dense_kernel.astype(np.float32)
+        self.dense_bias = dense_bias.astype(np.float32)
+        self.input_length = input_length
+        self.total_words = dense_kernel.shape[-1]
+        self.candidate_ids = candidate_ids
+
+        # output layer columns for the candidate words only, used by predict_next_words
+        if candidate_ids is None:
+            self._candidate_kernel, self._candidate_bias = self.dense_kernel, self.dense_bias
+        else:
+            self._candidate_kernel = np.ascontiguousarray(self.dense_kernel[:, candidate_ids])
+            self._candidate_bias = self.dense_bias[candidate_ids]
+
+        # the first LSTM layer's input projection only depends on the token id, so it is computed once per word;
+        # this replaces the embedding lookup and the largest matrix multiply of each step with a table lookup
+        forward_kernel, _, forward_bias, backward_kernel, _, backward_bias = self.lstm_weights[0]
+        embeddings = embeddings.astype(np.float32)
+        self._forward_projections = embeddings @ forward_kernel + forward_bias
+        self._backward_projections = embeddings @ backward_kernel + backward_bias
+
+    @classmethod
+    def from_npz_file(cls, file_name: str, candidate_ids: Optional[np.ndarray] = None) -> 'NumpyLyricsPredictor':
+        """
+        load weights saved with save_npz_file
+
+        :param file_name: npz file name
+        :param candidate_ids: optional word indexes that predict_next_words can return; None for all words
+        :return: NumpyLyricsPredictor
+        """
+        with np.load(file_name) as weights:
+            return cls._from_weights(weights, candidate_ids)
+
+    @classmethod
+    def from_keras_model(cls, model, candidate_ids: Optional[np.ndarray] = None) -> 'NumpyLyricsPredictor':
+        """
+        copy the weights of a trained keras model, without saving an npz file
+
+        :param model: trained keras model
+        :param candidate_ids: optional word indexes that predict_next_words can return; None for all words
+        :return: NumpyLyricsPredictor
+        """
+        return cls._from_weights(cls._get_keras_weights(model), candidate_ids)
+
+    @staticmethod
+    def save_npz_file(model, file_name: str) -> None:
+        """
+        export the weights of a trained keras model to a flat npz file
+
+        :param model: trained keras model
+        :param file_name: npz file name
+        :return: None
+        """
+        np.savez(file_name, **NumpyLyricsPredictor._get_keras_weights(model))
+
+    @classmethod
+    def _from_weights(cls, weights: Mapping[str, np.ndarray],
+                      candidate_ids: Optional[np.ndarray]) -> 'NumpyLyricsPredictor':
+        lstm_weights = [[weights[f'lstm_{layer}_{index}'] for index in range(6)]
+                        for layer in range(int(weights['lstm_layer_count']))]
+        return cls(weights['embeddings'], lstm_weights, weights['dense_kernel'], weights['dense_bias'],
+                   int(weights['input_length']), candidate_ids)
+
+    @staticmethod
+    def _get_keras_weights(model) -> Dict[str, np.ndarray]:
+        # only the Embedding -> Bidirectional LSTM(s) -> Dense softmax architectures used by LyricsModel and its
+        # child models are supported
+        layer_names = [layer.__class__.__name__ for layer in model.layers]
+        if len(layer_names) < 3 or layer_names[0] != 'Embedding' or layer_names[-1] != 'Dense' or \
+                any(layer_name != 'Bidirectional' for layer_name in layer_names[1:-1]):
+            raise ValueError(f'unsupported model layers: {layer_names}')
+
+        bidirectional_layers = model.layers[1:-1]
+        for layer_number, layer in enumerate(bidirectional_layers, start=1):
+            lstm_config = layer.forward_layer.get_config()
+            is_last_lstm = layer_number == len(bidirectional_layers)
+            if layer.forward_layer.__class__.__name__ != 'LSTM' or layer.merge_mode != 'concat' or \
+                    lstm_config['activation'] != 'tanh' or lstm_config['recurrent_activation'] != 'sigmoid' or \
+                    not lstm_config['use_bias'] or lstm_config['return_sequences'] == is_last_lstm:
+                raise ValueError(f'unsupported Bidirectional layer: {layer.name}')
+
+        if model.layers[-1].get_config()['activation'] != 'softmax':
+            raise ValueError(f'unsupported output activation: {model.layers[-1].get_config()["activation"]}')
+
+        weights = {
+            'embeddings': model.layers[0].get_weights()[0],
+            'dense_kernel': model.layers[-1].get_weights()[0],
+            'dense_bias': model.layers[-1].get_weights()[1],
+            'input_length': np.array(model.input_shape[-1]),
+            'lstm_layer_count': np.array(len(bidirectional_layers))
+        }
+        for layer_number, layer in enumerate(bidirectional_layers):
+            for index, layer_weights in enumerate(layer.get_weights()):
+                weights[f'lstm_{layer_number}_{index}'] = layer_weights
+
+        return weights
+
+    @staticmethod
+    def _reorder_gates(weights: np.ndarray) -> np.ndarray:
+        # keras gate order is (input, forget, cell, output); (input, forget, output, cell) puts the three sigmoid
+        # gates next to each other, so each step needs one sigmoid and one tanh call on the gates
+        units = weights.shape[-1] // 4
+        return np.concatenate([weights[..., :units * 2], weights[..., units * 3:], weights[..., units * 2:units * 3]],
+                              axis=-1)
+
+    @staticmethod
+    def _run_lstm(input_projections: np.ndarray, recurrent_kernel: np.ndarray,
+                  return_sequences: bool) -> np.ndarray:
+        # input_projections: inputs @ kernel + bias, shape (batch size, steps, 4 * units); gate order: i, f, o, c
+        batch_size, steps, _ = input_projections.shape
+        units = recurrent_kernel.shape[0]
+
+        hidden = np.zeros((batch_size, units), dtype=np.float32)
+        cell = np.zeros((batch_size, units), dtype=np.float32)
+        outputs = np.empty((batch_size, steps, units), dtype=np.float32) if return_sequences else None
+
+        for step in range(steps):
+            gates = input_projections[:, step] + hidden @ recurrent_kernel
+            sigmoid_gates = _sigmoid(gates[:, :units * 3])
+            cell = sigmoid_gates[:, units:units * 2] * cell + sigmoid_gates[:, :units] * np.tanh(gates[:, units * 3:])
+            hidden = sigmoid_gates[:, units * 2:] * np.tanh(cell)
+            if return_sequences:
+                outputs[:, step] = hidden
+
+        return outputs if return_sequences else hidden
+
+    def _get_lstm_output(self, token_windows: np.ndarray) -> np.ndarray:
+        # each Bidirectional layer runs forward over the sequence, and backward over the reversed sequence;
+        # outputs are concatenated (forward, backward), with backward sequences reversed to line up by step
+        forward_projections = self._forward_projections[token_windows]
+        backward_projections = self._backward_projections[token_windows[:, ::-1]]
+
+        for layer_number, layer_weights in enumerate(self.lstm_weights):
+            _, forward_recurrent, _, _, backward_recurrent, _ = layer_weights
+            return_sequences = layer_number < len(self.lstm_weights) - 1
+
+            forward_output = self._run_lstm(forward_projections, forward_recurrent, return_sequences)
+            backward_output = self._run_lstm(backward_projections, backward_recurrent, return_sequences)
+            if not return_sequences:
+                return np.concatenate([forward_output, backward_output], axis=-1)
+
+            # project all steps with one 2D matrix multiply; the backward projections are reversed afterwards
+            batch_size, steps, _ = forward_output.shape
+            layer_output = np.concatenate([forward_output, backward_output[:, ::-1]], axis=-1)
+            layer_output = layer_output.reshape(batch_size * steps, -1)
+            next_forward_kernel, _, next_forward_bias, next_backward_kernel, _, next_backward_bias = \
+                self.lstm_weights[layer_number + 1]
+            forward_projections = layer_output @ next_forward_kernel + next_forward_bias
+            forward_projections = forward_projections.reshape(batch_size, steps, -1)
+            backward_projections = layer_output @ next_backward_kernel + next_backward_bias
+            backward_projections = backward_projections.reshape(batch_size, steps, -1)[:, ::-1]
+
+    def predict(self, token_windows: np.ndarray) -> np.ndarray:
+        """
+        predict next word probabilities; same input and output as keras.Model.predict
+
+        :param token_windows: padded token ids, shape (batch size, input_length)
+        :return: word probabilities, shape (batch size, total_words)
+        """
+        logits = self._get_lstm_output(np.asarray(token_windows)) @ self.dense_kernel + self.dense_bias
+        logits -= logits.max(axis=-1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=-1, keepdims=True)
+        return probabilities
+
+    def predict_next_words(self, token_windows: np.ndarray) -> np.ndarray:
+        """
+        predict the most likely next word, without computing the softmax over all words
+
+        :param token_windows: padded token ids, shape (batch size, input_length)
+        :return: word indexes, shape (batch size,)
+        """
+        # softmax is monotonic, so the argmax of the logits is the argmax of the word probabilities
+        logits = self._get_lstm_output(np.asarray(token_windows)) @ self._candidate_kernel + self._candidate_bias
+        word_indexes = np.argmax(logits, axis=-1)
+        return word_indexes if self.candidate_ids is None else self.candidate_ids[word_indexes]
@@ -1,12 +1,15 @@
 
+from typing import Optional
+
 import lyrics_model as lm
 from tensorflow import keras
+from catalog import Catalog
 
 
 class ShakespeareSonnetModel(lm.LyricsModel):
 
-    def __init__(self, config_file: str):
-        super().__init__(config_file)
+    def __init__(self, config_file: str, catalog: Optional[Catalog] = None):
+        super().__init__(config_file, catalog)
 
     def _get_compiled_model(self) -> keras.Sequential:
 
@@ -15,10 +18,11 @@ class ShakespeareSonnetModel(lm.LyricsModel):
                                    input_length=self.catalog.max_sequence_length - 1),
             keras.layers.Bidirectional(keras.layers.LSTM(self.config['hp_lstm_units'], return_sequences=True)),
             keras.layers.Bidirectional(keras.layers.LSTM(self.config['hp_lstm_units'])),
-            keras.layers.Dense(self.catalog.total_words, activation='softmax')
+            # softmax in float32, since float16/bfloat16 probabilities lose precision over large vocabularies
+            keras.layers.Dense(self.catalog.total_words, activation='softmax', dtype='float32')
         ])
 
-        model.compile(loss='categorical_crossentropy', optimizer='adam', metrics=['accuracy'])
+        model.compile(loss=self._get_loss(), optimizer='adam', metrics=['accuracy'])
 
         if self.is_interactive:
             model.summary()
@@ -0,0 +1,94 @@
+import os
+import time
+import unittest
+
+import numpy as np
+
+from xandly5.ai_ml_model.batching_scheduler import BatchingScheduler
+from xandly5.ai_ml_model.catalog import Catalog
+from xandly5.types.lyrics_model_meta import LyricsModelMeta
+
+
+class _SumPredictor:
+
+    @staticmethod
+    def predict(token_windows: np.ndarray) -> np.ndarray:
+        return token_windows.sum(axis=1, keepdims=True)
+
+
+class _NextWordPredictor:
+
+    def __init__(self, total_words: int):
+        self.total_words = total_words
+
+    def predict(self, token_windows: np.ndarray) -> np.ndarray:
+        return np.eye(self.total_words)[self.predict_next_words(token_windows)]
+
+    def predict_next_words(self, token_windows: np.ndarray) -> np.ndarray:
+        return token_windows.sum(axis=1) % (self.total_words - 1) + 1
+
+
+class BatchingSchedulerTestCase(unittest.TestCase):
+
+    def test_slow_stream_consumer_does_not_throttle_other_generations(self):
+
+        # ARRANGE
+        catalog = Catalog()
+        catalog.catalog_items = ['once upon a midnight dreary\n', 'while i pondered weak and weary\n']
+        catalog.tokenize_catalog(build_features=False)
+        lyrics_model = LyricsModelMeta('', '', '', '')
+        lyrics_model.catalog = catalog
+        lyrics_model.predictor = _NextWordPredictor(catalog.total_words)
+        max_wait_seconds = 1.0
+        lyrics_model.scheduler = BatchingScheduler(lyrics_model.predictor, max_wait_ms=max_wait_seconds * 1000)
+
+        # a streamed generation whose client has read one word, and stopped reading
+        stream = lyrics_model.generate_lyrics_words('once upon', 50)
+        next(stream)
+
+        # ACT
+        start = time.perf_counter()
+        lyrics = lyrics_model.generate_lyrics_text('while i', 12)
+        seconds = time.perf_counter() - start
+        stream.close()
+        lyrics_model.close()
+
+        # ASSERT
+        # 10 predictions; each would wait up to max_wait_seconds for a word from the stream if it stayed registered
+        self.assertEqual(12, len(lyrics.split()))
+        self.assertLess(seconds, max_wait_seconds)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'os.fork() is not available')
+    def test_predict_in_forked_process(self):
+
+        # ARRANGE
+        scheduler = BatchingScheduler(_SumPredictor())
+        token_windows = np.array([[1, 2, 3], [4, 5, 6]])
+        read_fd, write_fd = os.pipe()
+
+        # ACT
+        pid = os.fork()
+        if pid == 0:
+            # child: the scheduler was created before fork(), its background thread must be started in this process
+            os.close(read_fd)
+            exit_code = 1
+            try:
+                os.write(write_fd, scheduler.predict(token_windows).astype(np.int64).tobytes())
+                exit_code = 0
+            finally:
+                os._exit(exit_code)
+        os.close(write_fd)
+        with os.fdopen(read_fd, 'rb') as read_file:
+            child_predictions = np.frombuffer(read_file.read(), dtype=np.int64)
+        _, status = os.waitpid(pid, 0)
+        parent_predictions = scheduler.predict(token_windows)
+        scheduler.close()
+
+        # ASSERT
+        self.assertEqual(0, os.waitstatus_to_exitcode(status))
+        np.testing.assert_array_equal([6, 15], child_predictions)
+        np.testing.assert_array_equal([[6], [15]], parent_predictions)
+
+
+if __name__ == '__main__':
+    unittest.main()
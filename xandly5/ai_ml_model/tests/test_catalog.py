@@ -0,0 +1,331 @@
+import gzip
+import os
+import pickle
+import tempfile
+import tracemalloc
+import unittest
+from typing import List
+
+import numpy as np
+from tensorflow.keras.preprocessing.sequence import pad_sequences
+from tensorflow.keras.preprocessing.text import Tokenizer
+
+from xandly5.ai_ml_model.catalog import Catalog, LyricsSession, WordTokenizer
+
+
+class WindowSumModel:
+    # deterministic stand-in for a trained model: the next word depends on every token in the window
+    def __init__(self, total_words: int):
+        self.total_words = total_words
+
+    def predict(self, token_windows: np.ndarray) -> np.ndarray:
+        weights = np.arange(1, token_windows.shape[1] + 1)
+        predicted = (token_windows @ weights) % (self.total_words - 1) + 1
+        return np.eye(self.total_words)[predicted]
+
+
+class CatalogTestCase(unittest.TestCase):
+
+    LYRICS_FILES: List[str] = ['shakespeare-sonnets-lyrics.txt', 'poe-poem-lines.txt']
+
+    @staticmethod
+    def _get_catalog(lyrics_file: str, padding: str = 'pre') -> Catalog:
+        current_directory = os.path.dirname(os.path.abspath(__file__))
+        catalog = Catalog(padding=padding)
+        catalog.add_file_to_catalog(os.path.join(current_directory, '../lyrics_files/', lyrics_file))
+        catalog.tokenize_catalog(build_features=False)
+        return catalog
+
+    @staticmethod
+    def _get_ngram_sequences_with_lists(catalog: Catalog, token_lists: List[List[int]]) -> np.ndarray:
+        # previous implementation: a list of every n-gram prefix, padded with pad_sequences
+        input_sequences = []
+        for token_list in token_lists:
+            for i in range(1, len(token_list)):
+                input_sequences.append(token_list[:i + 1])
+        return np.array(pad_sequences(input_sequences, maxlen=catalog.max_sequence_length,
+                                      padding=catalog._padding))
+
+    def test_ngram_sequences_match_padded_lists(self):
+
+        for lyrics_file in self.LYRICS_FILES:
+            for padding in ['pre', 'post']:
+                with self.subTest(lyrics_file=lyrics_file, padding=padding):
+
+                    # ARRANGE
+                    catalog = self._get_catalog(lyrics_file, padding)
+                    token_lists = catalog.tokenizer.texts_to_sequences(catalog.catalog_items)
+
+                    # ACT
+                    expected_sequences = self._get_ngram_sequences_with_lists(catalog, token_lists)
+                    input_sequences = catalog._get_ngram_sequences(token_lists)
+
+                    # ASSERT
+                    self.assertEqual(np.int32, input_sequences.dtype)
+                    np.testing.assert_array_equal(expected_sequences, input_sequences)
+
+    def test_ngram_sequences_truncate_long_lines(self):
+
+        # ARRANGE
+        catalog = Catalog()
+        catalog.max_sequence_length = 3
+        token_lists = [[5, 6, 7, 8], [9], [], [3, 4]]
+
+        # ACT
+        input_sequences = catalog._get_ngram_sequences(token_lists)
+
+        # ASSERT
+        np.testing.assert_array_equal([[0, 5, 6], [5, 6, 7], [6, 7, 8], [0, 3, 4]], input_sequences)
+
+    def test_add_files_matches_add_file(self):
+
+        current_directory = os.path.dirname(os.path.abspath(__file__))
+
+        for lyrics_file in self.LYRICS_FILES:
+            for keep_items, max_workers in [(True, 1), (False, 2)]:
+                with self.subTest(lyrics_file=lyrics_file, keep_items=keep_items, max_workers=max_workers):
+
+                    # ARRANGE
+                    expected_catalog = self._get_catalog(lyrics_file)
+                    catalog = Catalog()
+
+                    # ACT
+                    line_count = catalog.add_files_to_catalog(
+                        os.path.join(current_directory, '../lyrics_files/', lyrics_file), keep_items=keep_items,
+                        max_workers=max_workers, lines_per_chunk=500)
+                    catalog.tokenize_catalog(build_features=False)
+
+                    # ASSERT
+                    self.assertEqual(len(expected_catalog.catalog_items), line_count)
+                    self.assertEqual(expected_catalog.catalog_items if keep_items else [], catalog.catalog_items)
+                    self.assertEqual(expected_catalog.tokenizer.word_index, catalog.tokenizer.word_index)
+                    self.assertEqual(expected_catalog.tokenizer.word_docs, catalog.tokenizer.word_docs)
+                    self.assertEqual((expected_catalog.total_words, expected_catalog.max_sequence_length,
+                                      expected_catalog.content_hash),
+                                     (catalog.total_words, catalog.max_sequence_length, catalog.content_hash))
+
+    def test_add_files_reads_directories_globs_and_gzip(self):
+
+        with tempfile.TemporaryDirectory() as temp_directory:
+
+            # ARRANGE
+            os.makedirs(os.path.join(temp_directory, 'dump', 'more'))
+            with open(os.path.join(temp_directory, 'dump', 'a.txt'), 'w') as text_file:
+                text_file.write('Once upon a midnight dreary\nwhile I pondered\n')
+            with gzip.open(os.path.join(temp_directory, 'dump', 'more', 'b.txt.gz'), 'wt') as gzip_file:
+                gzip_file.write('while I pondered\n  once upon a MIDNIGHT dreary \nweak and weary\n')
+            catalog = Catalog()
+
+            # ACT
+            line_count = catalog.add_files_to_catalog(os.path.join(temp_directory, 'dump'), deduplicate=True)
+            glob_line_count = Catalog().add_files_to_catalog(os.path.join(temp_directory, '**', '*.gz'))
+
+        # ASSERT
+        self.assertEqual(3, line_count)
+        self.assertEqual(3, glob_line_count)
+        self.assertEqual(['once upon a midnight dreary\n', 'while i pondered\n', 'weak and weary\n'],
+                         catalog.catalog_items)
+        self.assertEqual(5, catalog.max_sequence_length)
+        self.assertEqual(catalog.tokenizer.word_index['once'], catalog.tokenizer.texts_to_sequences(['once'])[0][0])
+
+    def test_add_files_catalog_can_be_pickled(self):
+
+        # ARRANGE
+        current_directory = os.path.dirname(os.path.abspath(__file__))
+        catalog = Catalog()
+        catalog.add_files_to_catalog(os.path.join(current_directory, '../lyrics_files/', self.LYRICS_FILES[1]),
+                                     deduplicate=True)
+
+        # ACT
+        # ex: passed to the spawned processes of a hyperparameter sweep
+        unpickled_catalog = pickle.loads(pickle.dumps(catalog))
+        unpickled_catalog.tokenize_catalog(build_features=False)
+        catalog.tokenize_catalog(build_features=False)
+
+        # ASSERT
+        self.assertEqual(catalog.catalog_items, unpickled_catalog.catalog_items)
+        self.assertEqual(catalog.tokenizer.word_index, unpickled_catalog.tokenizer.word_index)
+        self.assertEqual((catalog.total_words, catalog.max_sequence_length, catalog.content_hash),
+                         (unpickled_catalog.total_words, unpickled_catalog.max_sequence_length,
+                          unpickled_catalog.content_hash))
+        with self.assertRaises(ValueError):
+            unpickled_catalog.add_files_to_catalog(
+                os.path.join(current_directory, '../lyrics_files/', self.LYRICS_FILES[0]))
+
+    def test_add_files_deduplicates_across_chunks(self):
+
+        lyrics_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../lyrics_files/poe-poem-lines.txt')
+
+        for max_workers in [1, 2]:
+            with self.subTest(max_workers=max_workers):
+
+                # ARRANGE
+                with open(lyrics_file_path) as text_file:
+                    lines = [line.lower() for line in text_file]
+                stripped_lines = set()
+                expected_lines = []
+                for line in lines:
+                    if line.strip() not in stripped_lines:
+                        stripped_lines.add(line.strip())
+                        expected_lines.append(line)
+                expected_tokenizer = WordTokenizer()
+                expected_tokenizer.fit_on_texts(expected_lines)
+                catalog = Catalog()
+
+                # ACT
+                line_count = catalog.add_files_to_catalog([lyrics_file_path, lyrics_file_path], deduplicate=True,
+                                                          max_workers=max_workers, lines_per_chunk=97)
+
+                # ASSERT
+                self.assertEqual(len(expected_lines), line_count)
+                self.assertEqual(expected_lines, catalog.catalog_items)
+                self.assertEqual(list(expected_tokenizer.word_counts.items()),
+                                 list(catalog.tokenizer.word_counts.items()))
+                self.assertEqual(expected_tokenizer.word_docs, catalog.tokenizer.word_docs)
+                self.assertEqual(expected_tokenizer.word_index, catalog.tokenizer.word_index)
+                self.assertEqual(len(expected_lines), len(catalog._line_digests))
+
+    def test_add_files_deduplicate_memory(self):
+
+        words = ['once', 'upon', 'a', 'midnight', 'dreary', 'while', 'i', 'pondered', 'weak', 'and']
+
+        def get_retained_bytes(line_count: int) -> int:
+            with tempfile.TemporaryDirectory() as temp_directory:
+                file_name = os.path.join(temp_directory, 'lines.txt')
+                with open(file_name, 'w') as text_file:
+                    for line_number in range(line_count):
+                        # distinct lines (the digits of the line number, as words), from a fixed vocabulary
+                        text_file.write(' '.join(words[int(digit)] for digit in str(line_number)) + ' weary\n')
+
+                tracemalloc.start()
+                try:
+                    start_bytes = tracemalloc.get_traced_memory()[0]
+                    catalog = Catalog()
+                    catalog.add_files_to_catalog(file_name, deduplicate=True, keep_items=False)
+                    return tracemalloc.get_traced_memory()[0] - start_bytes
+                finally:
+                    tracemalloc.stop()
+
+        # ARRANGE
+        small_line_count = 10000
+        large_line_count = 50000
+
+        # ACT
+        small_bytes = get_retained_bytes(small_line_count)
+        large_bytes = get_retained_bytes(large_line_count)
+
+        # ASSERT
+        # 8 bytes for the digest of each line, rather than the line (~40 bytes here) or a set entry (~70 bytes)
+        self.assertLess((large_bytes - small_bytes) / (large_line_count - small_line_count), 12)
+
+    def test_lyrics_session_matches_growing_seed(self):
+
+        for padding in ['pre', 'post']:
+            with self.subTest(padding=padding):
+
+                # ARRANGE
+                catalog = self._get_catalog('poe-poem-lines.txt', padding)
+                model = WindowSumModel(catalog.total_words)
+                seed_texts = ['a dreary midnight bird', 'said he art too', '', 'tone of his eyes']
+                word_counts = [32, 16, 1, 40]
+
+                # ACT
+                session = LyricsSession(catalog)
+                expected_text = ''
+                total_word_count = 0
+                for seed_text, word_count in zip(seed_texts, word_counts):
+                    total_word_count += word_count
+                    session.generate_lyrics_text(model, seed_text, total_word_count)
+
+                    if expected_text != '':
+                        expected_text += ' '
+                    expected_text = catalog.generate_lyrics_text(model, expected_text + seed_text, total_word_count)
+
+                    # ASSERT
+                    self.assertEqual(expected_text, session.get_lyrics_text())
+                    self.assertEqual(' '.join(expected_text.split(' ')[-word_count:]),
+                                     session.get_words_at_end(word_count))
+
+
+class WordTokenizerTestCase(unittest.TestCase):
+
+    LYRICS_FILES: List[str] = CatalogTestCase.LYRICS_FILES
+    TEXTS: List[str] = ['a dreary midnight bird', 'Tone of his EYES, of night!', 'zzqx unknownword', '',
+                        'said he\r art\ttoo', "o'er the ... seas-of-night\n", 'Ça, déjà-vu — naïve\u00a0café!']
+
+    @staticmethod
+    def _get_lines(lyrics_file: str) -> List[str]:
+        current_directory = os.path.dirname(os.path.abspath(__file__))
+        with open(os.path.join(current_directory, '../lyrics_files/', lyrics_file)) as text_file:
+            return [line.lower() for line in text_file]
+
+    def test_matches_keras_tokenizer(self):
+
+        for lyrics_file in self.LYRICS_FILES:
+            for oov_token in ['<OOV>', None]:
+                with self.subTest(lyrics_file=lyrics_file, oov_token=oov_token):
+
+                    # ARRANGE
+                    lines = self._get_lines(lyrics_file)
+                    keras_tokenizer = Tokenizer(oov_token=oov_token)
+                    tokenizer = WordTokenizer(oov_token=oov_token)
+
+                    # ACT
+                    keras_tokenizer.fit_on_texts(lines)
+                    tokenizer.fit_on_texts(lines)
+
+                    # ASSERT
+                    self.assertEqual(keras_tokenizer.word_index, tokenizer.word_index)
+                    self.assertEqual(keras_tokenizer.index_word, tokenizer.index_word)
+                    self.assertEqual(dict(keras_tokenizer.word_counts), tokenizer.word_counts)
+                    self.assertEqual(dict(keras_tokenizer.word_docs), tokenizer.word_docs)
+                    self.assertEqual(keras_tokenizer.document_count, tokenizer.document_count)
+                    self.assertEqual(keras_tokenizer.texts_to_sequences(lines + self.TEXTS),
+                                     tokenizer.texts_to_sequences(lines + self.TEXTS))
+
+    def test_matches_saved_catalogs(self):
+
+        current_directory = os.path.dirname(os.path.abspath(__file__))
+
+        for lyrics_file in self.LYRICS_FILES:
+            with self.subTest(lyrics_file=lyrics_file), tempfile.TemporaryDirectory() as temp_directory:
+
+                # ARRANGE
+                keras_tokenizer = Tokenizer(oov_token='<OOV>')
+                keras_tokenizer.fit_on_texts(self._get_lines(lyrics_file))
+                catalog_file = os.path.join(temp_directory, 'catalog.json')
+
+                # ACT
+                catalog = Catalog()
+                catalog.add_file_to_catalog(os.path.join(current_directory, '../lyrics_files/', lyrics_file))
+                catalog.tokenize_catalog(build_features=False)
+                catalog.save_catalog_file(catalog_file)
+                saved_catalog = Catalog.from_catalog_file(catalog_file)
+
+                # ASSERT
+                self.assertEqual(keras_tokenizer.word_index, saved_catalog.tokenizer.word_index)
+                self.assertEqual(len(keras_tokenizer.word_index) + 1, saved_catalog.total_words)
+                self.assertEqual((catalog.max_sequence_length, catalog.content_hash),
+                                 (saved_catalog.max_sequence_length, saved_catalog.content_hash))
+
+    def test_encode_batch_matches_pad_sequences(self):
+
+        for padding in ['pre', 'post']:
+            with self.subTest(padding=padding):
+
+                # ARRANGE
+                tokenizer = WordTokenizer()
+                tokenizer.fit_on_texts(self._get_lines('poe-poem-lines.txt'))
+                token_lists = tokenizer.texts_to_sequences(self.TEXTS)
+
+                # ACT
+                token_ids, token_counts = tokenizer.encode_batch(self.TEXTS, 3, padding)
+
+                # ASSERT
+                self.assertEqual(np.int32, token_ids.dtype)
+                np.testing.assert_array_equal(pad_sequences(token_lists, maxlen=3, padding=padding), token_ids)
+                self.assertEqual([len(token_list) for token_list in token_lists], token_counts)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import unittest
+from typing import List
+
+import numpy as np
+
+from xandly5.ai_ml_model.catalog import Catalog
+from xandly5.ai_ml_model.decoders import BeamSearchDecoder, Decoder, SamplingDecoder, StepDecoder
+
+
+class TransitionModel:
+    """
+    predicts the next word from the last word in the window only, using a fixed table of word probabilities
+    """
+
+    def __init__(self, transitions: np.ndarray):
+        self.transitions = transitions
+        self.predict_calls = 0
+
+    def predict(self, token_windows: np.ndarray) -> np.ndarray:
+        self.predict_calls += 1
+        return self.transitions[token_windows[:, -1]]
+
+
+class DecodersTestCase(unittest.TestCase):
+
+    # word 1 -> word 2 is the most likely next word, but word 1 -> word 3 -> word 4 is the most likely pair
+    TRANSITIONS = np.array([
+        [0.0, 0.2, 0.2, 0.2, 0.2, 0.2],
+        [0.0, 0.0, 0.5, 0.4, 0.1, 0.0],
+        [0.0, 0.2, 0.2, 0.2, 0.2, 0.2],
+        [0.0, 0.0, 0.0, 0.0, 0.9, 0.1],
+        [0.0, 0.1, 0.1, 0.1, 0.1, 0.6],
+        [0.0, 0.6, 0.1, 0.1, 0.1, 0.1],
+    ])
+
+    @staticmethod
+    def _generate(decoder, model, words_to_generate: List[int]) -> List[List[int]]:
+        catalog = Catalog()
+        catalog.max_sequence_length = 4
+        windows = np.zeros((len(words_to_generate), 3), dtype=np.int32)
+        windows[:, -1] = 1
+        token_counts = [1] * len(words_to_generate)
+
+        token_ids: List[List[int]] = [[] for _ in words_to_generate]
+        for row, token_id in catalog._iterate_token_ids(model, windows, token_counts, words_to_generate, decoder):
+            catalog._append_to_token_window(windows[row], token_counts[row], token_id)
+            token_counts[row] += 1
+            token_ids[row].append(token_id)
+        return token_ids
+
+    def test_greedy_decoding(self):
+
+        # ARRANGE
+        model = TransitionModel(self.TRANSITIONS)
+
+        # ACT
+        token_ids = self._generate(None, model, [3, 1])
+
+        # ASSERT
+        self.assertEqual([[2, 1, 2], [2]], token_ids)
+        self.assertEqual(3, model.predict_calls)
+
+    def test_sampling_decoder_seed(self):
+
+        # ARRANGE
+        model = TransitionModel(self.TRANSITIONS)
+
+        # ACT
+        token_ids = self._generate(SamplingDecoder(seed=7), model, [20, 20, 20])
+        same_seed_token_ids = self._generate(SamplingDecoder(seed=7), model, [20, 20, 20])
+        other_seed_token_ids = self._generate(SamplingDecoder(seed=8), model, [20, 20, 20])
+        single_row_token_ids = self._generate(SamplingDecoder(seed=7, first_row=2), model, [20])
+
+        # ASSERT
+        self.assertEqual(token_ids, same_seed_token_ids)
+        self.assertNotEqual(token_ids, other_seed_token_ids)
+        self.assertEqual(token_ids[2], single_row_token_ids[0])
+        self.assertNotIn(0, np.ravel(token_ids))
+        self.assertEqual(4 * 20, model.predict_calls)  # one batched prediction per step, for all rows
+
+    def test_sampling_decoder_filters(self):
+
+        # ARRANGE
+        predictions = self.TRANSITIONS[[1, 4]]
+        greedy_probabilities = np.zeros_like(predictions)
+        greedy_probabilities[[0, 1], [2, 5]] = 1
+
+        # ACT
+        top_k_probabilities = SamplingDecoder(top_k=2).get_probabilities(predictions)
+        top_p_probabilities = SamplingDecoder(top_p=0.8).get_probabilities(predictions)
+        top_1_probabilities = SamplingDecoder(top_k=1).get_probabilities(predictions)
+        cold_probabilities = SamplingDecoder(temperature=0.01).get_probabilities(predictions)
+        hot_probabilities = SamplingDecoder(temperature=100).get_probabilities(predictions)
+
+        # ASSERT
+        np.testing.assert_allclose([0, 0, 5 / 9, 4 / 9, 0, 0], top_k_probabilities[0])
+        np.testing.assert_allclose([0, 0, 5 / 9, 4 / 9, 0, 0], top_p_probabilities[0])
+        np.testing.assert_allclose(greedy_probabilities, top_1_probabilities)
+        np.testing.assert_allclose(greedy_probabilities, cold_probabilities, atol=1e-6)
+        self.assertLess(hot_probabilities[1].max() - hot_probabilities[1, 1:].min(), 0.01)
+        np.testing.assert_allclose(1, top_p_probabilities.sum(axis=-1))
+
+    def test_beam_search_decoder(self):
+
+        # ARRANGE
+        model = TransitionModel(self.TRANSITIONS)
+
+        # ACT
+        token_ids = self._generate(BeamSearchDecoder(beam_width=2), model, [2, 1])
+        width_1_token_ids = self._generate(BeamSearchDecoder(beam_width=1), model, [3, 1])
+
+        # ASSERT
+        self.assertEqual([[3, 4], [2]], token_ids)
+        self.assertEqual(self._generate(None, TransitionModel(self.TRANSITIONS), [3, 1]),
+                         width_1_token_ids)
+        self.assertEqual(2 + 3, model.predict_calls)  # one batched prediction per step, for all rows and beams
+
+
+    def test_decoders_must_implement_decoding(self):
+
+        # ARRANGE
+        class IncompleteDecoder(StepDecoder):
+            pass
+
+        # ACT
+        decoder_classes = [Decoder, StepDecoder, IncompleteDecoder]
+
+        # ASSERT
+        for decoder_class in decoder_classes:
+            self.assertRaises(TypeError, decoder_class)  # abstract methods are not implemented
+
+
+if __name__ == '__main__':
+    unittest.main()
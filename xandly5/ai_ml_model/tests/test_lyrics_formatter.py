@@ -0,0 +1,37 @@
+import unittest
+
+from xandly5.ai_ml_model.lyrics_formatter import LyricsFormatter
+
+
+class LyricsFormatterTestCase(unittest.TestCase):
+
+    def test_format_lyrics(self):
+
+        # ARRANGE
+        lyrics_text = 'a dreary midnight bird from heaven no grace imparts'
+
+        # ACT
+        formatted_lyrics = LyricsFormatter.format_lyrics(lyrics_text, word_group_count=2)
+
+        # ASSERT
+        self.assertEqual('a dreary,\n  midnight bird \n\nfrom heaven,\n  no grace \n\nimparts \n\n', formatted_lyrics)
+
+    def test_iterate_formatted_lyrics_matches_format_lyrics(self):
+
+        for word_total in range(0, 12):
+            with self.subTest(word_total=word_total):
+
+                # ARRANGE
+                lyrics_text = ' '.join(f'word{i}' for i in range(word_total))
+
+                # ACT
+                chunks = list(LyricsFormatter.iterate_formatted_lyrics(iter(lyrics_text.split(' ')),
+                                                                       word_group_count=3))
+
+                # ASSERT
+                self.assertEqual(len(lyrics_text.split(' ')), len(chunks))
+                self.assertEqual(LyricsFormatter.format_lyrics(lyrics_text, word_group_count=3), ''.join(chunks))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from tensorflow import keras
+
+from xandly5.ai_ml_model.catalog import Catalog
+from xandly5.ai_ml_model.lyrics_predictor import LyricsPredictor
+from xandly5.ai_ml_model.numpy_lyrics_predictor import NumpyLyricsPredictor
+
+
+class NumpyLyricsPredictorTestCase(unittest.TestCase):
+
+    # (model file, catalog file, seed text, word count), seeds from the service tests
+    SAVED_MODEL_SEEDS = [
+        ('shakespeare_sonnet.h5', 'shakespeare_sonnet_catalog.json', 'evening fountains lit loss', 96),
+        ('shakespeare_sonnet.h5', 'shakespeare_sonnet_catalog.json', 'said he art too seas for totter into', 48),
+        ('poe_poem.h5', 'poe_poem_catalog.json', 'a dreary midnight bird', 100),
+        ('poe_poem.h5', 'poe_poem_catalog.json', 'tone of his eyes of night litten have', 48),
+    ]
+
+    @staticmethod
+    def _get_model(lstm_layer_count: int, total_words: int = 50, input_length: int = 7) -> keras.Sequential:
+        keras.utils.set_random_seed(42)
+        lstm_layers = [keras.layers.Bidirectional(keras.layers.LSTM(12, return_sequences=True))
+                       for _ in range(lstm_layer_count - 1)]
+        model = keras.Sequential([
+            keras.layers.Embedding(total_words, 8, input_length=input_length),
+            *lstm_layers,
+            keras.layers.Bidirectional(keras.layers.LSTM(12)),
+            keras.layers.Dense(total_words, activation='softmax')
+        ])
+        model.build((None, input_length))
+        return model
+
+    def test_predict_matches_keras(self):
+
+        for lstm_layer_count in [1, 2]:
+            with self.subTest(lstm_layer_count=lstm_layer_count):
+
+                # ARRANGE
+                model = self._get_model(lstm_layer_count)
+                token_windows = np.random.RandomState(0).randint(0, 50, size=(16, 7)).astype(np.int32)
+                token_windows[:4, :3] = 0  # padding
+
+                with tempfile.TemporaryDirectory() as temp_directory:
+                    npz_file = os.path.join(temp_directory, 'model.npz')
+                    NumpyLyricsPredictor.save_npz_file(model, npz_file)
+                    predictor = NumpyLyricsPredictor.from_npz_file(npz_file)
+
+                # ACT
+                expected_predictions = model(token_windows, training=False).numpy()
+                predictions = predictor.predict(token_windows)
+
+                # ASSERT
+                self.assertEqual((7, 50), (predictor.input_length, predictor.total_words))
+                np.testing.assert_allclose(expected_predictions, predictions, atol=1e-5)
+                np.testing.assert_array_equal(np.argmax(expected_predictions, axis=-1),
+                                              np.argmax(predictions, axis=-1))
+
+    def test_predict_next_words_matches_argmax(self):
+
+        # ARRANGE
+        model = self._get_model(2)
+        token_windows = np.random.RandomState(1).randint(0, 50, size=(16, 7)).astype(np.int32)
+        candidate_ids = np.arange(1, 11)
+        predictors = {
+            'tensorflow': (LyricsPredictor(model, 7), LyricsPredictor(model, 7, candidate_ids)),
+            'numpy': (NumpyLyricsPredictor.from_keras_model(model),
+                      NumpyLyricsPredictor.from_keras_model(model, candidate_ids))
+        }
+
+        for engine, (predictor, candidate_predictor) in predictors.items():
+            with self.subTest(engine=engine):
+
+                # ACT
+                predictions = predictor.predict(token_windows)
+                next_words = predictor.predict_next_words(token_windows)
+                candidate_next_words = candidate_predictor.predict_next_words(token_windows)
+
+                # ASSERT
+                np.testing.assert_array_equal(np.argmax(predictions, axis=-1), next_words)
+                np.testing.assert_array_equal(np.argmax(predictions[:, candidate_ids], axis=-1) + 1,
+                                              candidate_next_words)
+
+    def test_unsupported_model_error(self):
+
+        # ARRANGE
+        model = keras.Sequential([
+            keras.layers.Embedding(50, 8, input_length=7),
+            keras.layers.LSTM(12),
+            keras.layers.Dense(50, activation='softmax')
+        ])
+        model.build((None, 7))
+
+        # ACT, ASSERT
+        self.assertRaises(ValueError, NumpyLyricsPredictor.from_keras_model, model)
+
+    def test_generate_lyrics_matches_keras_saved_models(self):
+
+        saved_models_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../saved_models/')
+        models = {}
+
+        for model_file, catalog_file, seed_text, word_count in self.SAVED_MODEL_SEEDS:
+            with self.subTest(model_file=model_file, seed_text=seed_text):
+
+                # ARRANGE
+                if model_file not in models:
+                    models[model_file] = keras.models.load_model(os.path.join(saved_models_directory, model_file))
+                model = models[model_file]
+                catalog = Catalog.from_catalog_file(os.path.join(saved_models_directory, catalog_file))
+
+                # ACT
+                expected_lyrics = catalog.generate_lyrics_text(LyricsPredictor(model, model.input_shape[-1]),
+                                                               seed_text, word_count)
+                lyrics = catalog.generate_lyrics_text(NumpyLyricsPredictor.from_keras_model(model),
+                                                      seed_text, word_count)
+
+                # ASSERT
+                self.assertEqual(expected_lyrics, lyrics)
+
+
+if __name__ == '__main__':
+    unittest.main()
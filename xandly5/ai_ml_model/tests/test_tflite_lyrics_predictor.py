@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from tensorflow import keras
+
+from xandly5.ai_ml_model.catalog import Catalog
+from xandly5.ai_ml_model.lyrics_predictor import LyricsPredictor
+from xandly5.ai_ml_model.tflite_lyrics_predictor import TFLiteLyricsPredictor
+
+
+class TFLiteLyricsPredictorTestCase(unittest.TestCase):
+
+    @staticmethod
+    def _get_model(total_words: int = 50, input_length: int = 7) -> keras.Sequential:
+        keras.utils.set_random_seed(42)
+        model = keras.Sequential([
+            keras.layers.Embedding(total_words, 8, input_length=input_length),
+            keras.layers.Bidirectional(keras.layers.LSTM(12)),
+            keras.layers.Dense(total_words, activation='softmax')
+        ])
+        model.build((None, input_length))
+        return model
+
+    def test_predict_matches_keras(self):
+
+        model = self._get_model()
+
+        for quantization in TFLiteLyricsPredictor.QUANTIZATIONS:
+            with self.subTest(quantization=quantization):
+
+                # ARRANGE
+                token_windows = np.random.RandomState(0).randint(0, 50, size=(16, 7)).astype(np.int32)
+                token_windows[:4, :3] = 0  # padding
+                candidate_ids = np.arange(1, 11)
+
+                with tempfile.TemporaryDirectory() as temp_directory:
+                    tflite_file = os.path.join(temp_directory, 'model.tflite')
+                    TFLiteLyricsPredictor.save_tflite_file(model, tflite_file, quantization)
+                    predictor = TFLiteLyricsPredictor.from_tflite_file(tflite_file, candidate_ids=candidate_ids)
+
+                # ACT
+                expected_predictions = model(token_windows, training=False).numpy()
+                predictions = predictor.predict(token_windows)
+                single_predictions = predictor.predict(token_windows[:1])  # resized for a smaller batch
+                candidate_next_words = predictor.predict_next_words(token_windows)
+
+                # ASSERT
+                self.assertEqual((7, 50), (predictor.input_length, predictor.total_words))
+                np.testing.assert_allclose(expected_predictions, predictions, atol=1e-3)
+                np.testing.assert_allclose(predictions[:1], single_predictions, atol=1e-6)
+                np.testing.assert_array_equal(np.argmax(predictions[:, candidate_ids], axis=-1) + 1,
+                                              candidate_next_words)
+
+    def test_unsupported_quantization_error(self):
+
+        # ARRANGE
+        model = self._get_model()
+
+        # ACT, ASSERT
+        self.assertRaises(ValueError, TFLiteLyricsPredictor.convert_model, model, 'int4')
+
+    def test_generate_lyrics_matches_keras_saved_model(self):
+
+        # ARRANGE
+        saved_models_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../saved_models/')
+        model = keras.models.load_model(os.path.join(saved_models_directory, 'poe_poem.h5'))
+        catalog = Catalog.from_catalog_file(os.path.join(saved_models_directory, 'poe_poem_catalog.json'))
+        seed_text = 'a dreary midnight bird'  # seed from the service tests
+        predictor = TFLiteLyricsPredictor(TFLiteLyricsPredictor.convert_model(model, 'float16'))
+
+        # ACT
+        expected_lyrics = catalog.generate_lyrics_text(LyricsPredictor(model, model.input_shape[-1]), seed_text, 100)
+        lyrics = catalog.generate_lyrics_text(predictor, seed_text, 100)
+
+        # ASSERT
+        self.assertEqual(expected_lyrics, lyrics)
+
+
+if __name__ == '__main__':
+    unittest.main()
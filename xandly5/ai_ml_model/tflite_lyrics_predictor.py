@@ -0,0 +1,122 @@
+import threading
+from typing import Optional
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+
+class TFLiteLyricsPredictor:
+    """
+    inference for a trained lyrics model exported to TensorFlow Lite, with float16 or dynamic range int8 weights;
+    the exported model is several times smaller than the h5 model, and loads without building the keras model
+    """
+
+    QUANTIZATIONS = ('float16', 'int8')
+
+    def __init__(self, model_content: bytes, num_threads: int = 1, candidate_ids: Optional[np.ndarray] = None):
+        """
+        :param model_content: TFLite model, ex: from convert_model
+        :param num_threads: number of threads used by the interpreter for each prediction
+        :param candidate_ids: optional word indexes that predict_next_words can return; None for all words
+        """
+        self.candidate_ids = candidate_ids
+
+        self._interpreter = tf.lite.Interpreter(model_content=model_content, num_threads=num_threads)
+        self._input_details = self._interpreter.get_input_details()[0]
+        self._output_index = self._interpreter.get_output_details()[0]['index']
+        self.input_length = int(self._input_details['shape'][-1])
+        self.total_words = int(self._interpreter.get_output_details()[0]['shape'][-1])
+
+        # the interpreter is resized for each batch size, and is not thread-safe
+        self._lock = threading.Lock()
+        self._batch_size = 0
+
+    @classmethod
+    def from_tflite_file(cls, file_name: str, num_threads: int = 1,
+                         candidate_ids: Optional[np.ndarray] = None) -> 'TFLiteLyricsPredictor':
+        """
+        load a model saved with save_tflite_file
+
+        :param file_name: tflite file name
+        :param num_threads: number of threads used by the interpreter for each prediction
+        :param candidate_ids: optional word indexes that predict_next_words can return; None for all words
+        :return: TFLiteLyricsPredictor
+        """
+        with open(file_name, 'rb') as tflite_file:
+            return cls(tflite_file.read(), num_threads, candidate_ids)
+
+    @staticmethod
+    def convert_model(model: keras.Sequential, quantization: str) -> bytes:
+        """
+        convert a trained keras model to TFLite, with quantized weights
+
+        :param model: trained keras model
+        :param quantization: float16, or int8 (dynamic range: int8 weights, float activations)
+        :return: TFLite model
+        """
+        if quantization not in TFLiteLyricsPredictor.QUANTIZATIONS:
+            raise ValueError(f'unsupported quantization: {quantization}')
+
+        # converted with a dynamic batch size, so batched generation can use the model; this keeps the LSTM loops
+        # as TensorFlow ops, since fused TFLite LSTMs have a fixed batch size (and float16 fused LSTMs do not
+        # convert with TensorFlow 2.15)
+        input_spec = tf.TensorSpec(shape=(None, model.input_shape[-1]), dtype=model.inputs[0].dtype)
+        concrete_function = tf.function(lambda token_windows: model(token_windows, training=False)) \
+            .get_concrete_function(input_spec)
+
+        converter = tf.lite.TFLiteConverter.from_concrete_functions([concrete_function], model)
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if quantization == 'float16':
+            converter.target_spec.supported_types = [tf.float16]
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS, tf.lite.OpsSet.SELECT_TF_OPS]
+        converter._experimental_lower_tensor_list_ops = False
+        return converter.convert()
+
+    @staticmethod
+    def save_tflite_file(model: keras.Sequential, file_name: str, quantization: str) -> None:
+        """
+        export a trained keras model to a TFLite file
+
+        :param model: trained keras model
+        :param file_name: tflite file name
+        :param quantization: float16, or int8 (dynamic range: int8 weights, float activations)
+        :return: None
+        """
+        model_content = TFLiteLyricsPredictor.convert_model(model, quantization)
+        with open(file_name, 'wb') as tflite_file:
+            tflite_file.write(model_content)
+
+    def predict(self, token_windows: np.ndarray) -> np.ndarray:
+        """
+        predict next word probabilities; same input and output as keras.Model.predict
+
+        :param token_windows: padded token ids, shape (batch size, input_length)
+        :return: word probabilities, shape (batch size, total_words)
+        """
+        token_windows = np.asarray(token_windows, dtype=self._input_details['dtype'])
+
+        with self._lock:
+            if len(token_windows) != self._batch_size:
+                self._interpreter.resize_tensor_input(self._input_details['index'],
+                                                      [len(token_windows), self.input_length])
+                self._interpreter.allocate_tensors()
+                self._batch_size = len(token_windows)
+
+            self._interpreter.set_tensor(self._input_details['index'], token_windows)
+            self._interpreter.invoke()
+            return self._interpreter.get_tensor(self._output_index)
+
+    def predict_next_words(self, token_windows: np.ndarray) -> np.ndarray:
+        """
+        predict the most likely next word
+
+        :param token_windows: padded token ids, shape (batch size, input_length)
+        :return: word indexes, shape (batch size,)
+        """
+        # the softmax is part of the TFLite model; the argmax of the candidate probabilities is the argmax of
+        # their logits
+        predictions = self.predict(token_windows)
+        if self.candidate_ids is None:
+            return np.argmax(predictions, axis=-1)
+        return self.candidate_ids[np.argmax(predictions[:, self.candidate_ids], axis=-1)]
@@ -0,0 +1,84 @@
+"""
+CATALOG PREPROCESSING TIME: N-GRAM SEQUENCES AND TOKENIZING, COMPARED TO THE PREVIOUS IMPLEMENTATIONS
+(LISTS AND PAD_SEQUENCES, AND THE KERAS TOKENIZER)
+
+usage: python xandly5/benchmark/catalog_benchmark.py
+"""
+
+import os
+import time
+from typing import Callable, List
+
+import numpy as np
+from tensorflow.keras.preprocessing.sequence import pad_sequences
+from tensorflow.keras.preprocessing.text import Tokenizer
+
+from xandly5.ai_ml_model.catalog import Catalog, WordTokenizer
+
+LYRICS_FILES = ['shakespeare-sonnets-lyrics.txt', 'poe-poem-lines.txt']
+REPEAT = 3
+
+_lyrics_files_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../ai_ml_model/lyrics_files/')
+
+
+def _get_best_seconds(function: Callable[[], object], repeat: int = REPEAT) -> float:
+    best_seconds = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - start
+        best_seconds = seconds if best_seconds is None else min(best_seconds, seconds)
+    return best_seconds
+
+
+def _get_ngram_sequences_with_lists(catalog: Catalog, token_lists: List[List[int]]) -> np.ndarray:
+    # previous implementation: a list of every n-gram prefix, padded with pad_sequences
+    input_sequences = []
+    for token_list in token_lists:
+        for i in range(1, len(token_list)):
+            input_sequences.append(token_list[:i + 1])
+    return np.array(pad_sequences(input_sequences, maxlen=catalog.max_sequence_length, padding=catalog._padding))
+
+
+def benchmark_ngram_sequences(lyrics_file: str) -> None:
+    catalog = Catalog()
+    catalog.add_file_to_catalog(os.path.join(_lyrics_files_directory, lyrics_file))
+    catalog.tokenize_catalog(build_features=False)
+    token_lists = catalog.tokenizer.texts_to_sequences(catalog.catalog_items)
+
+    list_seconds = _get_best_seconds(lambda: _get_ngram_sequences_with_lists(catalog, token_lists))
+    numpy_seconds = _get_best_seconds(lambda: catalog._get_ngram_sequences(token_lists))
+
+    print(f'{lyrics_file:<32}{"n-grams":<10}{list_seconds * 1000:>16.1f}{numpy_seconds * 1000:>12.1f}'
+          f'{list_seconds / numpy_seconds:>9.1f}x')
+
+
+def benchmark_tokenizer(lyrics_file: str) -> None:
+    with open(os.path.join(_lyrics_files_directory, lyrics_file)) as text_file:
+        lines = [line.lower() for line in text_file]
+    keras_tokenizer = Tokenizer(oov_token='<OOV>')
+    keras_tokenizer.fit_on_texts(lines)
+    tokenizer = WordTokenizer()
+    tokenizer.fit_on_texts(lines)
+
+    keras_fit_seconds = _get_best_seconds(lambda: Tokenizer().fit_on_texts(lines))
+    fit_seconds = _get_best_seconds(lambda: WordTokenizer().fit_on_texts(lines))
+    keras_encode_seconds = _get_best_seconds(
+        lambda: pad_sequences(keras_tokenizer.texts_to_sequences(lines), maxlen=10))
+    encode_seconds = _get_best_seconds(lambda: tokenizer.encode_batch(lines, 10))
+
+    print(f'{lyrics_file:<32}{"fit":<10}{keras_fit_seconds * 1000:>16.1f}{fit_seconds * 1000:>12.1f}'
+          f'{keras_fit_seconds / fit_seconds:>9.1f}x')
+    print(f'{lyrics_file:<32}{"encode":<10}{keras_encode_seconds * 1000:>16.1f}{encode_seconds * 1000:>12.1f}'
+          f'{keras_encode_seconds / encode_seconds:>9.1f}x')
+
+
+def main():
+    print(f'{"LYRICS FILE":<32}{"STEP":<10}{"PREVIOUS MS":>16}{"NEW MS":>12}{"SPEEDUP":>10}')
+    for lyrics_file in LYRICS_FILES:
+        benchmark_ngram_sequences(lyrics_file)
+        benchmark_tokenizer(lyrics_file)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+"""
+LATENCY PERCENTILES, THROUGHPUT, MEMORY AND COLD-START TIME OF LYRICS GENERATION, FOR EACH MODEL
+
+usage: python xandly5/benchmark/generation_benchmark.py [--word-counts 50 200] [--section-counts 4]
+           [--concurrency 1 4] [--requests 20] [--models POE_POEM] [--output results.json] [--baseline old.json]
+
+each scenario sends requests from a pool of threads, through LyricsGenerator or the Flask endpoints; results are
+written as json, and compared with a baseline results file if one is given
+"""
+
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+SEED_TEXTS = [
+    'a dreary midnight bird',
+    'tone of his eyes of night litten have',
+    'evening fountains lit loss',
+    'said he art too seas for totter into',
+    'answer step only blows of their harp string',
+]
+WORD_GROUP_COUNT = 8
+TARGETS = ['generate_lyrics', 'generate_lyrics_from_sections', '/lyrics-api', '/structured-lyrics-api']
+SECTIONS_TARGETS = ['generate_lyrics_from_sections', '/structured-lyrics-api']
+
+
+def _get_peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # kilobytes on linux
+
+
+def _measure_cold_start(model_name: str, word_count: int) -> Dict:
+    # runs in a new process: imports, model load and the first request, as when a server starts
+    start = time.perf_counter()
+    from xandly5.service.lyrics_generator import LyricsGenerator
+    from xandly5.types.lyrics_model_enum import LyricsModelEnum
+    import_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    generator = LyricsGenerator(LyricsModelEnum[model_name])
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    generator.generate_lyrics(SEED_TEXTS[0], WORD_GROUP_COUNT, word_count)
+    first_request_seconds = time.perf_counter() - start
+
+    return {
+        'model': model_name,
+        'import_seconds': import_seconds,
+        'load_seconds': load_seconds,
+        'first_request_seconds': first_request_seconds,
+        'cold_start_seconds': import_seconds + load_seconds + first_request_seconds,
+        'peak_rss_mb': _get_peak_rss_mb(),
+    }
+
+
+def _get_sections(request_number: int, word_count: int, section_count: int) -> Tuple[List[dict], int]:
+    # sections of a request share its word count; the first has a seed text, the others continue the lyrics
+    section_word_count = max(word_count // section_count, 1)
+    seed_text = SEED_TEXTS[request_number % len(SEED_TEXTS)]
+    sections = [{'section_type': section_number % 3 + 1, 'word_count': section_word_count,
+                 'word_group_count': WORD_GROUP_COUNT, 'seed_text': seed_text if section_number == 0 else ''}
+                for section_number in range(section_count)]
+    return sections, section_word_count * section_count - len(seed_text.split(' '))
+
+
+def _get_request(target: str, model_name: str, word_count: int,
+                 section_count: int) -> Callable[[int], int]:
+    """
+    :return: sends one request, given its number, and returns the number of words generated
+    """
+    from xandly5.service.lyrics_generator import LyricsGenerator
+    from xandly5.types.lyrics_model_enum import LyricsModelEnum
+    from xandly5.types.lyrics_section import LyricsSection
+    from xandly5.web.lyrics_api import app
+
+    model_id = LyricsModelEnum[model_name]
+
+    def generate_lyrics(request_number: int) -> int:
+        seed_text = SEED_TEXTS[request_number % len(SEED_TEXTS)]
+        LyricsGenerator(model_id).generate_lyrics(seed_text, WORD_GROUP_COUNT, word_count)
+        return word_count - len(seed_text.split(' '))
+
+    def generate_lyrics_from_sections(request_number: int) -> int:
+        sections, words_generated = _get_sections(request_number, word_count, section_count)
+        LyricsGenerator(model_id).generate_lyrics_from_sections([LyricsSection(**section) for section in sections])
+        return words_generated
+
+    def post_lyrics_api(request_number: int) -> int:
+        seed_text = SEED_TEXTS[request_number % len(SEED_TEXTS)]
+        response = app.test_client().post('/lyrics-api', json={
+            'model_id': model_id.value, 'seed_text': seed_text, 'word_count': word_count,
+            'word_group_count': WORD_GROUP_COUNT})
+        assert response.status_code == 200, response.get_data(as_text=True)
+        return word_count - len(seed_text.split(' '))
+
+    def post_structured_lyrics_api(request_number: int) -> int:
+        sections, words_generated = _get_sections(request_number, word_count, section_count)
+        response = app.test_client().post('/structured-lyrics-api', json={
+            'model_id': model_id.value, 'independent_sections': False, 'lyrics_sections': sections})
+        assert response.status_code == 200, response.get_data(as_text=True)
+        return words_generated
+
+    return {
+        'generate_lyrics': generate_lyrics,
+        'generate_lyrics_from_sections': generate_lyrics_from_sections,
+        '/lyrics-api': post_lyrics_api,
+        '/structured-lyrics-api': post_structured_lyrics_api,
+    }[target]
+
+
+def _run_scenario(send_request: Callable[[int], int], request_count: int, concurrency: int) -> Dict:
+
+    def send_timed_request(request_number: int) -> Tuple[float, int]:
+        start = time.perf_counter()
+        words_generated = send_request(request_number)
+        return time.perf_counter() - start, words_generated
+
+    send_request(0)  # warm up: tracing, first-call allocations for this word count
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        timings = list(executor.map(send_timed_request, range(request_count)))
+    seconds = time.perf_counter() - start
+
+    latencies_ms = np.array([latency for latency, _ in timings]) * 1000
+    words_generated = sum(word_count for _, word_count in timings)
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+
+    return {
+        'p50_ms': p50,
+        'p95_ms': p95,
+        'p99_ms': p99,
+        'mean_ms': float(latencies_ms.mean()),
+        'requests_per_second': request_count / seconds,
+        'tokens_per_second': words_generated / seconds,
+        'peak_rss_mb': _get_peak_rss_mb(),
+    }
+
+
+def _get_scenario_key(scenario: Dict) -> Tuple:
+    return (scenario['target'], scenario['model'], scenario['word_count'], scenario['section_count'],
+            scenario['concurrency'])
+
+
+def _get_git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_baseline_comparison(scenarios: List[Dict], baseline_file: str) -> None:
+    with open(baseline_file) as json_file:
+        baseline_scenarios = {_get_scenario_key(scenario): scenario for scenario in json.load(json_file)['scenarios']}
+
+    print(f'\nCOMPARED TO {baseline_file} (latency: positive is slower; tokens/sec: positive is faster)')
+    for scenario in scenarios:
+        baseline = baseline_scenarios.get(_get_scenario_key(scenario))
+        if baseline is None:
+            continue
+        changes = [f'{name} {scenario[name] / baseline[name] - 1:+.1%}' for name in ['p50_ms', 'p95_ms', 'p99_ms']]
+        changes.append(f'tokens/sec {scenario["tokens_per_second"] / baseline["tokens_per_second"] - 1:+.1%}')
+        print(f'{scenario["target"]:<32}{scenario["model"]:<10}{scenario["word_count"]:>6}{scenario["concurrency"]:>4}'
+              f'  {", ".join(changes)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='lyrics generation benchmark')
+    parser.add_argument('--models', nargs='+', default=['SONNETS', 'POE_POEM'])
+    parser.add_argument('--targets', nargs='+', default=TARGETS, choices=TARGETS)
+    parser.add_argument('--word-counts', nargs='+', type=int, default=[50, 200])
+    parser.add_argument('--section-counts', nargs='+', type=int, default=[4],
+                        help='sections per request, for the sections targets')
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4])
+    parser.add_argument('--requests', type=int, default=20, help='requests per scenario')
+    parser.add_argument('--output', default='generation_benchmark_results.json')
+    parser.add_argument('--baseline', help='results file of an earlier run, to compare with')
+    args = parser.parse_args()
+
+    # before this process loads any models, so each cold start is measured on its own
+    spawn_context = multiprocessing.get_context('spawn')
+    cold_starts = []
+    for model_name in args.models:
+        with spawn_context.Pool(1) as pool:
+            cold_starts.append(pool.apply(_measure_cold_start, (model_name, max(args.word_counts))))
+
+    print(f'{"MODEL":<10}{"IMPORT S":>10}{"LOAD S":>8}{"FIRST S":>9}{"COLD START S":>14}{"PEAK RSS MB":>13}')
+    for cold_start in cold_starts:
+        print(f'{cold_start["model"]:<10}{cold_start["import_seconds"]:>10.2f}{cold_start["load_seconds"]:>8.2f}'
+              f'{cold_start["first_request_seconds"]:>9.2f}{cold_start["cold_start_seconds"]:>14.2f}'
+              f'{cold_start["peak_rss_mb"]:>13.0f}')
+
+    from xandly5.service import lyrics_generator
+
+    # every request generates: repeated seeds would otherwise be served from the result cache
+    lyrics_generator._result_cache = None
+
+    print(f'\n{"TARGET":<32}{"MODEL":<10}{"WORDS":>6}{"SECT":>5}{"CONC":>5}{"P50 MS":>9}{"P95 MS":>9}{"P99 MS":>9}'
+          f'{"TOKENS/S":>10}{"RSS MB":>8}')
+
+    scenarios = []
+    for target in args.targets:
+        section_counts = args.section_counts if target in SECTIONS_TARGETS else [1]
+        for model_name in args.models:
+            for word_count in args.word_counts:
+                for section_count in section_counts:
+                    for concurrency in args.concurrency:
+                        send_request = _get_request(target, model_name, word_count, section_count)
+                        scenario = {'target': target, 'model': model_name, 'word_count': word_count,
+                                    'section_count': section_count, 'concurrency': concurrency,
+                                    'requests': args.requests,
+                                    **_run_scenario(send_request, args.requests, concurrency)}
+                        scenarios.append(scenario)
+
+                        print(f'{target:<32}{model_name:<10}{word_count:>6}{section_count:>5}{concurrency:>5}'
+                              f'{scenario["p50_ms"]:>9.1f}{scenario["p95_ms"]:>9.1f}{scenario["p99_ms"]:>9.1f}'
+                              f'{scenario["tokens_per_second"]:>10.0f}{scenario["peak_rss_mb"]:>8.0f}')
+
+    results = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'git_commit': _get_git_commit(),
+        'python_version': platform.python_version(),
+        'service_config': lyrics_generator._config,
+        'cold_starts': cold_starts,
+        'scenarios': scenarios,
+    }
+    with open(args.output, 'w') as json_file:
+        json.dump(results, json_file, indent=2)
+    print(f'\nresults saved to {args.output}')
+
+    if args.baseline:
+        _print_baseline_comparison(scenarios, args.baseline)
+
+
+if __name__ == '__main__':
+    main()
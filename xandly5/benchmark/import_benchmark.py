@@ -0,0 +1,94 @@
+"""
+IMPORT TIME OF THE SCHEMA, SERVICE AND WEB MODULES, AND WHETHER THEY IMPORT TENSORFLOW
+
+usage: python xandly5/benchmark/import_benchmark.py [--repeat 5] [--max-ms 1000]
+
+each import runs in a new python process, so nothing is already imported; the time is the median of the runs.
+exits with an error if a module imports TensorFlow, or takes longer than --max-ms, to catch regressions in CI
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+# none of these should import TensorFlow: it is only imported when a model is loaded with the tensorflow or
+# tflite inference engine (or when training)
+MODULES = [
+    'xandly5.types.lyrics_model_enum',
+    'xandly5.types.lyrics_section',
+    'xandly5.types.decoding_options',
+    'xandly5.types.lyrics_model_meta',
+    'xandly5.ai_ml_model.catalog',
+    'xandly5.service.lyrics_generator',
+    'xandly5.web.lyrics_api',
+]
+REPEAT = 5
+
+_IMPORT_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{'seconds': time.perf_counter() - start, 'tensorflow': 'tensorflow' in sys.modules}}))
+'''
+
+_root_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../..')
+
+
+def measure_import(module: str) -> Dict:
+    """
+    :param module: module name, ex: xandly5.web.lyrics_api
+    :return: import time in seconds, and whether TensorFlow was imported, in a new process
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.path.abspath(_root_directory), env.get('PYTHONPATH')]))
+    completed_process = subprocess.run([sys.executable, '-c', _IMPORT_SCRIPT.format(module=module)], env=env,
+                                       capture_output=True, text=True, check=True)
+    return json.loads(completed_process.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(modules: List[str], repeat: int) -> List[Dict]:
+    """
+    :param modules: module names
+    :param repeat: number of imports of each module, each in a new process
+    :return: median import time in milliseconds, and whether TensorFlow was imported, for each module
+    """
+    results = []
+    for module in modules:
+        measurements = [measure_import(module) for _ in range(repeat)]
+        results.append({
+            'module': module,
+            'import_ms': statistics.median(measurement['seconds'] for measurement in measurements) * 1000,
+            'tensorflow': any(measurement['tensorflow'] for measurement in measurements),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='import time benchmark')
+    parser.add_argument('--modules', nargs='+', default=MODULES)
+    parser.add_argument('--repeat', type=int, default=REPEAT, help='imports of each module, each in a new process')
+    parser.add_argument('--max-ms', type=float, help='fail if a module takes longer to import')
+    args = parser.parse_args()
+
+    results = run_benchmark(args.modules, args.repeat)
+
+    failures = []
+    print(f'{"MODULE":<36}{"IMPORT MS":>11}{"TENSORFLOW":>12}')
+    for result in results:
+        print(f'{result["module"]:<36}{result["import_ms"]:>11.0f}{"yes" if result["tensorflow"] else "no":>12}')
+        if result['tensorflow']:
+            failures.append(f'{result["module"]} imports TensorFlow')
+        if args.max_ms is not None and result['import_ms'] > args.max_ms:
+            failures.append(f'{result["module"]} takes {result["import_ms"]:.0f} ms to import (max {args.max_ms:.0f})')
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+PER-TOKEN LATENCY OF EACH INFERENCE PATH, FOR EACH LYRICS MODEL
+
+usage: python xandly5/benchmark/inference_benchmark.py
+"""
+
+import time
+from types import SimpleNamespace
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+from xandly5.ai_ml_model.lyrics_predictor import LyricsPredictor
+from xandly5.ai_ml_model.numpy_lyrics_predictor import NumpyLyricsPredictor
+from xandly5.service.lyrics_generator import _model_registry
+from xandly5.types.lyrics_model_meta import LyricsModelMeta
+
+SEED_TEXT = 'a dreary midnight bird'
+WORD_COUNT = 200
+REPEAT = 3
+CANDIDATE_VOCABULARY_SIZE = 1000
+
+
+def _softmax_only(predictor) -> SimpleNamespace:
+    # hides predict_next_words, so generation computes the full softmax and takes its argmax
+    return SimpleNamespace(predict=predictor.predict)
+
+
+def _get_inference_paths(lyrics_model: LyricsModelMeta) -> List[Tuple[str, object]]:
+    if lyrics_model.model is None:
+        # loaded with the numpy inference engine
+        return [('numpy softmax', _softmax_only(lyrics_model.predictor)), ('numpy argmax', lyrics_model.predictor)]
+
+    model = lyrics_model.model
+    input_length = model.input_shape[-1]
+    candidate_ids = np.arange(1, CANDIDATE_VOCABULARY_SIZE + 1)
+    numpy_predictor = NumpyLyricsPredictor.from_keras_model(model)
+
+    return [
+        ('model.predict', model),
+        ('tf.function softmax', _softmax_only(LyricsPredictor(model, input_length))),
+        ('tf.function argmax', LyricsPredictor(model, input_length)),
+        (f'tf.function top {CANDIDATE_VOCABULARY_SIZE}', LyricsPredictor(model, input_length, candidate_ids)),
+        ('numpy softmax', _softmax_only(numpy_predictor)),
+        ('numpy argmax', numpy_predictor),
+        (f'numpy top {CANDIDATE_VOCABULARY_SIZE}', NumpyLyricsPredictor.from_keras_model(model, candidate_ids)),
+    ]
+
+
+def _time_per_token(generate: Callable[[], str]) -> float:
+    generate()  # warm up: tracing, first-call allocations
+
+    best_seconds = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        generate()
+        seconds = time.perf_counter() - start
+        best_seconds = seconds if best_seconds is None else min(best_seconds, seconds)
+
+    words_generated = WORD_COUNT - len(SEED_TEXT.split(' '))
+    return best_seconds / words_generated
+
+
+def main():
+    print(f'{"MODEL":<12}{"INFERENCE PATH":<24}{"MS PER TOKEN":>14}')
+
+    for model_id in _model_registry.model_ids:
+        lyrics_model = _model_registry.get(model_id)
+        for path_name, model in _get_inference_paths(lyrics_model):
+            seconds = _time_per_token(
+                lambda: lyrics_model.catalog.generate_lyrics_text(model, SEED_TEXT, WORD_COUNT))
+            print(f'{model_id.name:<12}{path_name:<24}{seconds * 1000:>14.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+SIZE, MEMORY, LATENCY AND GREEDY OUTPUT DIVERGENCE OF THE TFLITE MODELS, COMPARED TO THE H5 MODELS
+
+usage: python xandly5/benchmark/tflite_benchmark.py
+
+each backend runs in its own process, so its peak memory is measured on its own; missing tflite files are
+exported from the h5 models first
+"""
+
+import multiprocessing
+import os
+import resource
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from xandly5.service.lyrics_generator import _lyrics_model_files
+from xandly5.types.lyrics_model_enum import LyricsModelEnum
+
+# seed texts from the service tests
+SEED_TEXTS = [
+    'a dreary midnight bird',
+    'tone of his eyes of night litten have',
+    'evening fountains lit loss',
+    'said he art too seas for totter into',
+    'answer step only blows of their harp string',
+]
+WORD_COUNT = 100
+REPEAT = 3
+BACKENDS = ['h5', 'float16', 'int8']
+
+_saved_models_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../ai_ml_model/saved_models/')
+
+
+def _get_model_path(model_id: LyricsModelEnum, backend: str) -> str:
+    model_path = os.path.join(_saved_models_directory, _lyrics_model_files[model_id][0])
+    if backend == 'h5':
+        return model_path
+    return f'{os.path.splitext(model_path)[0]}_{backend}.tflite'
+
+
+def _export_tflite_files() -> None:
+    from tensorflow import keras
+    from xandly5.ai_ml_model.tflite_lyrics_predictor import TFLiteLyricsPredictor
+
+    for model_id in _lyrics_model_files:
+        model = None
+        for quantization in TFLiteLyricsPredictor.QUANTIZATIONS:
+            tflite_path = _get_model_path(model_id, quantization)
+            if not os.path.exists(tflite_path):
+                model = model or keras.models.load_model(_get_model_path(model_id, 'h5'))
+                print(f'exporting {os.path.basename(tflite_path)}')
+                TFLiteLyricsPredictor.save_tflite_file(model, tflite_path, quantization)
+
+
+def _get_peak_memory_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # kilobytes on linux
+
+
+def _run_backend(model_id: LyricsModelEnum, backend: str) -> Dict:
+    # runs in a new process: the peak memory increase of loading the model and its first prediction
+    from tensorflow import keras
+    from xandly5.ai_ml_model.catalog import Catalog
+    from xandly5.ai_ml_model.lyrics_predictor import LyricsPredictor
+    from xandly5.ai_ml_model.tflite_lyrics_predictor import TFLiteLyricsPredictor
+
+    start_memory_mb = _get_peak_memory_mb()
+    start = time.perf_counter()
+    if backend == 'h5':
+        model = keras.models.load_model(_get_model_path(model_id, backend))
+        predictor = LyricsPredictor(model, model.input_shape[-1])
+    else:
+        predictor = TFLiteLyricsPredictor.from_tflite_file(_get_model_path(model_id, backend))
+    predictor.predict_next_words(np.zeros((1, predictor.input_length), dtype=np.int32))  # tracing, allocations
+    load_seconds = time.perf_counter() - start
+    memory_mb = _get_peak_memory_mb() - start_memory_mb
+
+    # loaded after measuring the model, since building the tokenizer can peak higher than loading the model
+    catalog = Catalog.from_catalog_file(os.path.join(_saved_models_directory, _lyrics_model_files[model_id][2]))
+
+    lyrics_texts = [catalog.generate_lyrics_text(predictor, seed_text, WORD_COUNT) for seed_text in SEED_TEXTS]
+
+    best_seconds = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        for seed_text in SEED_TEXTS:
+            catalog.generate_lyrics_text(predictor, seed_text, WORD_COUNT)
+        seconds = time.perf_counter() - start
+        best_seconds = seconds if best_seconds is None else min(best_seconds, seconds)
+
+    words_generated = sum(WORD_COUNT - len(seed_text.split(' ')) for seed_text in SEED_TEXTS)
+
+    return {
+        'load_seconds': load_seconds,
+        'memory_mb': memory_mb,
+        'ms_per_token': best_seconds / words_generated * 1000,
+        'lyrics_texts': lyrics_texts,
+    }
+
+
+def _get_word_divergence(lyrics_texts: List[str], expected_lyrics_texts: List[str]) -> float:
+    words = [word for lyrics_text in lyrics_texts for word in lyrics_text.split(' ')]
+    expected_words = [word for lyrics_text in expected_lyrics_texts for word in lyrics_text.split(' ')]
+    different_words = sum(word != expected_word for word, expected_word in zip(words, expected_words))
+    return different_words / len(expected_words)
+
+
+def main():
+    _export_tflite_files()
+
+    print(f'{"MODEL":<12}{"BACKEND":<10}{"FILE MB":>9}{"LOAD S":>8}{"PEAK MB":>9}{"MS PER TOKEN":>14}'
+          f'{"SAME TEXTS":>12}{"WORDS DIFFERENT":>17}')
+
+    spawn_context = multiprocessing.get_context('spawn')
+    for model_id in _lyrics_model_files:
+        expected_lyrics_texts = None
+        for backend in BACKENDS:
+            with spawn_context.Pool(1) as pool:
+                result = pool.apply(_run_backend, (model_id, backend))
+
+            if expected_lyrics_texts is None:
+                expected_lyrics_texts = result['lyrics_texts']
+            same_texts = sum(lyrics_text == expected_lyrics_text for lyrics_text, expected_lyrics_text
+                             in zip(result['lyrics_texts'], expected_lyrics_texts))
+            word_divergence = _get_word_divergence(result['lyrics_texts'], expected_lyrics_texts)
+            file_mb = os.path.getsize(_get_model_path(model_id, backend)) / 1024 / 1024
+
+            print(f'{model_id.name:<12}{backend:<10}{file_mb:>9.2f}{result["load_seconds"]:>8.2f}'
+                  f'{result["memory_mb"]:>9.1f}{result["ms_per_token"]:>14.3f}'
+                  f'{f"{same_texts}/{len(SEED_TEXTS)}":>12}{word_divergence:>17.1%}')
+
+
+if __name__ == '__main__':
+    main()
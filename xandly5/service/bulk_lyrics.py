@@ -0,0 +1,88 @@
+"""
+BULK LYRICS GENERATION: JSONL FILE OF REQUESTS IN, JSONL FILE OF RESULTS OUT
+
+usage: python -m xandly5.service.bulk_lyrics requests.jsonl results.jsonl [--batch-size 256]
+
+each request line has model_id, seed_text, word_count and word_group_count (and an optional request_id, which
+defaults to the line number); each result line has the request values, and the lyrics or an error
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Dict, Iterable, Iterator, Optional
+
+from xandly5.service.lyrics_generator import LyricsGenerator
+from xandly5.types.bulk_lyrics_request import BulkLyricsRequest
+
+
+def iterate_bulk_lyrics_requests(lines: Iterable[str]) -> Iterator[BulkLyricsRequest]:
+    """
+    :param lines: JSONL lines, one request per line; blank lines are skipped
+    :return: iterator of requests; lines that are not valid requests are returned with an error
+    """
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            values = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield BulkLyricsRequest(line_number, None, '', 0, 0, error=f'Invalid JSON: {e}')
+            continue
+
+        if not isinstance(values, dict):
+            yield BulkLyricsRequest(line_number, None, '', 0, 0, error='Request must be a JSON object')
+            continue
+        yield BulkLyricsRequest.from_dict(values, line_number)
+
+
+def generate_lyrics_file(input_file: str, output_file: str, batch_size: Optional[int] = None) -> Dict[str, float]:
+    """
+    generate lyrics for each request in a JSONL file, writing results as each batch is done
+
+    :param input_file: JSONL requests file
+    :param output_file: JSONL results file
+    :param batch_size: maximum number of requests generated together, None for bulk_batch_size
+    :return: request, error and word counts, and throughput
+    """
+    request_count = 0
+    error_count = 0
+    words_generated = 0
+    start = time.perf_counter()
+
+    with open(input_file) as requests_file, open(output_file, 'w') as results_file:
+        for result in LyricsGenerator.generate_lyrics_bulk(iterate_bulk_lyrics_requests(requests_file), batch_size):
+            results_file.write(json.dumps(result.to_dict()) + '\n')
+            request_count += 1
+            if result.error is not None:
+                error_count += 1
+            else:
+                words_generated += max(result.word_count - len(result.seed_text.split(' ')), 0)
+
+    seconds = time.perf_counter() - start
+    return {
+        'requests': request_count,
+        'errors': error_count,
+        'words_generated': words_generated,
+        'seconds': seconds,
+        'requests_per_second': request_count / seconds,
+        'words_per_second': words_generated / seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='bulk lyrics generation, JSONL in and out')
+    parser.add_argument('input_file', help='JSONL requests file')
+    parser.add_argument('output_file', help='JSONL results file')
+    parser.add_argument('--batch-size', type=int, help='requests generated together, for each model')
+    args = parser.parse_args()
+
+    stats = generate_lyrics_file(args.input_file, args.output_file, args.batch_size)
+    print(f'{stats["requests"]} requests ({stats["errors"]} errors), {stats["words_generated"]} words in '
+          f'{stats["seconds"]:.1f} seconds: {stats["requests_per_second"]:.1f} requests/sec, '
+          f'{stats["words_per_second"]:.0f} words/sec', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
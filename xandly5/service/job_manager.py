@@ -0,0 +1,129 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from xandly5.types.job_status_enum import JobStatusEnum
+from xandly5.types.lyrics_job import LyricsJob
+from xandly5.types.validation_error import ValidationError
+
+
+class JobManager:
+    """
+    runs lyrics generation jobs on a bounded worker pool, and keeps their state in memory so clients can poll
+    for progress and results; finished jobs are kept for retention_seconds
+    """
+
+    def __init__(self, max_workers: int = 2, max_queued_jobs: int = 100, retention_seconds: float = 3600):
+        """
+        :param max_workers: number of jobs run at the same time
+        :param max_queued_jobs: maximum number of jobs waiting for a worker; new jobs are rejected past this
+        :param retention_seconds: seconds a finished job is kept
+        """
+        self.max_workers = max_workers
+        self.max_queued_jobs = max_queued_jobs
+        self.retention_seconds = retention_seconds
+
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, LyricsJob] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='lyrics-job')
+
+    def submit(self, job: LyricsJob, run: Callable[[LyricsJob], str]) -> LyricsJob:
+        """
+        queue a job
+
+        :param job: job to run
+        :param run: generates the lyrics for the job; should update the job's progress, and stop early once
+            job.cancel_event is set
+        :return: the queued job
+        """
+        with self._lock:
+            self._remove_expired_jobs()
+            if self._get_status_count(JobStatusEnum.QUEUED) >= self.max_queued_jobs:
+                raise ValidationError(f'Job queue is full, cannot exceed {self.max_queued_jobs} queued jobs')
+            self._jobs[job.job_id] = job
+
+        self._executor.submit(self._run_job, job, run)
+        return job
+
+    def get(self, job_id: str) -> Optional[LyricsJob]:
+        """
+        :param job_id: job id
+        :return: job, or None if the job does not exist or has expired
+        """
+        with self._lock:
+            self._remove_expired_jobs()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[LyricsJob]:
+        """
+        cancel a job; a queued job is cancelled before it starts, and a running job stops after its current word
+
+        :param job_id: job id
+        :return: job, or None if the job does not exist or has expired
+        """
+        with self._lock:
+            self._remove_expired_jobs()
+            job = self._jobs.get(job_id)
+            if job is not None and not job.is_finished():
+                job.cancel_event.set()
+                if job.status == JobStatusEnum.QUEUED:
+                    # cancelled now, rather than when a worker takes it from the queue
+                    job.status = JobStatusEnum.CANCELLED
+                    job.finished_time = time.time()
+        return job
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        job counts by status and queue depth, for monitoring
+
+        :return: dictionary of job statistics
+        """
+        with self._lock:
+            stats = {status.name.lower(): self._get_status_count(status) for status in JobStatusEnum}
+            stats['queue_depth'] = stats['queued']
+            stats['max_workers'] = self.max_workers
+            return stats
+
+    def shutdown(self) -> None:
+        """
+        cancel all unfinished jobs, and wait for running jobs to stop
+
+        :return: None
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancel_event.set()
+        self._executor.shutdown(wait=True)
+
+    def _get_status_count(self, status: JobStatusEnum) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == status)
+
+    def _remove_expired_jobs(self) -> None:
+        expire_time = time.time() - self.retention_seconds
+        for job_id in [job.job_id for job in self._jobs.values()
+                       if job.finished_time is not None and job.finished_time < expire_time]:
+            del self._jobs[job_id]
+
+    def _run_job(self, job: LyricsJob, run: Callable[[LyricsJob], str]) -> None:
+        with self._lock:
+            if job.is_finished():
+                return  # cancelled while queued
+            is_cancelled = job.cancel_event.is_set()
+            if not is_cancelled:
+                job.status = JobStatusEnum.RUNNING
+
+        if not is_cancelled:
+            try:
+                job.lyrics = run(job)
+            except Exception as e:
+                job.error = str(e)
+
+        if job.error is not None:
+            job.status = JobStatusEnum.FAILED
+        elif job.cancel_event.is_set():
+            job.status = JobStatusEnum.CANCELLED
+            job.lyrics = None
+        else:
+            job.status = JobStatusEnum.COMPLETED
+        job.finished_time = time.time()
@@ -1,53 +1,226 @@
+import hashlib
+import itertools
 import json
 import os
 import re
-from typing import Dict, List
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from tensorflow import keras
+import numpy as np
 
-from xandly5.ai_ml_model.catalog import Catalog
+from xandly5.ai_ml_model.batching_scheduler import BatchingScheduler
+from xandly5.ai_ml_model.catalog import Catalog, LyricsSession
+from xandly5.ai_ml_model.decoders import BeamSearchDecoder, Decoder, SamplingDecoder
 from xandly5.ai_ml_model.lyrics_formatter import LyricsFormatter
+from xandly5.ai_ml_model.numpy_lyrics_predictor import NumpyLyricsPredictor
+from xandly5.service import metrics
+from xandly5.service.job_manager import JobManager
+from xandly5.service.model_registry import ModelRegistry
+from xandly5.service.result_cache import ResultCache
+from xandly5.types.bulk_lyrics_request import BulkLyricsRequest
+from xandly5.types.decoding_method_enum import DecodingMethodEnum
+from xandly5.types.decoding_options import DecodingOptions
+from xandly5.types.lyrics_job import LyricsJob
 from xandly5.types.lyrics_model_enum import LyricsModelEnum
 from xandly5.types.lyrics_model_meta import LyricsModelMeta
 from xandly5.types.lyrics_section import LyricsSection
 from xandly5.types.validation_error import ValidationError
 
+if TYPE_CHECKING:
+    from xandly5.ai_ml_model.tflite_lyrics_predictor import TFLiteLyricsPredictor
 
-def _load_lyrics_models() -> Dict[LyricsModelEnum, LyricsModelMeta]:
-    print('loading lyrics models')
-    models: Dict[LyricsModelEnum, LyricsModelMeta] = {
-        LyricsModelEnum.SONNETS: LyricsModelMeta('shakespeare_sonnet.h5', 'shakespeare-sonnets-lyrics.txt'),
-        LyricsModelEnum.POE_POEM: LyricsModelMeta('poe_poem.h5', 'poe-poem-lines.txt')
-    }
 
-    package_directory = os.path.dirname(os.path.abspath(__file__))
+_package_directory = os.path.dirname(os.path.abspath(__file__))
 
-    for _, lyrics_model in models.items():
-        lyrics_model.model = keras.models.load_model(
-            os.path.join(package_directory, '../ai_ml_model/saved_models/', lyrics_model.model_file))
-        lyrics_model.catalog = Catalog()
-        lyrics_model.catalog.add_file_to_catalog(
-            os.path.join(package_directory, '../ai_ml_model/lyrics_files/', lyrics_model.lyrics_file))
-        lyrics_model.catalog.tokenize_catalog()
+with open(os.path.join(_package_directory, 'lyrics_generator_config.json')) as json_file:
+    _config = json.load(json_file)
 
-    return models
 
+def _load_catalog(lyrics_model: LyricsModelMeta, total_words: int, input_length: int) -> Catalog:
+    catalog_path = os.path.join(_package_directory, '../ai_ml_model/saved_models/', lyrics_model.catalog_file)
 
-# load using global variable
-keras.backend.clear_session()
-_lyrics_models = _load_lyrics_models()
+    if os.path.exists(catalog_path):
+        catalog = Catalog.from_catalog_file(catalog_path)
+        # the catalog must have the vocabulary and sequence length the model was trained with
+        if catalog.total_words == total_words and catalog.max_sequence_length - 1 == input_length:
+            return catalog
+        print(f'catalog file does not match model: {lyrics_model.catalog_file}')
 
+    # no usable catalog file (ex: downloaded models): tokenize the lyrics, and save a catalog file for next time
+    catalog = Catalog()
+    catalog.add_files_to_catalog(
+        os.path.join(_package_directory, '../ai_ml_model/lyrics_files/', lyrics_model.lyrics_file), keep_items=False)
 
-class LyricsGenerator:
+    try:
+        catalog.save_catalog_file(catalog_path)
+    except OSError as e:
+        print(f'unable to save catalog file: {e}')
+
+    return catalog
+
+
+def _get_file_hash(file_name: str) -> str:
+    file_hash = hashlib.sha256()
+    with open(file_name, 'rb') as model_file:
+        for block in iter(lambda: model_file.read(1024 * 1024), b''):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+_lyrics_model_files: Dict[LyricsModelEnum, Tuple[str, str, str, str]] = {
+    LyricsModelEnum.SONNETS: ('shakespeare_sonnet.h5', 'shakespeare-sonnets-lyrics.txt',
+                              'shakespeare_sonnet_catalog.json', 'shakespeare_sonnet.npz'),
+    LyricsModelEnum.POE_POEM: ('poe_poem.h5', 'poe-poem-lines.txt', 'poe_poem_catalog.json', 'poe_poem.npz')
+}
+
+
+def _get_candidate_ids(total_words: int) -> Optional[np.ndarray]:
+    candidate_vocabulary_size = int(_config['candidate_vocabulary_size'])
+    if candidate_vocabulary_size <= 0 or candidate_vocabulary_size >= total_words - 1:
+        return None  # full vocabulary
+
+    # the tokenizer numbers words by frequency, starting at 1, so the first indexes are the most common words
+    return np.arange(1, candidate_vocabulary_size + 1)
+
+
+def _is_npz_file_current(lyrics_model: LyricsModelMeta) -> bool:
+    model_path = os.path.join(_package_directory, '../ai_ml_model/saved_models/', lyrics_model.model_file)
+    npz_path = os.path.join(_package_directory, '../ai_ml_model/saved_models/', lyrics_model.npz_file)
+    return os.path.exists(npz_path) and os.path.getmtime(npz_path) >= os.path.getmtime(model_path)
+
+
+def _load_numpy_predictor(lyrics_model: LyricsModelMeta) -> NumpyLyricsPredictor:
+    model_path = os.path.join(_package_directory, '../ai_ml_model/saved_models/', lyrics_model.model_file)
+    npz_path = os.path.join(_package_directory, '../ai_ml_model/saved_models/', lyrics_model.npz_file)
+
+    # no npz file, or an older one than the h5 model (ex: downloaded models): export the weights for next time
+    if not _is_npz_file_current(lyrics_model):
+        from tensorflow import keras  # only to export the npz file, numpy inference does not need TensorFlow
+        model = keras.models.load_model(model_path)
+        try:
+            NumpyLyricsPredictor.save_npz_file(model, npz_path)
+        except OSError as e:
+            print(f'unable to save npz file: {e}')
+            return NumpyLyricsPredictor.from_keras_model(model, _get_candidate_ids(model.output_shape[-1]))
+
+    with np.load(npz_path) as weights:
+        total_words = len(weights['dense_bias'])
+    return NumpyLyricsPredictor.from_npz_file(npz_path, _get_candidate_ids(total_words))
 
-    _package_directory = os.path.dirname(os.path.abspath(__file__))
 
-    with open(os.path.join(_package_directory, 'lyrics_generator_config.json')) as json_file:
-        _config = json.load(json_file)
+def _load_tflite_predictor(lyrics_model: LyricsModelMeta) -> 'TFLiteLyricsPredictor':
+    from tensorflow import keras
+    from xandly5.ai_ml_model.tflite_lyrics_predictor import TFLiteLyricsPredictor
+
+    quantization = _config['tflite_quantization']
+    num_threads = int(_config['tflite_num_threads'])
+    model_path = os.path.join(_package_directory, '../ai_ml_model/saved_models/', lyrics_model.model_file)
+    tflite_path = f'{os.path.splitext(model_path)[0]}_{quantization}.tflite'
+
+    # no tflite file, or an older one than the h5 model (ex: downloaded models): export the model for next time
+    if not os.path.exists(tflite_path) or os.path.getmtime(tflite_path) < os.path.getmtime(model_path):
+        model = keras.models.load_model(model_path)
+        model_content = TFLiteLyricsPredictor.convert_model(model, quantization)
+        try:
+            with open(tflite_path, 'wb') as tflite_file:
+                tflite_file.write(model_content)
+        except OSError as e:
+            print(f'unable to save tflite file: {e}')
+        predictor = TFLiteLyricsPredictor(model_content, num_threads)
+    else:
+        predictor = TFLiteLyricsPredictor.from_tflite_file(tflite_path, num_threads)
+
+    predictor.candidate_ids = _get_candidate_ids(predictor.total_words)
+    return predictor
+
+
+def _load_lyrics_model(model_id: LyricsModelEnum) -> LyricsModelMeta:
+    start = time.perf_counter()
+    lyrics_model = LyricsModelMeta(*_lyrics_model_files[model_id])
+
+    model_path = os.path.join(_package_directory, '../ai_ml_model/saved_models/', lyrics_model.model_file)
+    lyrics_model.model_hash = _get_file_hash(model_path)
+
+    if _config['inference_engine'] in ('numpy', 'tflite'):
+        if _config['inference_engine'] == 'numpy':
+            lyrics_model.predictor = _load_numpy_predictor(lyrics_model)
+        else:
+            lyrics_model.predictor = _load_tflite_predictor(lyrics_model)
+        lyrics_model.catalog = _load_catalog(lyrics_model, lyrics_model.predictor.total_words,
+                                             lyrics_model.predictor.input_length)
+    else:
+        from tensorflow import keras
+        from xandly5.ai_ml_model.lyrics_predictor import LyricsPredictor
+
+        lyrics_model.model = keras.models.load_model(model_path)
+        lyrics_model.catalog = _load_catalog(lyrics_model, lyrics_model.model.output_shape[-1],
+                                             lyrics_model.model.input_shape[-1])
+        lyrics_model.predictor = LyricsPredictor(lyrics_model.model, lyrics_model.catalog.max_sequence_length - 1,
+                                                 _get_candidate_ids(lyrics_model.catalog.total_words))
+
+    if _config['batching_enabled']:
+        lyrics_model.scheduler = BatchingScheduler(lyrics_model.predictor,
+                                                   max_batch_size=int(_config['batching_max_batch_size']),
+                                                   max_wait_ms=float(_config['batching_max_wait_ms']),
+                                                   name=model_id.name)
+
+    # predictions are timed in the thread that waits for them, for the predict phase of its request
+    if lyrics_model.scheduler is not None:
+        lyrics_model.scheduler = metrics.TimedPredictor(lyrics_model.scheduler)
+    else:
+        lyrics_model.predictor = metrics.TimedPredictor(lyrics_model.predictor)
+
+    metrics.model_load_seconds.observe(time.perf_counter() - start, model_id.name)
+    return lyrics_model
+
+
+# models are loaded on first use, except those listed for warm-up
+_model_registry = ModelRegistry(_load_lyrics_model, _lyrics_model_files.keys(),
+                                max_loaded_models=int(_config['max_loaded_models']))
+_model_registry.warm_up([LyricsModelEnum[model_name] for model_name in _config['preload_models']])
+
+# generation is deterministic (except unseeded sampling, which is not cached), so results are shared across requests
+_result_cache: Optional[ResultCache] = None
+if _config['result_cache_enabled']:
+    _result_cache = ResultCache(max_size=int(_config['result_cache_max_size']),
+                                ttl_seconds=float(_config['result_cache_ttl_seconds']))
+
+# long structured generations can run as jobs, on a bounded worker pool
+_job_manager = JobManager(max_workers=int(_config['jobs_max_workers']),
+                          max_queued_jobs=int(_config['jobs_max_queued']),
+                          retention_seconds=float(_config['jobs_retention_seconds']))
+
+
+def _get_generated_word_count(seed_text: str, lyrics_text: str) -> int:
+    # words the model generated: the lyrics text is the seed text and each generated word, joined with spaces
+    return len(lyrics_text.split(' ')) - len(seed_text.split(' '))
+
+
+def _count_generated_words(tracker: metrics.RequestTracker, words: Iterator[str]) -> Iterator[str]:
+    # counts words as they are generated, for streamed requests
+    for word in words:
+        tracker.word_count += 1
+        yield word
+
+
+def _create_decoder(decoding_options: Optional[DecodingOptions], first_row: int = 0) -> Optional[Decoder]:
+    # a decoder keeps state (ex: random generators), so one is created for each request; first_row is the row of
+    # a section generated on its own rather than in a batch, so it generates the same words either way
+    if decoding_options is None or decoding_options.method == DecodingMethodEnum.GREEDY:
+        return None  # Catalog's greedy decoding
+    if decoding_options.method == DecodingMethodEnum.SAMPLING:
+        return SamplingDecoder(temperature=decoding_options.temperature, top_k=decoding_options.top_k,
+                               top_p=decoding_options.top_p, seed=decoding_options.seed, first_row=first_row)
+    return BeamSearchDecoder(beam_width=decoding_options.beam_width)
+
+
+class LyricsGenerator:
 
     max_seed_text_length = int(_config['max_seed_text_length'])
     max_words_generated = int(_config['max_words_generated'])
     max_lyrics_sections = int(_config['max_lyrics_sections'])
+    max_beam_width = int(_config['max_beam_width'])
+    max_bulk_requests = int(_config['max_bulk_requests'])
 
     def __init__(self, model_id: LyricsModelEnum):
         """
@@ -56,10 +229,19 @@ class LyricsGenerator:
         :param model_id: model to use for word generation (LyricsModelEnum)
         """
 
-        if model_id not in _lyrics_models:
+        if not _model_registry.is_registered(model_id):
             raise ValidationError(f'Invalid Model Id: {model_id}')
         print('init LyricsGenerator instance')
-        self.model_meta: LyricsModelMeta = _lyrics_models[model_id]
+        self.model_id = LyricsModelEnum(model_id)  # the REST API passes an int, metrics use the enum name
+        _model_registry.get(model_id)  # load the model now, rather than in the first generation
+
+    @property
+    def model_meta(self) -> LyricsModelMeta:
+        """
+        :return: the model currently loaded for model_id, loading it again if it was unloaded or evicted;
+            generations lease the model from the registry instead, so it stays open until they are done
+        """
+        return _model_registry.get(self.model_id)
 
     @staticmethod
     def _clean_seed_text(seed_text: str) -> str:
@@ -80,6 +262,23 @@ class LyricsGenerator:
         if word_group_count > self.max_words_generated:
             raise ValidationError(f'Word Group Count cannot exceed {self.max_words_generated}')
 
+    def _validate_decoding_options(self, decoding_options: Optional[DecodingOptions]) -> None:
+        if decoding_options is None:
+            return
+        if not isinstance(decoding_options.temperature, (int, float)) or decoding_options.temperature <= 0:
+            raise ValidationError('Temperature must be greater than 0')
+        if not isinstance(decoding_options.top_k, int) or decoding_options.top_k < 0:
+            raise ValidationError('Top K must be 0 or greater')
+        if not isinstance(decoding_options.top_p, (int, float)) or not 0 < decoding_options.top_p <= 1:
+            raise ValidationError('Top P must be greater than 0, and at most 1')
+        if not isinstance(decoding_options.beam_width, int) or decoding_options.beam_width < 1:
+            raise ValidationError('Beam Width must be 1 or greater')
+        if decoding_options.method == DecodingMethodEnum.BEAM and decoding_options.beam_width > self.max_beam_width:
+            raise ValidationError(f'Beam Width cannot exceed {self.max_beam_width}')
+        if decoding_options.seed is not None and (not isinstance(decoding_options.seed, int) or
+                                                  decoding_options.seed < 0):
+            raise ValidationError('Seed must be 0 or greater')
+
     def _clean_and_validate_lyrics_sections(self, lyrics_sections: List[LyricsSection]) -> None:
         if len(lyrics_sections) > self.max_lyrics_sections:
             raise ValidationError(f'Total number of Lyrics Sections cannot exceed {self.max_lyrics_sections}')
@@ -88,78 +287,430 @@ class LyricsGenerator:
             self._validate_lyrics_options(seed_text=section.seed_text, word_group_count=section.word_group_count,
                                           word_count=section.word_count)
 
-    def generate_lyrics(self, seed_text: str, word_group_count: int, word_count: int) -> str:
+    def generate_lyrics(self, seed_text: str, word_group_count: int, word_count: int,
+                        decoding_options: Optional[DecodingOptions] = None) -> str:
         """
         creates lyrics using the specified starter text
 
         :param seed_text: starter text
         :param word_group_count: controls the addition of commas or blank lines
         :param word_count: total number of words to return
+        :param decoding_options: how each next word is chosen, None for greedy decoding
         :return: seed text + generated text
         """
         seed_text = self._clean_seed_text(seed_text)
         self._validate_lyrics_options(seed_text=seed_text, word_group_count=word_group_count, word_count=word_count)
-        lyrics_text = self.model_meta.generate_lyrics_text(seed_text=seed_text, word_count=word_count)
-        lyrics_text = LyricsFormatter.format_lyrics(lyrics_text, word_group_count=word_group_count)
-        return lyrics_text
+        self._validate_decoding_options(decoding_options)
+
+        with metrics.RequestTracker(self.model_id.name, 'generate_lyrics') as tracker:
+            cache_key = self._get_cache_key(seed_text, word_group_count, word_count, decoding_options)
+            if cache_key is not None:
+                lyrics_text = _result_cache.get(cache_key)
+                if lyrics_text is not None:
+                    return lyrics_text
+
+            with metrics.time_phase('generate'):
+                with _model_registry.lease(self.model_id) as model_meta:
+                    lyrics_text = model_meta.generate_lyrics_text(seed_text=seed_text, word_count=word_count,
+                                                                  decoder=_create_decoder(decoding_options))
+            tracker.word_count = _get_generated_word_count(seed_text, lyrics_text)
+            with metrics.time_phase('format'):
+                lyrics_text = LyricsFormatter.format_lyrics(lyrics_text, word_group_count=word_group_count)
+
+            if cache_key is not None:
+                _result_cache.put(cache_key, lyrics_text)
+            return lyrics_text
+
+    def generate_lyrics_stream(self, seed_text: str, word_group_count: int, word_count: int,
+                               decoding_options: Optional[DecodingOptions] = None) -> Iterator[str]:
+        """
+        creates lyrics using the specified starter text, yielding formatted text as each word is generated;
+        inputs are validated before the iterator is returned
+
+        :param seed_text: starter text
+        :param word_group_count: controls the addition of commas or blank lines
+        :param word_count: total number of words to return
+        :param decoding_options: how each next word is chosen, None for greedy decoding; with beam search,
+            words are only sent once the search is done
+        :return: iterator of formatted text, which joins to the same text as generate_lyrics
+        """
+        seed_text = self._clean_seed_text(seed_text)
+        self._validate_lyrics_options(seed_text=seed_text, word_group_count=word_group_count, word_count=word_count)
+        self._validate_decoding_options(decoding_options)
+
+        tracker = metrics.RequestTracker(self.model_id.name, 'generate_lyrics_stream')
+        cache_key = self._get_cache_key(seed_text, word_group_count, word_count, decoding_options)
+        if cache_key is not None:
+            lyrics_text = _result_cache.get(cache_key)
+            if lyrics_text is not None:
+                return metrics.track_stream(tracker, iter([lyrics_text]))
+
+        return metrics.track_stream(tracker, self._stream_lyrics(seed_text, word_group_count, word_count,
+                                                                 decoding_options, cache_key, tracker))
+
+    def _stream_lyrics(self, seed_text: str, word_group_count: int, word_count: int,
+                       decoding_options: Optional[DecodingOptions], cache_key: Optional[tuple],
+                       tracker: metrics.RequestTracker) -> Iterator[str]:
+        chunks = []
+        with _model_registry.lease(self.model_id) as model_meta:
+            generated_words = model_meta.generate_lyrics_words(seed_text=seed_text, word_count=word_count,
+                                                               decoder=_create_decoder(decoding_options))
+            words = itertools.chain(seed_text.split(' '), _count_generated_words(tracker, generated_words))
+            for chunk in LyricsFormatter.iterate_formatted_lyrics(words, word_group_count=word_group_count):
+                chunks.append(chunk)
+                yield chunk
+
+        if cache_key is not None:
+            _result_cache.put(cache_key, ''.join(chunks))
+
+    def _get_cache_key(self, seed_text: str, word_group_count: int, word_count: int,
+                       decoding_options: Optional[DecodingOptions]) -> Optional[tuple]:
+        # None if results are not cached: cache disabled, or sampling without a seed
+        if _result_cache is None or (decoding_options is not None and not decoding_options.is_deterministic()):
+            return None
+        decoding_key = () if decoding_options is None else decoding_options.get_key()
+        return self.model_id, self.model_meta.model_hash, seed_text, word_count, word_group_count, *decoding_key
+
+    @staticmethod
+    def get_model_stats() -> Dict[str, dict]:
+        """
+        load state and load time of each model, for monitoring
+
+        :return: dictionary of model statistics, by model name
+        """
+        return _model_registry.get_stats()
+
+    @staticmethod
+    def get_metrics_text() -> str:
+        """
+        request latency, phase times, words generated, model load times and in-flight requests, for monitoring
+
+        :return: metrics by model, in the Prometheus text format
+        """
+        return metrics.get_metrics_text()
+
+    @staticmethod
+    def is_npz_file_current(model_id: LyricsModelEnum) -> bool:
+        """
+        :param model_id: model to check
+        :return: True if the model's npz file is exported and up to date, so the numpy inference engine can load
+            the model without importing TensorFlow
+        """
+        return _is_npz_file_current(LyricsModelMeta(*_lyrics_model_files[model_id]))
+
+    @staticmethod
+    def unload_model(model_id: LyricsModelEnum) -> bool:
+        """
+        unload a model to free its memory; it is loaded again on its next request
+
+        :param model_id: model to unload
+        :return: True if the model was loaded
+        """
+        return _model_registry.unload(model_id)
+
+    @staticmethod
+    def get_cache_stats() -> Dict[str, int]:
+        """
+        hit/miss counters for the generate_lyrics result cache, for monitoring
 
-    def generate_lyrics_from_independent_sections(self, lyrics_sections: List[LyricsSection]) -> str:
+        :return: dictionary of cache statistics; empty if the cache is disabled
+        """
+        return {} if _result_cache is None else _result_cache.get_stats()
+
+    def generate_lyrics_from_independent_sections(self, lyrics_sections: List[LyricsSection],
+                                                  decoding_options: Optional[DecodingOptions] = None) -> str:
         """
         creates lyrics using a LyricsSection list; sections are *not* influenced by the text in other sections
 
         :param lyrics_sections: list of LyricsSection
+        :param decoding_options: how each next word is chosen, None for greedy decoding
         :return: all lyrics, formatted
         """
 
         lyrics_text = ''
 
         self._clean_and_validate_lyrics_sections(lyrics_sections)
-
-        for section in lyrics_sections:
-            section.generated_text = self.model_meta.generate_lyrics_text(seed_text=section.seed_text,
-                                                                          word_count=section.word_count)
-            section.generated_text = LyricsFormatter.format_lyrics(section.generated_text,
-                                                                   word_group_count=section.word_group_count)
-
-            lyrics_text += f'--{section.section_type.name}--\n\n' + section.generated_text
+        self._validate_decoding_options(decoding_options)
+
+        with metrics.RequestTracker(self.model_id.name, 'generate_lyrics_from_independent_sections',
+                                    section_count=len(lyrics_sections)) as tracker:
+            # sections are independent, so they are generated together as one batch
+            with metrics.time_phase('generate'):
+                with _model_registry.lease(self.model_id) as model_meta:
+                    generated_texts = model_meta.generate_lyrics_texts(
+                        seed_texts=[section.seed_text for section in lyrics_sections],
+                        word_counts=[section.word_count for section in lyrics_sections],
+                        decoder=_create_decoder(decoding_options))
+            tracker.word_count = sum(_get_generated_word_count(section.seed_text, generated_text)
+                                     for section, generated_text in zip(lyrics_sections, generated_texts))
+
+            with metrics.time_phase('format'):
+                for section, generated_text in zip(lyrics_sections, generated_texts):
+                    section.generated_text = LyricsFormatter.format_lyrics(generated_text,
+                                                                           word_group_count=section.word_group_count)
+
+                    lyrics_text += f'--{section.section_type.name}--\n\n' + section.generated_text
 
         return lyrics_text
 
-    def generate_lyrics_from_sections(self, lyrics_sections: List[LyricsSection]) -> str:
+    def generate_lyrics_from_sections(self, lyrics_sections: List[LyricsSection],
+                                      decoding_options: Optional[DecodingOptions] = None) -> str:
         """
         creates lyrics using a LyricsSection list; later sections are influenced by the text in previous sections
 
         :param lyrics_sections:
+        :param decoding_options: how each next word is chosen, None for greedy decoding
         :return: all lyrics, formatted
         """
 
-        lyrics_text = ''
         formatted_lyrics_text = ''
         total_word_count = 0
 
         self._clean_and_validate_lyrics_sections(lyrics_sections)
+        self._validate_decoding_options(decoding_options)
 
-        for section in lyrics_sections:
-            total_word_count += section.word_count
-
-            # use current lyrics as seed text
-            if lyrics_text != '':
-                lyrics_text += ' '
-            lyrics_text += section.seed_text
-            lyrics_text = self.model_meta.generate_lyrics_text(seed_text=lyrics_text,
-                                                               word_count=total_word_count)
-            # get section text from lyrics, then format
-            section.generated_text = self._get_words_at_end(lyrics_text, section.word_count)
-            section.generated_text = LyricsFormatter.format_lyrics(section.generated_text,
-                                                                   word_group_count=section.word_group_count)
-
-            # will return formatted lyrics with section headers
-            formatted_lyrics_text += f'--{section.section_type.name}--\n\n' + section.generated_text
+        decoder = _create_decoder(decoding_options)
+
+        with metrics.RequestTracker(self.model_id.name, 'generate_lyrics_from_sections',
+                                    section_count=len(lyrics_sections)) as tracker:
+            with _model_registry.lease(self.model_id) as model_meta:
+                # the session keeps the tokens of the current lyrics, which are the seed for each section
+                session = LyricsSession(model_meta.catalog)
+
+                for section in lyrics_sections:
+                    total_word_count += section.word_count
+
+                    with metrics.time_phase('generate'):
+                        tracker.word_count += model_meta.continue_lyrics_session(
+                            session, seed_text=section.seed_text, word_count=total_word_count, decoder=decoder)
+                    with metrics.time_phase('format'):
+                        # get section text from lyrics, then format
+                        section.generated_text = session.get_words_at_end(section.word_count)
+                        section.generated_text = LyricsFormatter.format_lyrics(
+                            section.generated_text, word_group_count=section.word_group_count)
+
+                    # will return formatted lyrics with section headers
+                    formatted_lyrics_text += f'--{section.section_type.name}--\n\n' + section.generated_text
 
         return formatted_lyrics_text
 
+    def generate_lyrics_from_sections_stream(self, lyrics_sections: List[LyricsSection],
+                                             independent_sections: bool = False,
+                                             decoding_options: Optional[DecodingOptions] = None) -> Iterator[str]:
+        """
+        creates lyrics using a LyricsSection list, yielding each section header as the section starts, then its
+        formatted text as each word is generated; inputs are validated before the iterator is returned
+
+        :param lyrics_sections: list of LyricsSection
+        :param independent_sections: sections are *not* influenced by the text in other sections; sections are
+            streamed one after another, rather than generated as one batch
+        :param decoding_options: how each next word is chosen, None for greedy decoding; with beam search,
+            each section's words are only sent once its search is done
+        :return: iterator of formatted text, which joins to the same text as the non-streaming methods
+        """
+
+        self._clean_and_validate_lyrics_sections(lyrics_sections)
+        self._validate_decoding_options(decoding_options)
+
+        tracker = metrics.RequestTracker(self.model_id.name, 'generate_lyrics_from_sections_stream',
+                                         section_count=len(lyrics_sections))
+        if independent_sections:
+            return metrics.track_stream(tracker, self._stream_independent_sections(lyrics_sections, decoding_options,
+                                                                                   tracker))
+        return metrics.track_stream(tracker, self._stream_sections(lyrics_sections, decoding_options, tracker))
+
+    def _stream_independent_sections(self, lyrics_sections: List[LyricsSection],
+                                     decoding_options: Optional[DecodingOptions],
+                                     tracker: metrics.RequestTracker) -> Iterator[str]:
+        with _model_registry.lease(self.model_id) as model_meta:
+            for row, section in enumerate(lyrics_sections):
+                yield f'--{section.section_type.name}--\n\n'
+
+                # each section is its row of the batch generated by generate_lyrics_from_independent_sections
+                decoder = _create_decoder(decoding_options, first_row=row)
+                generated_words = model_meta.generate_lyrics_words(seed_text=section.seed_text,
+                                                                   word_count=section.word_count, decoder=decoder)
+                words = itertools.chain(section.seed_text.split(' '),
+                                        _count_generated_words(tracker, generated_words))
+                yield from self._stream_section_text(section, words)
+
+    def _stream_sections(self, lyrics_sections: List[LyricsSection], decoding_options: Optional[DecodingOptions],
+                         tracker: metrics.RequestTracker) -> Iterator[str]:
+        total_word_count = 0
+        decoder = _create_decoder(decoding_options)
+
+        with _model_registry.lease(self.model_id) as model_meta:
+            session = LyricsSession(model_meta.catalog)
+
+            for section in lyrics_sections:
+                total_word_count += section.word_count
+                yield f'--{section.section_type.name}--\n\n'
+
+                # the section text is the words at the end of the lyrics once generated; every step generates a
+                # word, so where those words start is known up front (same slice as get_words_at_end)
+                session.add_seed_text(section.seed_text)
+                lyrics_word_count = max(total_word_count, len(session.words))
+                section_start = range(lyrics_word_count)[section.word_count * -1:].start
+
+                generated_words = _count_generated_words(tracker, model_meta.generate_lyrics_session_words(
+                    session, word_count=total_word_count, decoder=decoder))
+                skipped_word_count = max(0, section_start - len(session.words))
+                words = itertools.chain(session.words[section_start:],
+                                        itertools.islice(generated_words, skipped_word_count, None))
+                yield from self._stream_section_text(section, words)
+
+    @staticmethod
+    def _stream_section_text(section: LyricsSection, words: Iterator[str]) -> Iterator[str]:
+        chunks = []
+        for chunk in LyricsFormatter.iterate_formatted_lyrics(words, word_group_count=section.word_group_count):
+            chunks.append(chunk)
+            yield chunk
+        section.generated_text = ''.join(chunks)
+
+    def submit_lyrics_sections_job(self, lyrics_sections: List[LyricsSection], independent_sections: bool = False,
+                                   decoding_options: Optional[DecodingOptions] = None) -> LyricsJob:
+        """
+        queue a job that creates lyrics using a LyricsSection list, and return without waiting for it;
+        inputs are validated before the job is queued
+
+        :param lyrics_sections: list of LyricsSection
+        :param independent_sections: sections are *not* influenced by the text in other sections
+        :param decoding_options: how each next word is chosen, None for greedy decoding
+        :return: queued LyricsJob, used to poll for progress and the lyrics
+        """
+
+        lyrics_chunks = self.generate_lyrics_from_sections_stream(lyrics_sections,
+                                                                  independent_sections=independent_sections,
+                                                                  decoding_options=decoding_options)
+        job = LyricsJob(section_count=len(lyrics_sections),
+                        word_count=sum([section.word_count for section in lyrics_sections]))
+
+        return _job_manager.submit(job, lambda running_job: self._run_lyrics_sections_job(running_job, lyrics_chunks))
+
+    @staticmethod
+    def _run_lyrics_sections_job(job: LyricsJob, lyrics_chunks: Iterator[str]) -> str:
+        chunks = []
+        sections_started = 0
+        for chunk in lyrics_chunks:
+            if job.cancel_event.is_set():
+                lyrics_chunks.close()
+                break
+
+            chunks.append(chunk)
+            if chunk.startswith('--'):
+                # a section header is sent as each section starts, once the previous section is done
+                job.sections_done = sections_started
+                sections_started += 1
+            else:
+                job.words_done += 1
+        else:
+            job.sections_done = job.section_count
+
+        return ''.join(chunks)
+
+    @staticmethod
+    def get_job(job_id: str) -> Optional[LyricsJob]:
+        """
+        :param job_id: id of a job returned by submit_lyrics_sections_job
+        :return: LyricsJob with status, progress and lyrics; None if the job does not exist or has expired
+        """
+        return _job_manager.get(job_id)
+
+    @staticmethod
+    def cancel_job(job_id: str) -> Optional[LyricsJob]:
+        """
+        :param job_id: id of a job returned by submit_lyrics_sections_job
+        :return: cancelled LyricsJob; None if the job does not exist or has expired
+        """
+        return _job_manager.cancel(job_id)
+
+    @staticmethod
+    def get_job_stats() -> Dict[str, int]:
+        """
+        job counts by status and queue depth, for monitoring
+
+        :return: dictionary of job statistics
+        """
+        return _job_manager.get_stats()
+
+    @staticmethod
+    def generate_lyrics_bulk(lyrics_requests: Iterable[BulkLyricsRequest],
+                             batch_size: Optional[int] = None) -> Iterator[BulkLyricsRequest]:
+        """
+        creates lyrics for many independent requests, generating the requests for each model in batches of
+        batch_size, with one batched prediction per word; requests are read as they are needed, and returned as
+        each batch is done, so results are not in request order
+
+        :param lyrics_requests: requests to generate; invalid requests are returned with an error
+        :param batch_size: maximum number of requests generated together, None for bulk_batch_size
+        :return: iterator of requests, with lyrics or an error
+        """
+        batch_size = int(_config['bulk_batch_size']) if batch_size is None else batch_size
+        pending_requests: Dict[LyricsModelEnum, List[BulkLyricsRequest]] = {}
+
+        for lyrics_request in lyrics_requests:
+            if lyrics_request.error is not None:
+                yield lyrics_request
+                continue
+
+            model_requests = pending_requests.setdefault(lyrics_request.model_id, [])
+            model_requests.append(lyrics_request)
+            if len(model_requests) >= batch_size:
+                yield from LyricsGenerator._generate_lyrics_batch(lyrics_request.model_id,
+                                                                  pending_requests.pop(lyrics_request.model_id))
+
+        for model_id, model_requests in pending_requests.items():
+            yield from LyricsGenerator._generate_lyrics_batch(model_id, model_requests)
+
     @staticmethod
-    def _get_words_at_end(text: str, word_count) -> str:
-        text_array = text.split(' ')
-        end_words_array = text_array[word_count * -1:]
-        return ' '.join(end_words_array)
+    def _generate_lyrics_batch(model_id: LyricsModelEnum,
+                               lyrics_requests: List[BulkLyricsRequest]) -> List[BulkLyricsRequest]:
+        try:
+            generator = LyricsGenerator(model_id)
+        except ValidationError as ve:
+            for lyrics_request in lyrics_requests:
+                lyrics_request.error = str(ve)
+            return lyrics_requests
+
+        # same validation and result cache as generate_lyrics; the other requests are generated as one batch
+        requests_to_generate: List[Tuple[BulkLyricsRequest, Optional[tuple]]] = []
+        for lyrics_request in lyrics_requests:
+            if not isinstance(lyrics_request.seed_text, str):
+                lyrics_request.error = 'Seed Text value is invalid'
+                continue
+            try:
+                lyrics_request.seed_text = generator._clean_seed_text(lyrics_request.seed_text)
+                generator._validate_lyrics_options(seed_text=lyrics_request.seed_text,
+                                                   word_group_count=lyrics_request.word_group_count,
+                                                   word_count=lyrics_request.word_count)
+            except ValidationError as ve:
+                lyrics_request.error = str(ve)
+                continue
+
+            cache_key = generator._get_cache_key(lyrics_request.seed_text, lyrics_request.word_group_count,
+                                                 lyrics_request.word_count, None)
+            if cache_key is not None:
+                lyrics_request.lyrics = _result_cache.get(cache_key)
+            if lyrics_request.lyrics is None:
+                requests_to_generate.append((lyrics_request, cache_key))
+
+        if requests_to_generate:
+            # one tracked request for the batch
+            with metrics.RequestTracker(model_id.name, 'generate_lyrics_bulk') as tracker:
+                with metrics.time_phase('generate'):
+                    with _model_registry.lease(model_id) as model_meta:
+                        lyrics_texts = model_meta.generate_lyrics_texts(
+                            seed_texts=[lyrics_request.seed_text for lyrics_request, _ in requests_to_generate],
+                            word_counts=[lyrics_request.word_count for lyrics_request, _ in requests_to_generate])
+                tracker.word_count = sum(_get_generated_word_count(lyrics_request.seed_text, lyrics_text)
+                                         for (lyrics_request, _), lyrics_text in zip(requests_to_generate,
+                                                                                     lyrics_texts))
+
+                with metrics.time_phase('format'):
+                    for (lyrics_request, cache_key), lyrics_text in zip(requests_to_generate, lyrics_texts):
+                        lyrics_request.lyrics = LyricsFormatter.format_lyrics(
+                            lyrics_text, word_group_count=lyrics_request.word_group_count)
+                        if cache_key is not None:
+                            _result_cache.put(cache_key, lyrics_request.lyrics)
+
+        return lyrics_requests
@@ -0,0 +1,304 @@
+import bisect
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# seconds, from a single cached request up to long structured lyrics and model loads
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 60)
+TOKEN_SECONDS_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1)
+WORD_COUNT_BUCKETS = (1, 5, 10, 25, 50, 100, 200, 300, 500, 1000)
+SECTION_COUNT_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10, 15, 20)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _format_labels(label_names: Sequence[str], label_values: Sequence[str], *extra_labels: str) -> str:
+    labels = [f'{name}="{value}"' for name, value in zip(label_names, label_values)]
+    labels.extend(extra_label for extra_label in extra_labels if extra_label)
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+
+class Histogram:
+    """
+    thread-safe histogram with fixed buckets, rendered in the Prometheus text format
+    """
+
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str], buckets: Sequence[float]):
+        """
+        :param name: metric name, ex: xandly5_request_seconds
+        :param description: HELP text
+        :param label_names: names of the labels, values are given with each observation
+        :param buckets: upper bounds of the buckets, in increasing order; +Inf is added
+        """
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+        self._lock = threading.Lock()
+        # by label values: count in each bucket (not cumulative), sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        """
+        :param value: observed value, ex: seconds
+        :param label_values: one value for each label name
+        :return: None
+        """
+        bucket_index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(label_values, ([0] * len(self.buckets), [0.0]))
+            counts[bucket_index] += 1
+            total[0] += value
+
+    def get_count(self, *label_values: str) -> int:
+        """
+        :param label_values: one value for each label name
+        :return: number of observations with these label values
+        """
+        with self._lock:
+            counts, _ = self._values.get(label_values, ([0], [0.0]))
+            return sum(counts)
+
+    def get_sum(self, *label_values: str) -> float:
+        """
+        :param label_values: one value for each label name
+        :return: sum of the observations with these label values
+        """
+        with self._lock:
+            _, total = self._values.get(label_values, ([0], [0.0]))
+            return total[0]
+
+    def get_samples(self, process_label: str = '') -> List[str]:
+        """
+        :param process_label: label added to every sample, ex: pid="1234"
+        :return: sample lines, in the Prometheus text format
+        """
+        with self._lock:
+            values = {label_values: (list(counts), total[0]) for label_values, (counts, total) in self._values.items()}
+
+        samples = []
+        for label_values, (counts, total) in sorted(values.items()):
+            cumulative_count = 0
+            for upper_bound, count in zip(self.buckets, counts):
+                cumulative_count += count
+                labels = _format_labels(self.label_names, label_values, process_label,
+                                        f'le="{_format_value(upper_bound)}"')
+                samples.append(f'{self.name}_bucket{labels} {cumulative_count}')
+            labels = _format_labels(self.label_names, label_values, process_label)
+            samples.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            samples.append(f'{self.name}_count{labels} {cumulative_count}')
+        return samples
+
+
+class Gauge:
+    """
+    thread-safe gauge, a value that goes up and down, rendered in the Prometheus text format
+    """
+
+    metric_type = 'gauge'
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str]):
+        """
+        :param name: metric name, ex: xandly5_requests_in_flight
+        :param description: HELP text
+        :param label_names: names of the labels, values are given with each change
+        """
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def add(self, amount: float, *label_values: str) -> None:
+        """
+        :param amount: amount to add, negative to subtract
+        :param label_values: one value for each label name
+        :return: None
+        """
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def get_value(self, *label_values: str) -> float:
+        """
+        :param label_values: one value for each label name
+        :return: current value for these label values
+        """
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def get_samples(self, process_label: str = '') -> List[str]:
+        """
+        :param process_label: label added to every sample, ex: pid="1234"
+        :return: sample lines, in the Prometheus text format
+        """
+        with self._lock:
+            values = dict(self._values)
+        return [f'{self.name}{_format_labels(self.label_names, label_values, process_label)} {_format_value(value)}'
+                for label_values, value in sorted(values.items())]
+
+
+request_seconds = Histogram('xandly5_request_seconds', 'Lyrics request latency, including cached results',
+                            ['model', 'method'], SECONDS_BUCKETS)
+token_seconds = Histogram('xandly5_token_seconds', 'Lyrics request latency per generated word',
+                          ['model'], TOKEN_SECONDS_BUCKETS)
+phase_seconds = Histogram('xandly5_phase_seconds',
+                          'Time in each phase of a request: predict (model), tokenize (tokenizing, padding and '
+                          'word lookup) and format', ['model', 'phase'], SECONDS_BUCKETS)
+words_generated = Histogram('xandly5_words_generated', 'Words generated by each request, excluding seed words',
+                            ['model'], WORD_COUNT_BUCKETS)
+lyrics_sections = Histogram('xandly5_lyrics_sections', 'Lyrics sections in each structured lyrics request',
+                            ['model'], SECTION_COUNT_BUCKETS)
+model_load_seconds = Histogram('xandly5_model_load_seconds', 'Time to load a model, its predictor and catalog',
+                               ['model'], SECONDS_BUCKETS)
+requests_in_flight = Gauge('xandly5_requests_in_flight', 'Lyrics requests being generated', ['model'])
+
+_metrics = [request_seconds, token_seconds, phase_seconds, words_generated, lyrics_sections, model_load_seconds,
+            requests_in_flight]
+
+# seconds spent in each phase by the current thread, accumulated across requests; a request takes the difference
+# between the start and the end of the request, so nested requests (ex: bulk batches) are counted correctly
+_thread_phase_seconds = threading.local()
+
+
+def _get_phase_seconds() -> Dict[str, float]:
+    phase_totals = getattr(_thread_phase_seconds, 'totals', None)
+    if phase_totals is None:
+        phase_totals = _thread_phase_seconds.totals = {'predict': 0.0, 'generate': 0.0, 'format': 0.0}
+    return phase_totals
+
+
+@contextmanager
+def time_phase(phase: str) -> Iterator[None]:
+    """
+    add the time spent in a block to a phase of the current thread's request
+
+    :param phase: generate (tokenize and predict) or format
+    :return: context manager
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _get_phase_seconds()[phase] += time.perf_counter() - start
+
+
+class TimedPredictor:
+    """
+    wraps a predictor (or batching scheduler), adding the time of each prediction to the predict phase of the
+    calling thread's request; other attributes (ex: input_length, generation, close) are those of the predictor
+    """
+
+    def __init__(self, predictor):
+        """
+        :param predictor: LyricsPredictor, NumpyLyricsPredictor, TFLiteLyricsPredictor or BatchingScheduler
+        """
+        self.predictor = predictor
+        # only if the predictor has it, since Catalog checks for predict_next_words to choose the decoding path
+        if hasattr(predictor, 'predict_next_words'):
+            self.predict_next_words = self._predict_next_words
+
+    def __getattr__(self, name: str):
+        return getattr(self.predictor, name)
+
+    def predict(self, token_windows):
+        start = time.perf_counter()
+        try:
+            return self.predictor.predict(token_windows)
+        finally:
+            _get_phase_seconds()['predict'] += time.perf_counter() - start
+
+    def _predict_next_words(self, token_windows):
+        start = time.perf_counter()
+        try:
+            return self.predictor.predict_next_words(token_windows)
+        finally:
+            _get_phase_seconds()['predict'] += time.perf_counter() - start
+
+
+class RequestTracker:
+    """
+    records the metrics of one lyrics request: latency, phases, words generated and in-flight requests;
+    used as a context manager around the request
+    """
+
+    def __init__(self, model_name: str, method: str, word_count: int = 0, section_count: Optional[int] = None):
+        """
+        :param model_name: LyricsModelEnum name
+        :param method: LyricsGenerator method, ex: generate_lyrics
+        :param word_count: words generated, excluding seed words; set to 0 for cached results
+        :param section_count: lyrics sections, for structured lyrics requests
+        """
+        self.model_name = model_name
+        self.method = method
+        self.word_count = word_count
+        self.section_count = section_count
+        self._start = 0.0
+        self._start_phase_seconds: Dict[str, float] = {}
+
+    def __enter__(self) -> 'RequestTracker':
+        requests_in_flight.add(1, self.model_name)
+        self._start_phase_seconds = dict(_get_phase_seconds())
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        seconds = time.perf_counter() - self._start
+        requests_in_flight.add(-1, self.model_name)
+        request_seconds.observe(seconds, self.model_name, self.method)
+
+        end_phase_seconds = _get_phase_seconds()
+        phase_deltas = {phase: end_phase_seconds[phase] - self._start_phase_seconds[phase]
+                        for phase in end_phase_seconds}
+        if phase_deltas['predict'] > 0:
+            phase_seconds.observe(phase_deltas['predict'], self.model_name, 'predict')
+        if phase_deltas['generate'] > 0:
+            # generation that is not prediction: tokenizing the seed, padding windows and looking up words
+            phase_seconds.observe(max(phase_deltas['generate'] - phase_deltas['predict'], 0), self.model_name,
+                                  'tokenize')
+        if phase_deltas['format'] > 0:
+            phase_seconds.observe(phase_deltas['format'], self.model_name, 'format')
+
+        if self.word_count > 0:
+            words_generated.observe(self.word_count, self.model_name)
+            token_seconds.observe(seconds / self.word_count, self.model_name)
+        if self.section_count is not None:
+            lyrics_sections.observe(self.section_count, self.model_name)
+
+
+def track_stream(tracker: RequestTracker, chunks: Iterator[str]) -> Iterator[str]:
+    """
+    track a streamed request from its first chunk to its last, or until the client stops reading
+
+    :param tracker: tracker of the request
+    :param chunks: formatted text chunks of the request
+    :return: iterator of the same chunks
+    """
+    with tracker:
+        yield from chunks
+
+
+def get_metrics_text() -> str:
+    """
+    metrics are kept in each process, so every sample has a pid label: with several lyrics_server.py workers, each
+    worker's metrics are a separate series, to be summed across workers by the queries
+
+    :return: all metrics of this process, in the Prometheus text exposition format (version 0.0.4)
+    """
+    process_label = f'pid="{os.getpid()}"'
+    lines = []
+    for metric in _metrics:
+        lines.append(f'# HELP {metric.name} {metric.description}')
+        lines.append(f'# TYPE {metric.name} {metric.metric_type}')
+        lines.extend(metric.get_samples(process_label))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,177 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Set
+
+from xandly5.types.lyrics_model_enum import LyricsModelEnum
+from xandly5.types.lyrics_model_meta import LyricsModelMeta
+
+
+class ModelRegistry:
+    """
+    loads lyrics models the first time they are requested, instead of loading every model up front;
+    loaded models can be unloaded explicitly, or evicted (least recently used first) to limit memory use
+
+    generations lease the model they use; a model unloaded or evicted while leased is closed once its last lease
+    is released, so requests already using it (ex: queued jobs, open streams) finish with it, while new requests
+    load it again
+    """
+
+    def __init__(self, loader: Callable[[LyricsModelEnum], LyricsModelMeta], model_ids: Iterable[LyricsModelEnum],
+                 max_loaded_models: int = 0):
+        """
+        :param loader: loads the model, catalog and predictor for a model id
+        :param model_ids: model ids that can be loaded
+        :param max_loaded_models: maximum number of models loaded at once; 0 for no limit
+        """
+        self.loader = loader
+        self.model_ids = list(model_ids)
+        self.max_loaded_models = max_loaded_models
+
+        self._lock = threading.Lock()
+        self._model_locks: Dict[LyricsModelEnum, threading.Lock] = {model_id: threading.Lock()
+                                                                    for model_id in self.model_ids}
+        self._models: 'OrderedDict[LyricsModelEnum, LyricsModelMeta]' = OrderedDict()
+        self._load_seconds: Dict[LyricsModelEnum, float] = {}
+        self._lease_counts: Dict[LyricsModelMeta, int] = {}
+        self._retired_models: Set[LyricsModelMeta] = set()  # unloaded or evicted, closed once no longer leased
+
+    def is_registered(self, model_id: LyricsModelEnum) -> bool:
+        """
+        :param model_id: model id to check
+        :return: True if the model id can be loaded
+        """
+        return model_id in self._model_locks
+
+    def is_loaded(self, model_id: LyricsModelEnum) -> bool:
+        """
+        :param model_id: model id to check
+        :return: True if the model is currently loaded
+        """
+        with self._lock:
+            return model_id in self._models
+
+    def get(self, model_id: LyricsModelEnum) -> LyricsModelMeta:
+        """
+        get a loaded model, loading it first if needed; concurrent requests for the same model wait for one load;
+        use lease instead to generate with the model, since the model can be unloaded or evicted at any time
+
+        :param model_id: model id to get
+        :return: LyricsModelMeta with the model, catalog and predictor
+        """
+        return self._get(model_id, is_leased=False)
+
+    @contextmanager
+    def lease(self, model_id: LyricsModelEnum) -> Iterator[LyricsModelMeta]:
+        """
+        get a loaded model, as with get, and keep it open until the block ends, even if it is unloaded or evicted
+
+        :param model_id: model id to lease
+        :return: context manager, with the LyricsModelMeta
+        """
+        lyrics_model = self._get(model_id, is_leased=True)
+        try:
+            yield lyrics_model
+        finally:
+            self._release(lyrics_model)
+
+    def _get(self, model_id: LyricsModelEnum, is_leased: bool) -> LyricsModelMeta:
+        if not self.is_registered(model_id):
+            raise KeyError(f'model is not registered: {model_id}')
+
+        with self._lock:
+            lyrics_model = self._models.get(model_id)
+            if lyrics_model is not None:
+                self._models.move_to_end(model_id)
+                if is_leased:
+                    self._lease_counts[lyrics_model] = self._lease_counts.get(lyrics_model, 0) + 1
+                return lyrics_model
+
+        with self._model_locks[model_id]:
+            with self._lock:
+                lyrics_model = self._models.get(model_id)
+                if lyrics_model is not None:
+                    # loaded while waiting for the model lock
+                    if is_leased:
+                        self._lease_counts[lyrics_model] = self._lease_counts.get(lyrics_model, 0) + 1
+                    return lyrics_model
+
+            print(f'loading lyrics model: {LyricsModelEnum(model_id).name}')
+            start = time.perf_counter()
+            lyrics_model = self.loader(LyricsModelEnum(model_id))
+            load_seconds = time.perf_counter() - start
+
+            with self._lock:
+                self._models[model_id] = lyrics_model
+                self._load_seconds[model_id] = load_seconds
+                if is_leased:
+                    self._lease_counts[lyrics_model] = 1
+                models_to_close = []
+                while 0 < self.max_loaded_models < len(self._models):
+                    models_to_close.extend(self._retire(self._models.popitem(last=False)[1]))
+
+        for model_to_close in models_to_close:
+            model_to_close.close()
+
+        return lyrics_model
+
+    def _retire(self, lyrics_model: LyricsModelMeta) -> List[LyricsModelMeta]:
+        # called with the lock held, once the model is removed from the loaded models; returns it if it can be
+        # closed now, otherwise it is closed when its last lease is released
+        if lyrics_model in self._lease_counts:
+            self._retired_models.add(lyrics_model)
+            return []
+        return [lyrics_model]
+
+    def _release(self, lyrics_model: LyricsModelMeta) -> None:
+        with self._lock:
+            self._lease_counts[lyrics_model] -= 1
+            if self._lease_counts[lyrics_model] > 0:
+                return
+            del self._lease_counts[lyrics_model]
+            if lyrics_model not in self._retired_models:
+                return
+            self._retired_models.remove(lyrics_model)
+
+        lyrics_model.close()
+
+    def warm_up(self, model_ids: Iterable[LyricsModelEnum]) -> None:
+        """
+        load models ahead of their first request
+
+        :param model_ids: model ids to load
+        :return: None
+        """
+        for model_id in model_ids:
+            self.get(model_id)
+
+    def unload(self, model_id: LyricsModelEnum) -> bool:
+        """
+        unload a model, so it is loaded again on its next request; a leased model is closed once it is released
+
+        :param model_id: model id to unload
+        :return: True if the model was loaded
+        """
+        with self._lock:
+            lyrics_model = self._models.pop(model_id, None)
+            models_to_close = [] if lyrics_model is None else self._retire(lyrics_model)
+
+        for model_to_close in models_to_close:
+            model_to_close.close()
+        return lyrics_model is not None
+
+    def get_stats(self) -> Dict[str, dict]:
+        """
+        load state and most recent load time of each model, for monitoring
+
+        :return: dictionary of model statistics, by model name
+        """
+        with self._lock:
+            return {
+                LyricsModelEnum(model_id).name: {
+                    'loaded': model_id in self._models,
+                    'load_seconds': self._load_seconds.get(model_id)
+                }
+                for model_id in self.model_ids
+            }
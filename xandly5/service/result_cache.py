@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+
+class ResultCache:
+    """
+    bounded, thread-safe LRU cache for generated lyrics; generation is deterministic, so a result can be reused
+    for the same model and inputs until it expires
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 0):
+        """
+        :param max_size: maximum number of results kept; the least recently used result is evicted first
+        :param ttl_seconds: seconds a result is kept; 0 keeps results until they are evicted
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._items: 'OrderedDict[Hashable, Tuple[float, str]]' = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[str]:
+        """
+        get a cached result, and mark it as most recently used
+
+        :param key: cache key
+        :return: cached result, or None if missing or expired
+        """
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and self.ttl_seconds > 0 and time.monotonic() - item[0] > self.ttl_seconds:
+                del self._items[key]
+                item = None
+
+            if item is None:
+                self.misses += 1
+                return None
+
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key: Hashable, value: str) -> None:
+        """
+        add or replace a cached result, evicting the least recently used results over max_size
+
+        :param key: cache key
+        :param value: result to cache
+        :return: None
+        """
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._items[key] = (time.monotonic(), value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        remove all cached results and reset the hit/miss counters
+
+        :return: None
+        """
+        with self._lock:
+            self._items.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        hit/miss counters and current size, for monitoring
+
+        :return: dictionary of cache statistics
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._items),
+                'max_size': self.max_size
+            }
@@ -0,0 +1,21 @@
+import unittest
+
+from xandly5.benchmark.import_benchmark import MODULES, measure_import
+
+
+class ImportTimeTestCase(unittest.TestCase):
+
+    def test_modules_do_not_import_tensorflow(self):
+
+        # ARRANGE
+        modules = MODULES
+
+        # ACT
+        tensorflow_modules = [module for module in modules if measure_import(module)['tensorflow']]
+
+        # ASSERT
+        self.assertEqual([], tensorflow_modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import threading
+import time
+import unittest
+
+from xandly5.service.job_manager import JobManager
+from xandly5.types.job_status_enum import JobStatusEnum
+from xandly5.types.lyrics_job import LyricsJob
+from xandly5.types.validation_error import ValidationError
+
+
+class JobManagerTestCase(unittest.TestCase):
+
+    @staticmethod
+    def _wait_for_job(job: LyricsJob, timeout_seconds: float = 5) -> None:
+        deadline = time.monotonic() + timeout_seconds
+        while not job.is_finished() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    @staticmethod
+    def _generate_words(job: LyricsJob) -> str:
+        words = []
+        for i in range(job.word_count):
+            if job.cancel_event.is_set():
+                break
+            words.append(f'word{i}')
+            job.words_done += 1
+            time.sleep(0.01)
+        return ' '.join(words)
+
+    def test_submit_completes_job(self):
+
+        # ARRANGE
+        job_manager = JobManager(max_workers=1)
+        job = LyricsJob(section_count=1, word_count=5)
+
+        # ACT
+        job_manager.submit(job, self._generate_words)
+        self._wait_for_job(job)
+
+        # ASSERT
+        self.assertIs(job, job_manager.get(job.job_id))
+        self.assertEqual(JobStatusEnum.COMPLETED, job.status)
+        self.assertEqual(5, job.words_done)
+        self.assertEqual('word0 word1 word2 word3 word4', job.lyrics)
+        self.assertEqual(1, job_manager.get_stats()['completed'])
+        job_manager.shutdown()
+
+    def test_submit_failed_job(self):
+
+        # ARRANGE
+        job_manager = JobManager(max_workers=1)
+        job = LyricsJob(section_count=1, word_count=5)
+
+        def fail(_: LyricsJob) -> str:
+            raise RuntimeError('model error')
+
+        # ACT
+        job_manager.submit(job, fail)
+        self._wait_for_job(job)
+
+        # ASSERT
+        self.assertEqual(JobStatusEnum.FAILED, job.status)
+        self.assertEqual('model error', job.error)
+        job_manager.shutdown()
+
+    def test_cancel_running_and_queued_jobs(self):
+
+        # ARRANGE
+        job_manager = JobManager(max_workers=1)
+        running_job = LyricsJob(section_count=1, word_count=500)
+        queued_job = LyricsJob(section_count=1, word_count=5)
+        job_manager.submit(running_job, self._generate_words)
+        job_manager.submit(queued_job, self._generate_words)
+        while running_job.status == JobStatusEnum.QUEUED:
+            time.sleep(0.01)
+        queue_depth = job_manager.get_stats()['queue_depth']
+
+        # ACT
+        job_manager.cancel(queued_job.job_id)
+        job_manager.cancel(running_job.job_id)
+        self._wait_for_job(running_job)
+        self._wait_for_job(queued_job)
+
+        # ASSERT
+        self.assertEqual(1, queue_depth)
+        self.assertEqual(JobStatusEnum.CANCELLED, running_job.status)
+        self.assertLess(running_job.words_done, 500)
+        self.assertIsNone(running_job.lyrics)
+        self.assertEqual(JobStatusEnum.CANCELLED, queued_job.status)
+        self.assertEqual(0, queued_job.words_done)
+        self.assertIsNone(job_manager.cancel('missing-job-id'))
+        job_manager.shutdown()
+
+    def test_cancel_queued_job_finishes_it_immediately(self):
+
+        # ARRANGE
+        job_manager = JobManager(max_workers=1)
+        release_event = threading.Event()
+        running_job = job_manager.submit(LyricsJob(section_count=1, word_count=1),
+                                         lambda _: str(release_event.wait(5)))
+        queued_job = job_manager.submit(LyricsJob(section_count=1, word_count=5), self._generate_words)
+        while running_job.status == JobStatusEnum.QUEUED:
+            time.sleep(0.01)
+
+        # ACT
+        job_manager.cancel(queued_job.job_id)
+        stats = job_manager.get_stats()
+        status = queued_job.status
+        finished_time = queued_job.finished_time
+        release_event.set()
+        self._wait_for_job(running_job)
+        time.sleep(0.05)  # the worker takes the cancelled job from the queue, and leaves it as it is
+
+        # ASSERT
+        self.assertEqual(JobStatusEnum.CANCELLED, status)
+        self.assertIsNotNone(finished_time)
+        self.assertEqual(0, stats['queue_depth'])
+        self.assertEqual(1, stats['running'])
+        self.assertEqual(JobStatusEnum.CANCELLED, queued_job.status)
+        self.assertEqual(finished_time, queued_job.finished_time)
+        self.assertEqual(0, queued_job.words_done)
+        job_manager.shutdown()
+
+    def test_submit_queue_full_error(self):
+
+        # ARRANGE
+        job_manager = JobManager(max_workers=1, max_queued_jobs=1)
+        release_event = threading.Event()
+        job_manager.submit(LyricsJob(section_count=1, word_count=1), lambda _: str(release_event.wait(5)))
+        time.sleep(0.05)
+        job_manager.submit(LyricsJob(section_count=1, word_count=1), lambda _: '')
+
+        # ACT, ASSERT
+        self.assertRaises(ValidationError, job_manager.submit, LyricsJob(section_count=1, word_count=1),
+                          lambda _: '')
+        release_event.set()
+        job_manager.shutdown()
+
+    def test_get_removes_expired_jobs(self):
+
+        # ARRANGE
+        job_manager = JobManager(max_workers=1, retention_seconds=0.05)
+        job = LyricsJob(section_count=1, word_count=1)
+        job_manager.submit(job, self._generate_words)
+        self._wait_for_job(job)
+
+        # ACT
+        time.sleep(0.1)
+
+        # ASSERT
+        self.assertIsNone(job_manager.get(job.job_id))
+        job_manager.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,7 +6,13 @@ import unittest
 
 from ptmlib.time import Stopwatch
 
+from xandly5.ai_ml_model.decoders import BeamSearchDecoder, SamplingDecoder
+from xandly5.ai_ml_model.lyrics_formatter import LyricsFormatter
+from xandly5.service import metrics
 from xandly5.service.lyrics_generator import LyricsGenerator
+from xandly5.types.bulk_lyrics_request import BulkLyricsRequest
+from xandly5.types.decoding_method_enum import DecodingMethodEnum
+from xandly5.types.decoding_options import DecodingOptions
 from xandly5.types.lyrics_model_enum import LyricsModelEnum
 from xandly5.types.validation_error import ValidationError
 
@@ -70,6 +76,134 @@ class LyricsGeneratorTestCase(unittest.TestCase):
         self.generate_lyrics_for_test(expected_lyrics_file, model_id, seed_text, word_count, word_group_count,
                                       starts_with_text=starts_with_text)
 
+    def test_generate_lyrics_stream(self):
+
+        # ARRANGE
+        seed_text = 'tone of his eyes'
+        word_count = 60
+        word_group_count = 3
+        generator = LyricsGenerator(LyricsModelEnum.POE_POEM)
+        expected_lyrics = LyricsFormatter.format_lyrics(
+            generator.model_meta.generate_lyrics_text(seed_text=seed_text, word_count=word_count),
+            word_group_count=word_group_count)
+
+        # ACT
+        chunks = list(generator.generate_lyrics_stream(seed_text=seed_text, word_group_count=word_group_count,
+                                                       word_count=word_count))
+
+        # ASSERT
+        self.assertEqual(word_count, len(chunks))
+        self.assertEqual(self._get_hash(expected_lyrics), self._get_hash(''.join(chunks)))
+
+    def test_generate_lyrics_stream_error(self):
+
+        # ARRANGE
+        generator = LyricsGenerator(LyricsModelEnum.SONNETS)
+
+        # ACT, ASSERT
+        self.assertRaises(ValidationError, generator.generate_lyrics_stream, 'hello', 1,
+                          LyricsGenerator.max_words_generated + 1)
+
+    def test_generate_lyrics_words_generated_metric(self):
+
+        # ARRANGE
+        # an empty seed still counts as one word of the word count, as in Catalog
+        generator = LyricsGenerator(LyricsModelEnum.SONNETS)
+        words_before = metrics.words_generated.get_sum(LyricsModelEnum.SONNETS.name)
+
+        # ACT
+        lyrics = generator.generate_lyrics(seed_text='', word_group_count=4, word_count=13)
+        lyrics_words_generated = metrics.words_generated.get_sum(LyricsModelEnum.SONNETS.name) - words_before
+        stream_lyrics = ''.join(generator.generate_lyrics_stream(seed_text='', word_group_count=4, word_count=14))
+        stream_words_generated = (metrics.words_generated.get_sum(LyricsModelEnum.SONNETS.name) - words_before -
+                                  lyrics_words_generated)
+
+        # ASSERT
+        self.assertEqual(len(lyrics.split()), lyrics_words_generated)
+        self.assertEqual(12, lyrics_words_generated)
+        self.assertEqual(len(stream_lyrics.split()), stream_words_generated)
+        self.assertEqual(13, stream_words_generated)
+
+    def test_generate_lyrics_decoding(self):
+
+        # ARRANGE
+        seed_text = 'tone of his eyes'
+        word_count = 40
+        word_group_count = 4
+        generator = LyricsGenerator(LyricsModelEnum.POE_POEM)
+        greedy_lyrics = generator.generate_lyrics(seed_text=seed_text, word_group_count=word_group_count,
+                                                  word_count=word_count)
+
+        decoders = [
+            (DecodingOptions(DecodingMethodEnum.SAMPLING, temperature=0.8, top_p=0.9, seed=5),
+             lambda: SamplingDecoder(temperature=0.8, top_p=0.9, seed=5)),
+            (DecodingOptions(DecodingMethodEnum.BEAM, beam_width=3), lambda: BeamSearchDecoder(beam_width=3))
+        ]
+
+        for decoding_options, create_decoder in decoders:
+            with self.subTest(method=decoding_options.method.name):
+
+                # ACT
+                lyrics = generator.generate_lyrics(seed_text=seed_text, word_group_count=word_group_count,
+                                                   word_count=word_count, decoding_options=decoding_options)
+                expected_lyrics = LyricsFormatter.format_lyrics(
+                    generator.model_meta.generate_lyrics_text(seed_text=seed_text, word_count=word_count,
+                                                              decoder=create_decoder()),
+                    word_group_count=word_group_count)
+                chunks = list(generator.generate_lyrics_stream(seed_text=seed_text + ' x',
+                                                               word_group_count=word_group_count,
+                                                               word_count=word_count,
+                                                               decoding_options=decoding_options))
+                expected_stream_lyrics = generator.generate_lyrics(seed_text=seed_text + ' x',
+                                                                   word_group_count=word_group_count,
+                                                                   word_count=word_count,
+                                                                   decoding_options=decoding_options)
+
+                # ASSERT
+                self.assertNotEqual(self._get_hash(greedy_lyrics), self._get_hash(lyrics))
+                self.assertEqual(self._get_hash(expected_lyrics), self._get_hash(lyrics))
+                self.assertEqual(self._get_hash(expected_stream_lyrics), self._get_hash(''.join(chunks)))
+
+    def test_generate_lyrics_decoding_error(self):
+
+        # ARRANGE
+        generator = LyricsGenerator(LyricsModelEnum.SONNETS)
+        invalid_options = [DecodingOptions(DecodingMethodEnum.SAMPLING, temperature=0),
+                           DecodingOptions(DecodingMethodEnum.SAMPLING, top_p=1.5),
+                           DecodingOptions(DecodingMethodEnum.BEAM, beam_width=LyricsGenerator.max_beam_width + 1)]
+
+        for decoding_options in invalid_options:
+            # ACT, ASSERT
+            self.assertRaises(ValidationError, generator.generate_lyrics, 'hello', 1, 10, decoding_options)
+
+    def test_generate_lyrics_bulk(self):
+
+        # ARRANGE
+        seeds = [(LyricsModelEnum.POE_POEM, 'tone of his eyes', 30), (LyricsModelEnum.SONNETS, 'said he art too', 20),
+                 (LyricsModelEnum.POE_POEM, 'a dreary midnight bird', 45), (LyricsModelEnum.SONNETS, 'evening', 33),
+                 (LyricsModelEnum.POE_POEM, 'the raven', 12)]
+        lyrics_requests = [BulkLyricsRequest(request_id, model_id, seed_text, word_count, 4)
+                           for request_id, (model_id, seed_text, word_count) in enumerate(seeds)]
+        lyrics_requests.append(BulkLyricsRequest('too long', LyricsModelEnum.POE_POEM, 'x', 1000, 4))
+        lyrics_requests.append(BulkLyricsRequest.from_dict({'model_id': 9, 'seed_text': 'x', 'word_count': 10,
+                                                            'word_group_count': 4}, 'bad model'))
+
+        # ACT
+        results = {result.request_id: result for result in
+                   LyricsGenerator.generate_lyrics_bulk(iter(lyrics_requests), batch_size=2)}
+
+        # ASSERT
+        self.assertEqual({request.request_id for request in lyrics_requests}, set(results))
+        for request_id, (model_id, seed_text, word_count) in enumerate(seeds):
+            expected_lyrics = LyricsFormatter.format_lyrics(
+                LyricsGenerator(model_id).model_meta.generate_lyrics_text(seed_text=seed_text, word_count=word_count),
+                word_group_count=4)
+            self.assertIsNone(results[request_id].error)
+            self.assertEqual(self._get_hash(expected_lyrics), self._get_hash(results[request_id].lyrics))
+        self.assertEqual(f'Word Count cannot exceed {LyricsGenerator.max_words_generated}',
+                         results['too long'].error)
+        self.assertEqual('Invalid Model Id: 9', results['bad model'].error)
+
     def test_generate_word_count_error(self):
 
         self.assertRaises(ValidationError, self.generate_lyrics_for_test, 'expected_poe_lyrics.txt',
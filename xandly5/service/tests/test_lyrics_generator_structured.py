@@ -1,12 +1,17 @@
 import hashlib
 import os
 import re
+import threading
+import time
 import unittest
 from typing import List
 
 from ptmlib.time import Stopwatch
 
+from xandly5.service import lyrics_generator
 from xandly5.service.lyrics_generator import LyricsGenerator
+from xandly5.types.job_status_enum import JobStatusEnum
+from xandly5.types.lyrics_job import LyricsJob
 from xandly5.types.lyrics_model_enum import LyricsModelEnum
 from xandly5.types.lyrics_section import LyricsSection
 from xandly5.types.section_type_enum import SectionTypeEnum
@@ -65,6 +70,59 @@ class LyricsGeneratorStructuredTestCase(unittest.TestCase):
         # ACT, ASSERT
         self.generate_lyrics_for_test(expected_lyrics_file, lyrics_sections, model_id, independent_sections=True)
 
+    def test_generate_structured_lyrics_stream(self):
+
+        for independent_sections, expected_lyrics_file, model_id in [
+                (False, 'expected_poe_struct_lyrics.txt', LyricsModelEnum.POE_POEM),
+                (True, 'expected_sonnet_struct_lyrics.txt', LyricsModelEnum.SONNETS)]:
+            with self.subTest(independent_sections=independent_sections):
+
+                # ARRANGE
+                lyrics_sections = self._get_lyrics_sections()
+                generator = LyricsGenerator(model_id)
+                current_directory = os.path.dirname(os.path.abspath(__file__))
+                with open(os.path.join(current_directory, expected_lyrics_file), 'r') as file:
+                    expected_lyrics = file.read()
+
+                # ACT
+                chunks = list(generator.generate_lyrics_from_sections_stream(
+                    lyrics_sections, independent_sections=independent_sections))
+
+                # ASSERT
+                self.assertGreater(len(chunks), len(lyrics_sections))
+                self.assertEqual(self._get_hash(expected_lyrics), self._get_hash(''.join(chunks)))
+
+    def test_queued_job_survives_model_eviction(self):
+
+        # ARRANGE
+        model_registry = lyrics_generator._model_registry
+        job_manager = lyrics_generator._job_manager
+        LyricsGenerator.unload_model(LyricsModelEnum.POE_POEM)  # loaded again in ACT, evicting SONNETS
+        generator = LyricsGenerator(LyricsModelEnum.SONNETS)
+        expected_lyrics = generator.generate_lyrics_from_sections(self._get_lyrics_sections())
+        release_workers = threading.Event()
+        blocking_jobs = [job_manager.submit(LyricsJob(section_count=1, word_count=1),
+                                            lambda running_job: str(release_workers.wait()))
+                         for _ in range(job_manager.max_workers)]
+        job = generator.submit_lyrics_sections_job(self._get_lyrics_sections())
+        max_loaded_models = model_registry.max_loaded_models
+
+        # ACT
+        try:
+            model_registry.max_loaded_models = 1
+            LyricsGenerator(LyricsModelEnum.POE_POEM)  # evicts SONNETS while the job is queued
+            is_evicted = not model_registry.is_loaded(LyricsModelEnum.SONNETS)
+        finally:
+            model_registry.max_loaded_models = max_loaded_models
+            release_workers.set()
+        while not job.is_finished() or not all(blocking_job.is_finished() for blocking_job in blocking_jobs):
+            time.sleep(0.01)
+
+        # ASSERT
+        self.assertTrue(is_evicted)
+        self.assertEqual(JobStatusEnum.COMPLETED, job.status, job.error)
+        self.assertEqual(expected_lyrics, job.lyrics)
+
     def test_generate_structured_lyrics_error(self):
 
         lyrics_sections: List[LyricsSection] = []
@@ -0,0 +1,101 @@
+import os
+import time
+import unittest
+
+import numpy as np
+
+from xandly5.service import metrics
+
+
+class _SlowPredictor:
+
+    input_length = 7
+
+    def predict(self, token_windows: np.ndarray) -> np.ndarray:
+        time.sleep(0.01)
+        return np.zeros((len(token_windows), 10))
+
+
+class MetricsTestCase(unittest.TestCase):
+
+    def test_histogram_samples(self):
+
+        # ARRANGE
+        histogram = metrics.Histogram('test_seconds', 'test histogram', ['model'], [0.1, 1])
+
+        # ACT
+        histogram.observe(0.05, 'SONNETS')
+        histogram.observe(0.5, 'SONNETS')
+        histogram.observe(5, 'SONNETS')
+
+        # ASSERT
+        self.assertEqual([
+            'test_seconds_bucket{model="SONNETS",le="0.1"} 1',
+            'test_seconds_bucket{model="SONNETS",le="1"} 2',
+            'test_seconds_bucket{model="SONNETS",le="+Inf"} 3',
+            'test_seconds_sum{model="SONNETS"} 5.55',
+            'test_seconds_count{model="SONNETS"} 3',
+        ], histogram.get_samples())
+
+    def test_request_tracker_records_phases(self):
+
+        # ARRANGE
+        model_name = 'TRACKER_TEST'
+        predictor = metrics.TimedPredictor(_SlowPredictor())
+
+        # ACT
+        with metrics.RequestTracker(model_name, 'generate_lyrics', word_count=2):
+            in_flight = metrics.requests_in_flight.get_value(model_name)
+            with metrics.time_phase('generate'):
+                predictor.predict(np.zeros((1, predictor.input_length)))
+                predictor.predict(np.zeros((1, predictor.input_length)))
+            with metrics.time_phase('format'):
+                pass
+
+        # ASSERT
+        self.assertFalse(hasattr(predictor, 'predict_next_words'))  # so Catalog uses predict
+        self.assertEqual(1, in_flight)
+        self.assertEqual(0, metrics.requests_in_flight.get_value(model_name))
+        self.assertEqual(1, metrics.request_seconds.get_count(model_name, 'generate_lyrics'))
+        self.assertGreaterEqual(metrics.phase_seconds.get_sum(model_name, 'predict'), 0.02)
+        self.assertLess(metrics.phase_seconds.get_sum(model_name, 'tokenize'), 0.01)
+        self.assertEqual(1, metrics.phase_seconds.get_count(model_name, 'format'))
+        self.assertEqual(2, metrics.words_generated.get_sum(model_name))
+        self.assertAlmostEqual(metrics.request_seconds.get_sum(model_name, 'generate_lyrics') / 2,
+                               metrics.token_seconds.get_sum(model_name))
+
+    def test_track_stream_spans_iteration(self):
+
+        # ARRANGE
+        model_name = 'STREAM_TEST'
+        chunks = metrics.track_stream(metrics.RequestTracker(model_name, 'generate_lyrics_stream', 3, 1),
+                                      iter(['a ', 'dreary ', 'bird']))
+
+        # ACT
+        first_chunk = next(chunks)
+        in_flight = metrics.requests_in_flight.get_value(model_name)
+        remaining_chunks = list(chunks)
+
+        # ASSERT
+        self.assertEqual(['a ', 'dreary ', 'bird'], [first_chunk] + remaining_chunks)
+        self.assertEqual(1, in_flight)
+        self.assertEqual(0, metrics.requests_in_flight.get_value(model_name))
+        self.assertEqual(1, metrics.request_seconds.get_count(model_name, 'generate_lyrics_stream'))
+        self.assertEqual(1, metrics.lyrics_sections.get_sum(model_name))
+
+    def test_get_metrics_text(self):
+
+        # ARRANGE
+        metrics.model_load_seconds.observe(1.5, 'TEXT_TEST')
+
+        # ACT
+        metrics_text = metrics.get_metrics_text()
+
+        # ASSERT
+        self.assertIn('# TYPE xandly5_request_seconds histogram\n', metrics_text)
+        self.assertIn('# TYPE xandly5_requests_in_flight gauge\n', metrics_text)
+        self.assertIn(f'xandly5_model_load_seconds_count{{model="TEXT_TEST",pid="{os.getpid()}"}} 1\n', metrics_text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import threading
+import time
+import unittest
+from typing import List
+
+from xandly5.service.model_registry import ModelRegistry
+from xandly5.types.lyrics_model_enum import LyricsModelEnum
+
+
+class FakeLyricsModel:
+    def __init__(self, model_id: LyricsModelEnum):
+        self.model_id = model_id
+        self.is_closed = False
+
+    def close(self) -> None:
+        self.is_closed = True
+
+
+class ModelRegistryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loaded_ids: List[LyricsModelEnum] = []
+
+    def _load_model(self, model_id: LyricsModelEnum) -> FakeLyricsModel:
+        time.sleep(0.05)
+        self.loaded_ids.append(model_id)
+        return FakeLyricsModel(model_id)
+
+    def test_get_loads_model_once(self):
+
+        # ARRANGE
+        registry = ModelRegistry(self._load_model, [LyricsModelEnum.SONNETS, LyricsModelEnum.POE_POEM])
+        models = []
+        threads = [threading.Thread(target=lambda: models.append(registry.get(LyricsModelEnum.SONNETS)))
+                   for _ in range(4)]
+
+        # ACT
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # ASSERT
+        self.assertEqual([LyricsModelEnum.SONNETS], self.loaded_ids)
+        self.assertTrue(all(model is models[0] for model in models))
+        stats = registry.get_stats()
+        self.assertTrue(stats['SONNETS']['loaded'])
+        self.assertGreater(stats['SONNETS']['load_seconds'], 0)
+        self.assertFalse(stats['POE_POEM']['loaded'])
+
+    def test_get_unregistered_model_error(self):
+
+        # ARRANGE
+        registry = ModelRegistry(self._load_model, [LyricsModelEnum.SONNETS])
+
+        # ACT, ASSERT
+        self.assertFalse(registry.is_registered(LyricsModelEnum.POE_POEM))
+        self.assertRaises(KeyError, registry.get, LyricsModelEnum.POE_POEM)
+
+    def test_unload_and_evict_close_models(self):
+
+        # ARRANGE
+        registry = ModelRegistry(self._load_model, [LyricsModelEnum.SONNETS, LyricsModelEnum.POE_POEM],
+                                 max_loaded_models=1)
+        sonnets_model = registry.get(LyricsModelEnum.SONNETS)
+
+        # ACT
+        poe_model = registry.get(LyricsModelEnum.POE_POEM)
+        is_unloaded = registry.unload(LyricsModelEnum.POE_POEM)
+
+        # ASSERT
+        self.assertTrue(sonnets_model.is_closed)
+        self.assertTrue(poe_model.is_closed)
+        self.assertTrue(is_unloaded)
+        self.assertFalse(registry.unload(LyricsModelEnum.POE_POEM))
+        self.assertFalse(registry.is_loaded(LyricsModelEnum.SONNETS))
+
+
+    def test_leased_model_closed_on_release(self):
+
+        # ARRANGE
+        registry = ModelRegistry(self._load_model, [LyricsModelEnum.SONNETS, LyricsModelEnum.POE_POEM],
+                                 max_loaded_models=1)
+
+        # ACT
+        with registry.lease(LyricsModelEnum.SONNETS) as sonnets_model:
+            with registry.lease(LyricsModelEnum.SONNETS):
+                registry.get(LyricsModelEnum.POE_POEM)  # evicts SONNETS
+            is_closed_while_leased = sonnets_model.is_closed
+            with registry.lease(LyricsModelEnum.SONNETS) as reloaded_model:
+                is_unloaded = registry.unload(LyricsModelEnum.SONNETS)
+                is_reloaded_model_closed_while_leased = reloaded_model.is_closed
+
+        # ASSERT
+        self.assertFalse(is_closed_while_leased)
+        self.assertTrue(sonnets_model.is_closed)
+        self.assertIsNot(sonnets_model, reloaded_model)
+        self.assertTrue(is_unloaded)
+        self.assertFalse(is_reloaded_model_closed_while_leased)
+        self.assertTrue(reloaded_model.is_closed)
+        self.assertEqual([LyricsModelEnum.SONNETS, LyricsModelEnum.POE_POEM, LyricsModelEnum.SONNETS],
+                         self.loaded_ids)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import threading
+import time
+import unittest
+
+from xandly5.service.result_cache import ResultCache
+
+
+class ResultCacheTestCase(unittest.TestCase):
+
+    def test_get_counts_hits_and_misses(self):
+
+        # ARRANGE
+        cache = ResultCache(max_size=2)
+        cache.put(('sonnets', 'a dreary midnight', 16, 4), 'lyrics')
+
+        # ACT
+        hit = cache.get(('sonnets', 'a dreary midnight', 16, 4))
+        miss = cache.get(('sonnets', 'a dreary midnight', 32, 4))
+
+        # ASSERT
+        self.assertEqual('lyrics', hit)
+        self.assertIsNone(miss)
+        self.assertEqual({'hits': 1, 'misses': 1, 'size': 1, 'max_size': 2}, cache.get_stats())
+
+    def test_put_evicts_least_recently_used(self):
+
+        # ARRANGE
+        cache = ResultCache(max_size=2)
+        cache.put('a', 'lyrics a')
+        cache.put('b', 'lyrics b')
+        cache.get('a')
+
+        # ACT
+        cache.put('c', 'lyrics c')
+
+        # ASSERT
+        self.assertEqual('lyrics a', cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual('lyrics c', cache.get('c'))
+
+    def test_get_expires_results_after_ttl(self):
+
+        # ARRANGE
+        cache = ResultCache(max_size=2, ttl_seconds=0.05)
+        cache.put('a', 'lyrics a')
+
+        # ACT
+        before_ttl = cache.get('a')
+        time.sleep(0.1)
+        after_ttl = cache.get('a')
+
+        # ASSERT
+        self.assertEqual('lyrics a', before_ttl)
+        self.assertIsNone(after_ttl)
+        self.assertEqual(0, cache.get_stats()['size'])
+
+    def test_concurrent_puts_stay_bounded(self):
+
+        # ARRANGE
+        cache = ResultCache(max_size=50)
+
+        def put_values(thread_id: int):
+            for i in range(200):
+                cache.put((thread_id, i), f'lyrics {i}')
+                cache.get((thread_id, i))
+
+        threads = [threading.Thread(target=put_values, args=(thread_id,)) for thread_id in range(8)]
+
+        # ACT
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # ASSERT
+        stats = cache.get_stats()
+        self.assertEqual(50, stats['size'])
+        self.assertEqual(8 * 200, stats['hits'] + stats['misses'])
+
+
+if __name__ == '__main__':
+    unittest.main()
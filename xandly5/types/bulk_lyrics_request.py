@@ -0,0 +1,52 @@
+from typing import Optional, Union
+
+from xandly5.types.lyrics_model_enum import LyricsModelEnum
+
+
+class BulkLyricsRequest:
+
+    """
+    stores one request of a bulk generation, and its result:
+        - request_id - returned with the result, since results are returned in batches rather than request order
+        - model_id, seed_text, word_count, word_group_count - same as LyricsGenerator.generate_lyrics
+        - lyrics - formatted lyrics, once generated
+        - error - error message, if the request is invalid; other requests are still generated
+    """
+
+    def __init__(self, request_id: Union[int, str, None], model_id: Optional[LyricsModelEnum], seed_text: str,
+                 word_count: int, word_group_count: int, error: Optional[str] = None):
+        self.request_id = request_id
+        self.model_id = model_id
+        self.seed_text = seed_text
+        self.word_count = word_count
+        self.word_group_count = word_group_count
+        self.lyrics: Optional[str] = None
+        self.error = error
+
+    @classmethod
+    def from_dict(cls, values: dict, request_id: Union[int, str, None] = None) -> 'BulkLyricsRequest':
+        """
+        :param values: request values, ex: {"model_id": 2, "seed_text": "...", "word_count": 50,
+            "word_group_count": 4}; an optional "request_id" replaces the default request_id
+        :param request_id: default request id, ex: line number
+        :return: BulkLyricsRequest, with an error if values are missing or the model id is invalid
+        """
+        request_id = values.get('request_id', request_id)
+        try:
+            return cls(request_id, LyricsModelEnum(values['model_id']), values['seed_text'], values['word_count'],
+                       values['word_group_count'])
+        except KeyError as e:
+            return cls(request_id, None, '', 0, 0, error=f'Missing value: {e}')
+        except ValueError:
+            return cls(request_id, None, '', 0, 0, error=f'Invalid Model Id: {values["model_id"]}')
+
+    def to_dict(self) -> dict:
+        return {
+            'request_id': self.request_id,
+            'model_id': None if self.model_id is None else self.model_id.value,
+            'seed_text': self.seed_text,
+            'word_count': self.word_count,
+            'word_group_count': self.word_group_count,
+            'lyrics': self.lyrics,
+            'error': self.error
+        }
@@ -0,0 +1,7 @@
+from enum import IntEnum
+
+
+class DecodingMethodEnum(IntEnum):
+    GREEDY = 1
+    SAMPLING = 2
+    BEAM = 3
@@ -0,0 +1,41 @@
+from typing import Optional
+
+from xandly5.types.decoding_method_enum import DecodingMethodEnum
+
+
+class DecodingOptions:
+
+    """
+    stores how the next word is chosen at each generation step:
+        - method - DecodingMethodEnum; GREEDY (default) always picks the most likely word
+        - temperature - SAMPLING: values below 1 favor likely words, above 1 flatten the distribution
+        - top_k - SAMPLING: sample from the top_k most likely words only, 0 for all words
+        - top_p - SAMPLING: sample from the smallest set of most likely words whose probabilities reach top_p
+        - beam_width - BEAM: number of candidate texts kept at each step
+        - seed - SAMPLING: random seed; the same seed and inputs generate the same lyrics
+    """
+
+    def __init__(self, method: DecodingMethodEnum = DecodingMethodEnum.GREEDY, temperature: float = 1.0,
+                 top_k: int = 0, top_p: float = 1.0, beam_width: int = 4, seed: Optional[int] = None):
+        self.method = method if type(method) == DecodingMethodEnum else DecodingMethodEnum(method)
+        self.temperature = temperature
+        self.top_k = top_k
+        self.top_p = top_p
+        self.beam_width = beam_width
+        self.seed = seed
+
+    def is_deterministic(self) -> bool:
+        """
+        :return: True if the same inputs always generate the same lyrics, so results can be cached
+        """
+        return self.method != DecodingMethodEnum.SAMPLING or self.seed is not None
+
+    def get_key(self) -> tuple:
+        """
+        :return: the options that affect the generated lyrics, ex: for cache keys
+        """
+        if self.method == DecodingMethodEnum.SAMPLING:
+            return self.method, self.temperature, self.top_k, self.top_p, self.seed
+        if self.method == DecodingMethodEnum.BEAM:
+            return self.method, self.beam_width
+        return ()  # greedy decoding has no options
@@ -0,0 +1,9 @@
+from enum import IntEnum
+
+
+class JobStatusEnum(IntEnum):
+    QUEUED = 1
+    RUNNING = 2
+    COMPLETED = 3
+    FAILED = 4
+    CANCELLED = 5
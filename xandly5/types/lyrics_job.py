@@ -0,0 +1,47 @@
+import threading
+import time
+import uuid
+from typing import Optional
+
+from xandly5.types.job_status_enum import JobStatusEnum
+
+
+class LyricsJob:
+
+    """
+    stores the state of a lyrics generation job:
+        - job_id - id used to poll, fetch or cancel the job
+        - status - JobStatusEnum
+        - section_count, word_count - totals for the job
+        - sections_done, words_done - progress, updated while the job runs
+        - lyrics - formatted lyrics, once completed
+        - error - error message, if failed
+    """
+
+    def __init__(self, section_count: int, word_count: int):
+        self.job_id = str(uuid.uuid4())
+        self.status = JobStatusEnum.QUEUED
+        self.section_count = section_count
+        self.word_count = word_count
+        self.sections_done = 0
+        self.words_done = 0
+        self.lyrics: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_time = time.time()
+        self.finished_time: Optional[float] = None
+        self.cancel_event = threading.Event()
+
+    def is_finished(self) -> bool:
+        return self.status in (JobStatusEnum.COMPLETED, JobStatusEnum.FAILED, JobStatusEnum.CANCELLED)
+
+    def to_dict(self) -> dict:
+        return {
+            'job_id': self.job_id,
+            'status': self.status.name,
+            'section_count': self.section_count,
+            'sections_done': self.sections_done,
+            'word_count': self.word_count,
+            'words_done': self.words_done,
+            'lyrics': self.lyrics,
+            'error': self.error
+        }
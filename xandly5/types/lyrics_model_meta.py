@@ -1,7 +1,14 @@
 
-from typing import Optional
-from tensorflow import keras
-from xandly5.ai_ml_model.catalog import Catalog
+from typing import TYPE_CHECKING, Iterator, List, Optional, Union
+from xandly5.ai_ml_model.batching_scheduler import BatchingScheduler
+from xandly5.ai_ml_model.catalog import Catalog, LyricsSession
+from xandly5.ai_ml_model.decoders import Decoder
+from xandly5.ai_ml_model.numpy_lyrics_predictor import NumpyLyricsPredictor
+
+if TYPE_CHECKING:
+    from tensorflow import keras
+    from xandly5.ai_ml_model.lyrics_predictor import LyricsPredictor
+    from xandly5.ai_ml_model.tflite_lyrics_predictor import TFLiteLyricsPredictor
 
 
 class LyricsModelMeta:
@@ -10,22 +17,114 @@ class LyricsModelMeta:
     stores the model and related data:
         - model_file - h5 model file name
         - lyrics_file - lyrics text file name
+        - catalog_file - catalog json file name, saved with the model
+        - npz_file - model weights for NumPy inference, exported from the h5 model
         - model - keras/tensorflow model
+        - model_hash - hash of the model file, identifies the trained weights (ex: in cache keys)
+        - predictor - compiled (or NumPy, or TFLite) inference path for the model
+        - scheduler - optional, batches predictions across concurrent generations
         - catalog associated with this model
     """
 
-    def __init__(self, model_file: str, lyrics_file: str):
+    def __init__(self, model_file: str, lyrics_file: str, catalog_file: str, npz_file: str):
         self.model_file = model_file
         self.lyrics_file = lyrics_file
-        self.model: Optional[keras.Sequential] = None
+        self.catalog_file = catalog_file
+        self.npz_file = npz_file
+        self.model: Optional['keras.Sequential'] = None
+        self.model_hash: Optional[str] = None
+        self.predictor: Optional[Union['LyricsPredictor', NumpyLyricsPredictor, 'TFLiteLyricsPredictor']] = None
+        self.scheduler: Optional[BatchingScheduler] = None
         self.catalog: Optional[Catalog] = None
 
-    def generate_lyrics_text(self, seed_text: str, word_count: int) -> str:
+    def generate_lyrics_text(self, seed_text: str, word_count: int, decoder: Optional[Decoder] = None) -> str:
         """
         generate lyrics using the specific catalog associated with this model
 
         :param seed_text: starting text
         :param word_count: number of words to return
+        :param decoder: chooses each next word, None for greedy decoding
         :return: seed + generated text
         """
-        return self.catalog.generate_lyrics_text(self.model, seed_text, word_count)
+        if self.scheduler is None:
+            return self.catalog.generate_lyrics_text(self.predictor, seed_text, word_count, decoder)
+
+        with self.scheduler.generation():
+            return self.catalog.generate_lyrics_text(self.scheduler, seed_text, word_count, decoder)
+
+    def generate_lyrics_texts(self, seed_texts: List[str], word_counts: List[int],
+                              decoder: Optional[Decoder] = None) -> List[str]:
+        """
+        generate lyrics for several independent seeds as a single batch
+
+        :param seed_texts: starting text for each lyrics text
+        :param word_counts: number of words to return for each lyrics text
+        :param decoder: chooses each next word, None for greedy decoding
+        :return: seed + generated text, for each seed
+        """
+        if self.scheduler is None:
+            return self.catalog.generate_lyrics_texts(self.predictor, seed_texts, word_counts, decoder)
+
+        with self.scheduler.generation():
+            return self.catalog.generate_lyrics_texts(self.scheduler, seed_texts, word_counts, decoder)
+
+    def continue_lyrics_session(self, session: LyricsSession, seed_text: str, word_count: int,
+                                decoder: Optional[Decoder] = None) -> int:
+        """
+        append seed text to a lyrics session, and generate words using the catalog associated with this model
+
+        :param session: lyrics session created with this model's catalog
+        :param seed_text: starting text, appended to the session's lyrics text
+        :param word_count: total number of words in the session's lyrics text
+        :param decoder: chooses each next word, None for greedy decoding
+        :return: number of words generated
+        """
+        if self.scheduler is None:
+            return session.generate_lyrics_text(self.predictor, seed_text, word_count, decoder)
+
+        with self.scheduler.generation():
+            return session.generate_lyrics_text(self.scheduler, seed_text, word_count, decoder)
+
+    def generate_lyrics_words(self, seed_text: str, word_count: int,
+                              decoder: Optional[Decoder] = None) -> Iterator[str]:
+        """
+        generate lyrics one word at a time using the catalog associated with this model, for streaming
+
+        :param seed_text: starting text
+        :param word_count: number of words, including the seed text
+        :param decoder: chooses each next word, None for greedy decoding
+        :return: iterator of generated words
+        """
+        if self.scheduler is None:
+            yield from self.catalog.generate_lyrics_words(self.predictor, seed_text, word_count, decoder)
+            return
+
+        # registered one word at a time, since the caller may hold each word (ex: until a client reads it)
+        yield from self.scheduler.iterate_generation(
+            self.catalog.generate_lyrics_words(self.scheduler, seed_text, word_count, decoder))
+
+    def generate_lyrics_session_words(self, session: LyricsSession, word_count: int,
+                                      decoder: Optional[Decoder] = None) -> Iterator[str]:
+        """
+        generate words for a lyrics session one at a time, for streaming
+
+        :param session: lyrics session created with this model's catalog
+        :param word_count: total number of words in the session's lyrics text
+        :param decoder: chooses each next word, None for greedy decoding
+        :return: iterator of generated words
+        """
+        if self.scheduler is None:
+            yield from session.generate_lyrics_words(self.predictor, word_count, decoder)
+            return
+
+        # registered one word at a time, since the caller may hold each word (ex: until a client reads it)
+        yield from self.scheduler.iterate_generation(session.generate_lyrics_words(self.scheduler, word_count, decoder))
+
+    def close(self) -> None:
+        """
+        stop the batching scheduler, if any, once in-flight generations finish
+
+        :return: None
+        """
+        if self.scheduler is not None:
+            self.scheduler.close()
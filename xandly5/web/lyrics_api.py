@@ -1,9 +1,15 @@
-from flask import Flask, request, make_response, jsonify, render_template
+import json
+from typing import Iterator, List, Optional, Tuple
+
+import marshmallow
+from flask import Flask, Response, request, make_response, jsonify, render_template, stream_with_context
 from flask_marshmallow import Marshmallow, fields
 from marshmallow import post_load
 from flask_restful import Resource, Api
 
+from xandly5.service.bulk_lyrics import iterate_bulk_lyrics_requests
 from xandly5.service.lyrics_generator import LyricsGenerator
+from xandly5.types.decoding_options import DecodingOptions
 from xandly5.types.lyrics_model_enum import LyricsModelEnum
 from xandly5.types.validation_error import ValidationError
 from xandly5.types.lyrics_section import LyricsSection
@@ -38,6 +44,41 @@ class LyricsSectionSchema(ma.Schema):
 sections_schema = LyricsSectionSchema(many=True)
 
 
+class DecodingOptionsSchema(ma.Schema):
+    method = fields.fields.Int()
+    temperature = fields.fields.Float()
+    top_k = fields.fields.Int()
+    top_p = fields.fields.Float()
+    beam_width = fields.fields.Int()
+    seed = fields.fields.Int(allow_none=True)
+
+    # noinspection PyUnusedLocal
+    @post_load
+    def make_decoding_options(self, data, **kwargs):
+        return DecodingOptions(**data)
+
+
+decoding_options_schema = DecodingOptionsSchema()
+
+
+def load_decoding_options(json_values: dict) -> Optional[DecodingOptions]:
+    # optional "decoding" object, ex: {"method": 2, "temperature": 0.8, "top_k": 40, "seed": 7}
+    decoding = json_values.get('decoding')
+    if decoding is None:
+        return None
+    try:
+        return decoding_options_schema.load(decoding, unknown='exclude')
+    except (marshmallow.ValidationError, ValueError) as e:
+        raise ValidationError(f'Decoding options are invalid: {e}')
+
+
+def make_stream_response(lyrics_chunks: Iterator[str]) -> Response:
+    # chunked text/plain response, sent as lyrics are generated
+    response = Response(stream_with_context(lyrics_chunks), mimetype='text/plain')
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
 # noinspection PyMethodMayBeStatic
 class LyricsApi(Resource):
 
@@ -49,9 +90,18 @@ class LyricsApi(Resource):
             word_count: int = json_values['word_count']
             word_group_count: int = json_values['word_group_count']
 
+            stream: bool = json_values.get('stream', False)
+            decoding_options = load_decoding_options(json_values)
+
             generator = LyricsGenerator(model_id)
+
+            if stream:
+                return make_stream_response(generator.generate_lyrics_stream(
+                    seed_text=seed_text, word_count=word_count, word_group_count=word_group_count,
+                    decoding_options=decoding_options))
+
             lyrics = generator.generate_lyrics(seed_text=seed_text, word_count=word_count,
-                                               word_group_count=word_group_count)
+                                               word_group_count=word_group_count, decoding_options=decoding_options)
 
             response = make_response(lyrics, 200)
             response.mimetype = "text/plain"
@@ -62,24 +112,38 @@ class LyricsApi(Resource):
             return make_error(400, str(ve))
 
 
+def load_structured_lyrics_request(json_values: dict) -> Tuple[LyricsModelEnum, bool, List[LyricsSection],
+                                                               Optional[DecodingOptions]]:
+    model_id: LyricsModelEnum = LyricsModelEnum(json_values['model_id'])
+    independent_sections: bool = json_values['independent_sections']
+    sections = json_values['lyrics_sections']
+    lyrics_sections = sections_schema.load(sections, many=True, unknown='exclude')
+    decoding_options = load_decoding_options(json_values)
+    return model_id, independent_sections, lyrics_sections, decoding_options
+
+
 # noinspection PyMethodMayBeStatic
 class StructuredLyricsApi(Resource):
 
     def post(self):
         try:
             json_values = request.json
-            model_id: LyricsModelEnum = LyricsModelEnum(json_values['model_id'])
-            independent_sections: bool = json_values['independent_sections']
-            sections = json_values['lyrics_sections']
-            lyrics_sections = sections_schema.load(sections, many=True, unknown='exclude')
+            model_id, independent_sections, lyrics_sections, decoding_options = \
+                load_structured_lyrics_request(json_values)
+            stream: bool = json_values.get('stream', False)
 
             generator = LyricsGenerator(LyricsModelEnum(model_id))
             lyrics: str
 
+            if stream:
+                return make_stream_response(generator.generate_lyrics_from_sections_stream(
+                    lyrics_sections, independent_sections=independent_sections, decoding_options=decoding_options))
+
             if independent_sections:
-                lyrics = generator.generate_lyrics_from_independent_sections(lyrics_sections)
+                lyrics = generator.generate_lyrics_from_independent_sections(lyrics_sections,
+                                                                             decoding_options=decoding_options)
             else:
-                lyrics = generator.generate_lyrics_from_sections(lyrics_sections)
+                lyrics = generator.generate_lyrics_from_sections(lyrics_sections, decoding_options=decoding_options)
 
             response = make_response(lyrics, 200)
             response.mimetype = "text/plain"
@@ -90,8 +154,66 @@ class StructuredLyricsApi(Resource):
             return make_error(400, str(ve))
 
 
+# noinspection PyMethodMayBeStatic
+class StructuredLyricsJobsApi(Resource):
+
+    def post(self):
+        try:
+            model_id, independent_sections, lyrics_sections, decoding_options = \
+                load_structured_lyrics_request(request.json)
+
+            generator = LyricsGenerator(model_id)
+            job = generator.submit_lyrics_sections_job(lyrics_sections, independent_sections=independent_sections,
+                                                       decoding_options=decoding_options)
+
+            response = jsonify(job.to_dict())
+            response.status_code = 202
+            return response
+
+        except ValidationError as ve:
+            return make_error(400, str(ve))
+
+    def get(self):
+        return jsonify(LyricsGenerator.get_job_stats())
+
+
+# noinspection PyMethodMayBeStatic
+class StructuredLyricsJobApi(Resource):
+
+    def get(self, job_id: str):
+        job = LyricsGenerator.get_job(job_id)
+        if job is None:
+            return make_error(404, f'Job not found: {job_id}')
+        return jsonify(job.to_dict())
+
+    def delete(self, job_id: str):
+        job = LyricsGenerator.cancel_job(job_id)
+        if job is None:
+            return make_error(404, f'Job not found: {job_id}')
+        return jsonify(job.to_dict())
+
+
+# noinspection PyMethodMayBeStatic
+class BatchLyricsApi(Resource):
+
+    def post(self):
+        # JSONL in and out, one request (and result) per line; results are sent as each batch is generated
+        lines = [line for line in request.get_data(as_text=True).splitlines() if line.strip()]
+        if len(lines) > LyricsGenerator.max_bulk_requests:
+            return make_error(400, f'Number of requests cannot exceed {LyricsGenerator.max_bulk_requests}')
+
+        results = LyricsGenerator.generate_lyrics_bulk(iterate_bulk_lyrics_requests(lines))
+        response = Response(stream_with_context(json.dumps(result.to_dict()) + '\n' for result in results),
+                            mimetype='application/x-ndjson')
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
+
 api.add_resource(LyricsApi, '/lyrics-api')
 api.add_resource(StructuredLyricsApi, '/structured-lyrics-api')
+api.add_resource(StructuredLyricsJobsApi, '/structured-lyrics-jobs-api')
+api.add_resource(StructuredLyricsJobApi, '/structured-lyrics-jobs-api/<string:job_id>')
+api.add_resource(BatchLyricsApi, '/batch-lyrics-api')
 
 
 @app.route('/')
@@ -99,5 +221,11 @@ def index():
     return render_template('index.html')
 
 
+@app.route('/metrics')
+def metrics():
+    # Prometheus text format, for scraping
+    return Response(LyricsGenerator.get_metrics_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 if __name__ == '__main__':
     app.run(debug=False, host='0.0.0.0')  # enabling debug causes CUDNN errors
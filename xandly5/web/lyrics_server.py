@@ -0,0 +1,179 @@
+"""
+PRODUCTION ENTRY POINT FOR THE LYRICS API: PRE-FORKED WORKER PROCESSES SHARING ONE LISTENING SOCKET
+
+usage: python xandly5/web/lyrics_server.py
+
+the parent process binds the socket and forks the workers, which serve requests, so generations run in parallel
+across processes rather than behind one GIL
+
+- numpy inference engine: the parent loads every model and catalog before forking, so the workers share their
+  memory pages (copy-on-write) instead of each loading a copy; TensorFlow is never imported by the parent
+- tensorflow and tflite inference engines: the workers are forked *before* TensorFlow is initialized, since the
+  TensorFlow runtime is not fork-safe; each worker then limits TensorFlow's thread pools and loads its own models
+
+metrics are kept in each worker, and a request to /metrics is answered by any one worker; set serving_metrics_port
+to also serve each worker's metrics on its own port (serving_metrics_port + worker index), to scrape every worker
+"""
+
+import gc
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from typing import Dict, Tuple
+
+_package_directory = os.path.dirname(os.path.abspath(__file__))
+
+with open(os.path.join(_package_directory, '../service/lyrics_generator_config.json')) as json_file:
+    _config = json.load(json_file)
+
+
+def _get_worker_count() -> int:
+    worker_count = int(os.environ.get('XANDLY5_WORKERS', _config['serving_workers']))
+    return worker_count if worker_count > 0 else os.cpu_count() or 1
+
+
+def _load_models() -> None:
+    from xandly5.service.lyrics_generator import LyricsGenerator
+    from xandly5.types.lyrics_model_enum import LyricsModelEnum
+
+    for model_id in LyricsModelEnum:
+        LyricsGenerator(model_id)
+
+
+def _load_shared_models() -> bool:
+    """
+    numpy inference engine only: load every model in this (parent) process, to be shared by the forked workers
+
+    :return: True if the models are loaded; False if TensorFlow would be initialized before forking (a model's
+        npz file could not be exported), so the workers load their own models
+    """
+    from xandly5.service.lyrics_generator import LyricsGenerator
+    from xandly5.types.lyrics_model_enum import LyricsModelEnum
+
+    if not all(LyricsGenerator.is_npz_file_current(model_id) for model_id in LyricsModelEnum):
+        # exporting npz files imports TensorFlow, so it is done in a new process, not in the parent
+        with multiprocessing.get_context('spawn').Pool(1) as pool:
+            pool.apply(_load_models)
+        if not all(LyricsGenerator.is_npz_file_current(model_id) for model_id in LyricsModelEnum):
+            return False
+
+    _load_models()
+    # objects loaded so far are never collected, so the garbage collector does not write to (and copy) their pages
+    gc.freeze()
+    return True
+
+
+def _metrics_app(environ, start_response):
+    from xandly5.service.lyrics_generator import LyricsGenerator
+
+    start_response('200 OK', [('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')])
+    return [LyricsGenerator.get_metrics_text().encode('utf-8')]
+
+
+def _run_worker(listen_socket: socket.socket, worker_index: int) -> None:
+    # limits must be set before TensorFlow runs its first op; numpy inference does not import TensorFlow at all
+    if _config['inference_engine'] != 'numpy':
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(int(_config['serving_intra_op_threads']))
+        tf.config.threading.set_inter_op_parallelism_threads(int(_config['serving_inter_op_threads']))
+
+    from werkzeug.serving import make_server
+    from xandly5.web.lyrics_api import app
+
+    # load every model now (unless loaded by the parent), so the first request to each worker does not wait for it
+    _load_models()
+
+    host, port = listen_socket.getsockname()[:2]
+
+    metrics_port = int(_config['serving_metrics_port'])
+    if metrics_port > 0:
+        # this worker's metrics only, at any path; the shared socket answers /metrics from whichever worker accepts
+        metrics_server = make_server(host, metrics_port + worker_index, _metrics_app, threaded=True)
+        threading.Thread(target=metrics_server.serve_forever, name='metrics-server', daemon=True).start()
+        print(f'worker {os.getpid()} serving metrics on {host}:{metrics_port + worker_index}')
+
+    server = make_server(host, port, app, threaded=True, fd=listen_socket.fileno())
+    print(f'worker {os.getpid()} serving on {host}:{port}')
+    server.serve_forever()
+
+
+def _start_worker(listen_socket: socket.socket, worker_index: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *args: sys.exit(0))
+        exit_code = 0
+        try:
+            _run_worker(listen_socket, worker_index)
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else 0
+        except BaseException as e:
+            print(f'worker {os.getpid()} failed: {e}')
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+    return pid
+
+
+def main():
+    host = os.environ.get('FLASK_HOST', '0.0.0.0')
+    port = int(os.environ.get('FLASK_PORT', 5000))
+    worker_count = _get_worker_count()
+
+    listen_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listen_socket.bind((host, port))
+    listen_socket.listen(128)
+    listen_socket.set_inheritable(True)
+
+    if _config['inference_engine'] == 'numpy':
+        if _load_shared_models():
+            print('models loaded, shared by all workers')
+        else:
+            print('unable to export npz files, each worker loads its own models')
+
+    # by pid: worker index, started time; a restarted worker keeps the index (and metrics port) of the one it replaces
+    workers: Dict[int, Tuple[int, float]] = {}
+    for worker_index in range(worker_count):
+        workers[_start_worker(listen_socket, worker_index)] = (worker_index, time.monotonic())
+    print(f'started {worker_count} workers on {host}:{port}')
+
+    is_stopping = False
+
+    def stop(signum, frame):
+        nonlocal is_stopping
+        is_stopping = True
+        for worker_pid in workers:
+            os.kill(worker_pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+
+        worker = workers.pop(pid, None)
+        if is_stopping or worker is None:
+            continue
+        worker_index, started_time = worker
+
+        print(f'worker {pid} exited with status {status}, restarting')
+        if time.monotonic() - started_time < 1:
+            time.sleep(1)  # avoid a tight restart loop, ex: missing model files
+        workers[_start_worker(listen_socket, worker_index)] = (worker_index, time.monotonic())
+
+    listen_socket.close()
+
+
+if __name__ == '__main__':
+    main()
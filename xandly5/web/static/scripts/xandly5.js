@@ -1,3 +1,9 @@
+function showError(message){
+    $("#generated_text").text('');
+    $('#alert_message').text(message);
+    $('#alert_message').show();
+}
+
 function submitForm(){
 
     $("#generated_text").text("Processing...")
@@ -9,29 +15,42 @@ function submitForm(){
         model_id: parseInt($("#model_id").val()),
         seed_text: $("#seed_text").val(),
         word_count: parseInt($("#word_count").val()),
-        word_group_count: parseInt($("#word_group_count").val())
+        word_group_count: parseInt($("#word_group_count").val()),
+        stream: true
     };
 
-    $.ajax({
-        url: '/lyrics-api',
-        data: JSON.stringify(lyricsRequest),
-        contentType: 'application/json',
-        type: 'POST',
-        success: function(xhr){
-            $('#spinner').addClass("d-none");
-            $("#generated_text").text(xhr);
-            $("#main_button").prop("disabled", false);
-        },
-        error: function(xhr){
-            $("#generated_text").text('');
-            $('#alert_message').text(xhr.responseJSON.message);
-            $('#alert_message').show();
-            $('#spinner').addClass("d-none");
-            $("#main_button").prop("disabled", false);
+    // lyrics are streamed, and shown as each word is generated
+    fetch('/lyrics-api', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify(lyricsRequest)
+    }).then(async function(response){
+        if (!response.ok){
+            const error = await response.json();
+            showError(error.message);
+            return;
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let lyrics = '';
+
+        while (true){
+            const {done, value} = await reader.read();
+            if (done){
+                break;
+            }
+            lyrics += decoder.decode(value, {stream: true});
+            $("#generated_text").text(lyrics);
         }
+    }).catch(function(error){
+        showError(error.message);
+    }).finally(function(){
+        $('#spinner').addClass("d-none");
+        $("#main_button").prop("disabled", false);
     });
 }
 
 $("#main_button").click(function(){
     submitForm();
-});
\ No newline at end of file
+});